@@ -0,0 +1,105 @@
+# channel_pool.py
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_CHANNELS = 3
+
+
+def find_ssh_transport(device):
+    """
+    Return the paramiko Transport behind a netmiko-based NAPALM device
+    (ios, nxos_ssh, eos over SSH), or None when there isn't one.
+    """
+    try:
+        connection = getattr(device, 'device', None)
+        channel = getattr(connection, 'remote_conn', None)
+        transport = channel.get_transport() if channel is not None else None
+        if transport is not None and transport.is_active():
+            return transport
+    except Exception as e:
+        print("No SSH transport for parallel channels:", str(e))
+    return None
+
+
+class ParallelCommandRunner:
+    """
+    Runs independent command groups concurrently on one device.
+
+    Extra exec channels are multiplexed over the device's already
+    authenticated SSH transport, capped at `max_channels`.  The NAPALM
+    session's own channel is shared through `main_lock`; when no transport
+    is reachable every command falls back to that channel, serialized.
+
+    With `api` (an http_api.HttpApiDevice) commands go over the device's
+    HTTP API instead, batched into one request per cli() call, and the
+    pooled keep-alive connections take the place of exec channels.
+
+    Exposes `platform` and a NAPALM-style `cli()` so it can stand in for
+    the device in CustomDriver.
+    """
+
+    def __init__(self, device, max_channels: int = DEFAULT_MAX_CHANNELS, timeout: float = 60.0, api=None):
+        self.device = device
+        self.api = api
+        self.platform = device.platform
+        self.max_channels = max(1, max_channels)
+        self.timeout = timeout
+        self.main_lock = threading.Lock()
+        self._transport = None if api is not None else find_ssh_transport(device)
+        self._channel_slots = threading.BoundedSemaphore(self.max_channels)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_channels,
+                                            thread_name_prefix=f"channels-{device.hostname}")
+
+    @property
+    def parallel(self) -> bool:
+        return self.api is not None or self._transport is not None
+
+    def submit(self, func, *args, **kwargs):
+        """Run a command group on its own thread; returns a Future."""
+        return self._executor.submit(func, *args, **kwargs)
+
+    def cli(self, commands):
+        if self.api is not None:
+            output = self.api.cli(commands)
+        else:
+            output = {}
+            for command in commands:
+                output[command] = self._run_command(command)
+        # Keep record mode complete even though exec channels bypass the device
+        record_cli = getattr(self.device, 'record_cli', None)
+        if record_cli is not None:
+            record_cli(output)
+        return output
+
+    def _run_command(self, command: str) -> str:
+        if self._transport is not None:
+            try:
+                return self._exec(command)
+            except Exception as e:
+                print(f"Exec channel failed for '{command}', using the main session:", str(e))
+                self._transport = None
+        with self.main_lock:
+            return self.device.cli([command])[command]
+
+    def _exec(self, command: str) -> str:
+        with self._channel_slots:
+            channel = self._transport.open_session(timeout=self.timeout)
+            try:
+                channel.settimeout(self.timeout)
+                channel.exec_command(command)
+                chunks = []
+                while True:
+                    data = channel.recv(65536)
+                    if not data:
+                        break
+                    chunks.append(data)
+                return b''.join(chunks).decode('utf-8', 'replace')
+            finally:
+                channel.close()
+
+    def shutdown(self):
+        try:
+            self._executor.shutdown(wait=True)
+        except Exception:
+            traceback.print_exc()
@@ -0,0 +1,442 @@
+# collector.py
+
+import threading
+import traceback
+
+from channel_pool import ParallelCommandRunner, DEFAULT_MAX_CHANNELS
+from custom_driver import CustomDriver
+from device_health import DeviceUnreachable, get_health_tracker
+from http_api import HttpApiDevice
+from parse_pool import get_parse_pool
+from poll_scheduler import get_session_limiter
+from poll_timing import CycleTimer
+from replay_driver import get_network_driver, RecordingDevice
+from route_probe import ROUTE_PROBE_COMMAND, get_route_cache, route_signature
+from snmp_counters import get_snmp_backend
+from table_delta import TABLES, is_empty
+from telemetry_stream import get_listener, DEFAULT_TELEMETRY_HOST, DEFAULT_TELEMETRY_PORT
+
+
+class PollCancelled(Exception):
+    """Raised inside run() when the consumer cancels an in-flight poll."""
+
+
+class DevicePoll:
+    """
+    One poll cycle of a device: connect, collect facts, interfaces,
+    neighbors and routes, close.  No Qt; results go to `emit(event, *args)`
+    with the events facts_ready, interfaces_ready, neighbors_ready,
+    routes_ready, error, timing_ready, unchanged (dataset, summary) and
+    finished, from whichever thread calls run().
+
+    With a `table_differ`, neighbors and routes are delivered as
+    delta (dataset, rows added/changed/removed since the last delivery)
+    instead of the full neighbors_ready / routes_ready payload.
+    """
+
+    def __init__(self, driver, hostname: str, username: str, password: str, record_dir=None,
+                 collect_cpu=False, max_channels=DEFAULT_MAX_CHANNELS, collect_interfaces=True,
+                 transport='ssh', api_port=None, api_scheme='https', route_probe=False,
+                 content_cache=None, table_differ=None, collect_tables=True, emit=None):
+        self.emit = emit or (lambda event, *args: None)
+        self.driver = driver
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        # When set, every raw CLI/getter response is captured for the replay driver
+        self.record_dir = record_dir
+        # Sample control-plane CPU for adaptive polling (costs an extra getter)
+        self.collect_cpu = collect_cpu
+        # Concurrent SSH channels per device for independent command groups
+        self.max_channels = max_channels
+        # False when interface counters arrive through streaming telemetry instead
+        self.collect_interfaces = collect_interfaces
+        # 'http' uses eAPI / NX-API on eos and nxos instead of SSH screen-scraping
+        self.transport = transport
+        self.api_port = api_port
+        self.api_scheme = api_scheme
+        # Probe the route summary and re-pull the full table only when it changed
+        self.route_probe = route_probe
+        # ContentHashCache of what the consumer already shows; None always emits
+        self.content_cache = content_cache
+        # TableDiffer of the rows the consumer already shows; None emits full tables
+        self.table_differ = table_differ
+        # False skips the neighbor getters and the routing table (facts and interfaces only)
+        self.collect_tables = collect_tables
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Request cancellation; takes effect at the next stage boundary."""
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def _check_cancelled(self):
+        if self._cancelled.is_set():
+            raise PollCancelled()
+
+    def _emit(self, event, payload):
+        # Results of a cancelled poll are dropped rather than delivered
+        if not self._cancelled.is_set():
+            self.emit(event, payload)
+
+    def _deliver(self, dataset, event, payload):
+        """Emit payload, or only its row differences when a TableDiffer is attached."""
+        differ = self.table_differ
+        if differ is None or dataset not in TABLES:
+            self._emit(event, payload)
+            return
+        delta = differ.diff(self.hostname, dataset, payload)
+        if self._cancelled.is_set():
+            differ.forget(self.hostname, dataset)
+        elif is_empty(delta):
+            self.emit('unchanged', dataset, {})
+        else:
+            self.emit('delta', dataset, delta)
+
+    def _emit_dataset(self, dataset, event, payload, digest_data=None, summary=None):
+        """Emit payload, or only `unchanged` when it hashes the same as last time."""
+        cache = self.content_cache
+        if cache is not None and not cache.changed(
+                self.hostname, dataset, payload if digest_data is None else digest_data):
+            if not self._cancelled.is_set():
+                self.emit('unchanged', dataset, summary or {})
+            return False
+        self._deliver(dataset, event, payload)
+        if cache is not None and self._cancelled.is_set():
+            # Dropped, so the consumer never saw it
+            cache.forget(self.hostname, dataset)
+        return True
+
+    def _is_unchanged(self, dataset, digest_data, summary=None):
+        """Like _emit_dataset for data not yet parsed: True (and notified) when unchanged."""
+        cache = self.content_cache
+        if cache is None or cache.changed(self.hostname, dataset, digest_data):
+            return False
+        if not self._cancelled.is_set():
+            self.emit('unchanged', dataset, summary or {})
+        return True
+
+    def _get_cpu_usage(self, device):
+        """Average CPU % across the device's CPUs via get_environment, or None."""
+        try:
+            cpus = device.get_environment().get('cpu', {})
+            usage = [float(cpu['%usage']) for cpu in cpus.values() if '%usage' in cpu]
+            if usage:
+                return sum(usage) / len(usage)
+        except Exception as e:
+            print("Error getting CPU usage:", str(e))
+        return None
+
+    def _use_http_api(self):
+        return self.transport == 'http' and ('eos' in str(self.driver) or 'nxos' in str(self.driver))
+
+    def _http_api_args(self):
+        optional_args = {'transport': self.api_scheme}
+        if self.api_port:
+            optional_args['port'] = self.api_port
+        return optional_args
+
+    def _probe_port(self):
+        """Management port for the reachability probe, None when there is nothing to probe."""
+        if 'replay' in str(self.driver):
+            return None
+        if self._use_http_api():
+            return self.api_port or (443 if self.api_scheme == 'https' else 80)
+        return 22
+
+    def _open(self, device):
+        # Session setup is rate limited process-wide to spare AAA servers
+        if not get_session_limiter().acquire(self._cancelled):
+            raise PollCancelled()
+        device.open()
+
+    def _maybe_record(self, device):
+        if self.record_dir:
+            return RecordingDevice(device, self.record_dir)
+        return device
+
+    def _collect_interfaces(self, runner, timer):
+        # Get interface info using custom parser
+        self._check_cancelled()
+        custom = CustomDriver(runner)
+        interface_timings = {}
+        interfaces, counters = custom.get_interfaces_custom(
+            parse_pool=get_parse_pool(), timings=interface_timings)
+        timer.add_stages(interface_timings)
+        self._emit('interfaces_ready', {"interfaces": interfaces, "counters": counters})
+
+    def _collect_neighbors(self, runner, device, timer):
+        # Get neighbor info using NAPALM
+        self._check_cancelled()
+        with runner.main_lock:
+            with timer.stage('get_lldp_neighbors'):
+                lldp = device.get_lldp_neighbors()
+
+            if not '4.18.4F' in self.facts.get('os_version',''):
+                with timer.stage('get_arp_table'):
+                    arp = device.get_arp_table()
+            else:
+                arp = {}
+        self._emit_dataset('neighbors', 'neighbors_ready', {"lldp": lldp, "arp": arp})
+
+    def _collect_routes(self, runner, device, timer):
+        # Get route information
+        self._check_cancelled()
+        try:
+            signature = None
+            if self.route_probe:
+                try:
+                    with timer.stage('cli:' + ROUTE_PROBE_COMMAND):
+                        summary = runner.cli([ROUTE_PROBE_COMMAND]).get(ROUTE_PROBE_COMMAND, '')
+                    signature = route_signature(summary)
+                except Exception as e:
+                    # Probe unsupported or failed: fall back to the full fetch
+                    print("Route probe failed:", str(e))
+                    signature = None
+                cached = get_route_cache().lookup(self.hostname, signature)
+                if cached is not None:
+                    self._emit_dataset('routes', 'routes_ready', dict(cached, cached=True),
+                                       digest_data=[cached.get("raw_output"), cached.get("structured_routes")])
+                    return
+
+            # Get raw CLI output for complete routing table
+            with timer.stage('cli:show ip route'):
+                all_routes_output = runner.cli(["show ip route"])
+            # Try to get structured route data for default route
+            default_route = {}
+            try:
+                with runner.main_lock:
+                    with timer.stage('get_route_to'):
+                        default_route = device.get_route_to("0.0.0.0/0")
+            except:
+                pass  # Some platforms might not support this
+
+            raw_routes = all_routes_output.get("show ip route", "")
+            # Byte-identical table: skip the parse and the GUI rebuild
+            if self._is_unchanged('routes', [raw_routes, default_route]):
+                # Keep the probe cache valid, or every later poll re-pulls a stable table
+                get_route_cache().refresh(self.hostname, signature, raw_routes)
+                return
+            route_info = {
+                "structured_routes": default_route,
+                "raw_output": raw_routes
+            }
+            # Parse off the GUI interpreter; the dashboard falls back to raw_output
+            try:
+                with timer.stage('parse_routes'):
+                    route_info["routes"] = get_parse_pool().parse_routes(raw_routes)
+            except Exception as e:
+                print("Error parsing routes:", str(e))
+            if "routes" in route_info:
+                get_route_cache().store(self.hostname, signature, route_info)
+            self._deliver('routes', 'routes_ready', route_info)
+            if self.content_cache is not None and self._cancelled.is_set():
+                self.content_cache.forget(self.hostname, 'routes')
+
+        except Exception as e:
+            print("Error getting routes:", str(e))
+            if self.content_cache is not None:
+                self.content_cache.forget(self.hostname, 'routes')
+            if self.table_differ is not None:
+                self.table_differ.forget(self.hostname, 'routes')
+            self._emit('routes_ready', {})
+
+    def run(self):
+        device = None
+        device_open = False
+        timer = CycleTimer(self.hostname, str(self.driver))
+        status = 'ok'
+        api = None
+        health = get_health_tracker()
+        try:
+            # Initialize NAPALM driver
+            timer.start('connect')
+            use_http_api = self._use_http_api()
+            probe_port = self._probe_port()
+            platform = str(self.driver)
+            self.driver = get_network_driver(self.driver)
+            driver = self.driver
+
+            # eAPI / NX-API: NAPALM getters and our CLI commands both go over HTTP
+            if use_http_api:
+                platform = 'nxos' if 'nxos' in platform else 'eos'
+                driver = get_network_driver(platform)
+                device = driver(
+                    hostname=self.hostname,
+                    username=self.username,
+                    password=self.password,
+                    optional_args=self._http_api_args()
+                )
+                api = HttpApiDevice(self.hostname, self.username, self.password, platform,
+                                    port=self.api_port, scheme=self.api_scheme)
+
+            # Handle NXOS - switch to SSH if detected
+            elif 'nxos' in str(driver):
+                self.driver = 'nxos_ssh'
+                optional_args = {
+                    'transport': 'ssh',
+                    'port': 22
+                }
+                driver = get_network_driver(self.driver)
+                device = driver(
+                    hostname=self.hostname,
+                    username=self.username,
+                    password=self.password,
+                    optional_args=optional_args
+                )
+
+            # Handle EOS with proper scope for SSH connection
+            elif 'eos' in str(self.driver):
+                optional_args = {
+                     'transport': 'ssh',
+                'use_eapi': False
+                }
+
+                device = driver(
+                    hostname=self.hostname,
+                    username=self.username,
+                    password=self.password,
+                    optional_args=optional_args
+                )
+
+            # Handle all other device types
+            else:
+                device = driver(
+                    hostname=self.hostname,
+                    username=self.username,
+                    password=self.password
+                )
+
+            self._check_cancelled()
+            # Fast-fail while the device's circuit is open instead of waiting out the SSH timeout
+            health.check(self.hostname, probe_port)
+            self._open(device)
+            device_open = True
+            timer.stop('connect')
+            device = self._maybe_record(device)
+            with timer.stage('get_facts'):
+                self.facts = device.get_facts()
+
+            # If "Kernel" in hostname, it's possibly a Nexus device using ios driver
+            if "Kernel" in self.facts['hostname']:
+                device.close()
+                device_open = False
+                timer.start('connect')
+                driver = get_network_driver('nxos_ssh')
+                optional_args = {
+                    'transport': 'ssh',
+                    'port': 22
+                }
+                device = driver(
+                    hostname=self.hostname,
+                    username=self.username,
+                    password=self.password,
+                    optional_args=optional_args
+                )
+                self._open(device)
+                device_open = True
+                timer.stop('connect')
+                device = self._maybe_record(device)
+
+            self._check_cancelled()
+            with timer.stage('cli:show spanning-tree'):
+                if api is not None:
+                    spanning_tree_output = api.cli(['show spanning-tree'])
+                    if isinstance(device, RecordingDevice):
+                        device.record_cli(spanning_tree_output)
+                else:
+                    spanning_tree_output = device.cli(['show spanning-tree'])
+            if 'root' in str(spanning_tree_output).lower():
+                is_switch = True
+            else:
+                is_switch = False
+
+            with timer.stage('get_facts'):
+                self.facts = device.get_facts()
+            self.facts['is_switch'] = is_switch
+            if self.collect_cpu:
+                with timer.stage('get_environment'):
+                    self.facts['cpu_usage'] = self._get_cpu_usage(device)
+            self._emit_dataset('facts', 'facts_ready', self.facts,
+                               summary={'uptime': self.facts.get('uptime'),
+                                        'cpu_usage': self.facts.get('cpu_usage')})
+
+            # Interfaces and routes run on their own SSH channels (or pooled
+            # HTTP connections) while the neighbor getters use the NAPALM
+            # session, so a slow routing table never holds back interface data
+            runner = ParallelCommandRunner(device, max_channels=self.max_channels, api=api)
+            try:
+                jobs = [runner.submit(self._collect_routes, runner, device, timer)] if self.collect_tables else []
+                if self.collect_interfaces:
+                    jobs.append(runner.submit(self._collect_interfaces, runner, timer))
+                if self.collect_tables:
+                    self._collect_neighbors(runner, device, timer)
+                for job in jobs:
+                    job.result()
+            finally:
+                runner.shutdown()
+            health.record_success(self.hostname)
+
+        except PollCancelled:
+            status = 'cancelled'
+            print(f"Poll of {self.hostname} cancelled")
+
+        except DeviceUnreachable as e:
+            status = 'skipped'
+            print(str(e))
+            self._emit('error', str(e))
+
+        except Exception as e:
+            status = 'error'
+            traceback.print_exc()
+            health.record_failure(self.hostname, str(e))
+            self._emit('error', str(e))
+
+        finally:
+            if device_open:
+                try:
+                    with timer.stage('close'):
+                        device.close()
+                except Exception as e:
+                    print("Error closing device:", str(e))
+            self.emit('timing_ready', timer.finish(status))
+            self.emit('finished')
+
+
+def parse_bandwidth_mbps(bandwidth: str, default: float = 10.0) -> float:
+    """Interface speed in Mbps from a BANDWIDTH field such as '10000 Kbit'."""
+    try:
+        if 'Kbit' in bandwidth:
+            return float(bandwidth.split()[0]) / 1000  # Convert Kbit to Mbit
+        if 'Mbit' in bandwidth:
+            return float(bandwidth.split()[0])
+        if 'Gbit' in bandwidth:
+            return float(bandwidth.split()[0]) * 1000
+    except (ValueError, IndexError):
+        pass
+    return default  # Default to 10Mbps if parsing fails
+
+
+def interface_sample(rate_engine, hostname: str, name: str, details: dict, counters: dict,
+                     timestamp: float):
+    """
+    (speed in Mbps, rate sample) for one interface of an interfaces_ready
+    payload: parsed bps plus pps/errors/discards from the cumulative counters.
+    """
+    # Get speed from bandwidth (which comes in Kbit)
+    speed_mbps = parse_bandwidth_mbps(details.get('BANDWIDTH', '10000 Kbit'))
+    sample = {'rx_bps': float(details.get('input_rate', 0)),  # These are in bps
+              'tx_bps': float(details.get('output_rate', 0))}
+    sample.update(rate_engine.update(hostname, name, counters.get(name, {}), timestamp))
+    return speed_mbps, sample
+
+
+def telemetry_fetch(hostname: str, port: int = DEFAULT_TELEMETRY_PORT, host: str = DEFAULT_TELEMETRY_HOST):
+    aggregator = get_listener(port, host).aggregator
+    return lambda: aggregator.snapshot(hostname)
+
+
+def snmp_fetch(hostname: str, community: str, port: int = 161):
+    return get_snmp_backend(hostname, community, port).poll
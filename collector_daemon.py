@@ -0,0 +1,312 @@
+# collector_daemon.py
+"""
+Headless collector: polls an inventory on a schedule with the same engine
+as the dashboard (collector.DevicePoll, parse pool, rate engine, history)
+and writes results to files.  Imports no Qt, so it runs on display-less
+collector VMs:
+
+    python collector_daemon.py --config collector.yaml
+"""
+import argparse
+import heapq
+import json
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from collector import DevicePoll, interface_sample
+from counter_rates import RateEngine
+from device_health import get_health_tracker
+from history_db import HistoryDB
+from history_store import HistoryStore, DEFAULT_CAPACITY
+from http_api import configure_http_api
+from metrics_exporter import MetricsExporter, DEFAULT_METRICS_PORT
+from inventory import inventory_devices, napalm_driver, read_config
+from parse_pool import get_parse_pool, shutdown_parse_pool
+from poll_scheduler import SpreadSchedule, configure_session_limiter
+from poll_timing import open_timing_sink
+from replay_driver import configure_replay
+from route_probe import configure_route_cache
+from stream_api import StreamHub, DEFAULT_STREAM_PORT
+from table_archive import TableArchive, DEFAULT_RETENTION as ARCHIVE_RETENTION
+from top_interfaces import TopInterfaces
+
+# Collector settings and their defaults; everything else in the file is inventory
+DEFAULT_CONFIG = {
+    'interval': 30.0,        # seconds between polls of one device
+    'jitter': 0.05,          # fraction of the interval polls may drift from their slot
+    'workers': 8,            # devices polled concurrently
+    'session_rate': 5.0,     # new SSH/API sessions per second across the daemon
+    'max_channels': 3,
+    'transport': 'ssh',
+    'api_port': None,
+    'api_scheme': 'https',
+    'api_verify': False,     # verify eAPI/NX-API certificates: true, or a CA bundle path
+    'collect_cpu': False,
+    'route_probe': False,
+    'route_max_age': 300.0,
+    'history_points': DEFAULT_CAPACITY,
+    'history_db': None,      # SQLite file for interface history
+    'archive_db': None,      # SQLite file for point-in-time route/ARP/LLDP tables
+    'archive_retention': ARCHIVE_RETENTION,
+    'archive_max_bytes': None,
+    'output_dir': None,      # latest/<host>.json snapshots (and events.jsonl)
+    'events': False,         # also append every delivered dataset to events.jsonl
+    'timing_log': None,
+    'metrics_port': None,    # serve OpenMetrics at http://metrics_address:metrics_port/metrics
+    'metrics_address': '127.0.0.1',
+    'stream_port': None,     # HTTP/WebSocket API at ws://stream_address:stream_port/ws
+    'stream_address': '127.0.0.1',
+    'captures': None,        # capture directory for the replay driver
+}
+
+# Poll options passed through to DevicePoll
+_POLL_OPTIONS = ('max_channels', 'transport', 'api_port', 'api_scheme', 'collect_cpu', 'route_probe')
+
+
+def load_config(path: str) -> dict:
+    """Collector settings merged over DEFAULT_CONFIG, with the validated device list."""
+    data = read_config(path)
+    unknown = set(data) - set(DEFAULT_CONFIG) - {'defaults', 'devices'}
+    if unknown:
+        raise ValueError(f"Unknown collector settings: {', '.join(sorted(unknown))}")
+    config = {**DEFAULT_CONFIG, **{k: v for k, v in data.items() if k in DEFAULT_CONFIG}}
+    config['devices'] = inventory_devices(data)
+    if not config['devices']:
+        raise ValueError(f"No devices in {path}")
+    return config
+
+
+class FileSink:
+    """
+    Writes the newest dataset of every device to <directory>/latest/<host>.json
+    (replaced atomically, so readers never see a partial file) and, with
+    `events`, appends each delivered dataset to <directory>/events.jsonl.
+    """
+
+    def __init__(self, directory: str, events: bool = False):
+        self.directory = directory
+        self.events = events
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, 'latest'), exist_ok=True)
+
+    def write_snapshot(self, hostname: str, snapshot: dict):
+        path = os.path.join(self.directory, 'latest', hostname.replace(os.sep, '_') + '.json')
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(snapshot, f, default=str)
+        os.replace(tmp, path)
+
+    def handle(self, hostname: str, event: str, payload):
+        if not self.events:
+            return
+        line = json.dumps({'ts': time.time(), 'hostname': hostname, 'event': event, 'data': payload},
+                          default=str)
+        with self._lock:
+            with open(os.path.join(self.directory, 'events.jsonl'), 'a') as f:
+                f.write(line + '\n')
+
+    def close(self):
+        pass
+
+
+class Collector:
+    """
+    Polls every device in its own SpreadSchedule slot on a thread pool, one
+    poll per device in flight at a time.  Results are kept as the latest
+    datasets per device, interface rates feed per-device HistoryStores, an
+    optional HistoryDB and a fleet-wide TopInterfaces keyed by
+    (device, interface), and every event is handed to the sinks.
+
+    A sink is any object with handle(hostname, event, payload) and close();
+    one with write_snapshot(hostname, snapshot) also gets the device's
+    latest datasets after each poll.
+    """
+
+    def __init__(self, devices: List[dict], interval: float = 30.0, jitter: float = 0.05,
+                 workers: int = 8, poll_options: Optional[dict] = None,
+                 history_points: int = DEFAULT_CAPACITY, history_db: Optional[str] = None,
+                 timing_log: Optional[str] = None, sinks=()):
+        self.devices = {device['hostname']: device for device in devices}
+        self.interval = interval
+        self.spread = SpreadSchedule(jitter)
+        self.poll_options = poll_options or {}
+        self.sinks = list(sinks)
+        self.history_points = history_points
+        self.history: Dict[str, HistoryStore] = {}
+        self.history_db = HistoryDB(history_db) if history_db else None
+        self.timing_sink = open_timing_sink(timing_log)
+        self.rate_engine = RateEngine()
+        self.top_interfaces = TopInterfaces()
+        self.interface_speeds: Dict[tuple, float] = {}
+        self.latest: Dict[str, dict] = {hostname: {} for hostname in self.devices}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='collector-poll')
+        self._polls: Dict[str, DevicePoll] = {}
+        self._due: List[tuple] = []
+        self._wakeup = threading.Condition()
+        self._stopping = False
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    # -- scheduling --------------------------------------------------------
+
+    def _schedule(self, hostname: str, delay: float):
+        with self._wakeup:
+            heapq.heappush(self._due, (time.monotonic() + delay, hostname))
+            self._wakeup.notify()
+
+    def run(self):
+        """Poll until stop() is called."""
+        get_parse_pool().warm_up()
+        for hostname in self.devices:
+            self._schedule(hostname, self.spread.next_delay(hostname, self.interval))
+        print(f"Collecting from {len(self.devices)} devices every {self.interval:.0f}s")
+        while True:
+            with self._wakeup:
+                while not self._stopping and (not self._due or self._due[0][0] > time.monotonic()):
+                    self._wakeup.wait(self._due[0][0] - time.monotonic() if self._due else None)
+                if self._stopping:
+                    break
+                _, hostname = heapq.heappop(self._due)
+            self._executor.submit(self._poll, hostname)
+        self._shutdown()
+
+    def stop(self):
+        with self._wakeup:
+            self._stopping = True
+            for poll in list(self._polls.values()):
+                poll.cancel()
+            self._wakeup.notify()
+
+    def _shutdown(self):
+        self._executor.shutdown(wait=True)
+        shutdown_parse_pool()
+        if self.history_db is not None:
+            self.history_db.close()
+        for sink in self.sinks:
+            sink.close()
+
+    # -- one poll ----------------------------------------------------------
+
+    def _poll(self, hostname: str):
+        device = self.devices[hostname]
+        failed = []
+        poll = DevicePoll(napalm_driver(device['driver']), hostname, device['username'],
+                          device['password'], emit=partial(self._handle, hostname, failed),
+                          **self.poll_options)
+        self._polls[hostname] = poll
+        started = time.monotonic()
+        try:
+            poll.run()
+        finally:
+            self._polls.pop(hostname, None)
+        if failed:
+            delay = max(self.interval, get_health_tracker().retry_in(hostname))
+            print(f"{hostname}: {failed[0]} - retrying in {delay:.0f}s")
+        else:
+            delay = self.spread.next_delay(hostname, self.interval)
+            print(f"{hostname}: polled in {time.monotonic() - started:.1f}s, next in {delay:.0f}s")
+            for sink in self.sinks:
+                if hasattr(sink, 'write_snapshot'):
+                    try:
+                        sink.write_snapshot(hostname, self.latest[hostname])
+                    except Exception as e:
+                        print(f"Sink {type(sink).__name__} failed for {hostname}:", str(e))
+        if not self._stopping:
+            self._schedule(hostname, delay)
+
+    def _handle(self, hostname: str, failed: list, event: str, *args):
+        """Runs on the poll's threads for every DevicePoll event."""
+        if event == 'finished':
+            return
+        if event == 'error':
+            failed.append(args[0])
+        elif event == 'timing_ready':
+            if self.timing_sink:
+                self.timing_sink.write(args[0])
+        elif event == 'unchanged':
+            dataset, summary = args
+            self.latest[hostname].setdefault(dataset, {}).update(summary)
+        else:
+            dataset = event[:-len('_ready')]
+            self.latest[hostname][dataset] = args[0]
+            if dataset == 'interfaces':
+                self.latest[hostname]['rates'] = self._record_interfaces(hostname, args[0])
+        payload = args[0] if len(args) == 1 else list(args)
+        for sink in self.sinks:
+            try:
+                sink.handle(hostname, event, payload)
+            except Exception as e:
+                print(f"Sink {type(sink).__name__} failed for {hostname}:", str(e))
+
+    def _record_interfaces(self, hostname: str, data: dict) -> Dict[str, dict]:
+        history = self.history.get(hostname)
+        if history is None:
+            history = self.history[hostname] = HistoryStore(self.history_points)
+        counters = data.get('counters', {})
+        now = time.time()
+        samples = {}
+        for name, details in data.get('interfaces', {}).items():
+            speed_mbps, sample = interface_sample(self.rate_engine, hostname, name, details, counters, now)
+            self.interface_speeds[(hostname, name)] = speed_mbps
+            history.append(name, now, sample)
+            self.top_interfaces.update((hostname, name), now, sample, speed_mbps * 1_000_000)
+            samples[name] = sample
+        if self.history_db is not None and samples:
+            self.history_db.record_many(hostname, now, samples)
+        return samples
+
+
+def build_collector(config: dict) -> Collector:
+    configure_session_limiter(config['session_rate'])
+    configure_route_cache(config['route_max_age'])
+    configure_http_api(config['api_verify'])
+    if config['captures']:
+        configure_replay(capture_dir=config['captures'])
+    sinks = [FileSink(config['output_dir'], events=config['events'])] if config['output_dir'] else []
+    if config['archive_db']:
+        sinks.append(TableArchive(config['archive_db'], retention=config['archive_retention'],
+                                  max_bytes=config['archive_max_bytes']))
+    collector = Collector(
+        config['devices'],
+        interval=config['interval'],
+        jitter=config['jitter'],
+        workers=config['workers'],
+        poll_options={key: config[key] for key in _POLL_OPTIONS},
+        history_points=config['history_points'],
+        history_db=config['history_db'],
+        timing_log=config['timing_log'],
+        sinks=sinks,
+    )
+    if config['metrics_port'] is not None:
+        exporter = MetricsExporter(speeds=collector.interface_speeds)
+        exporter.serve(config['metrics_address'], config['metrics_port'] or DEFAULT_METRICS_PORT)
+        collector.add_sink(exporter)
+    if config['stream_port'] is not None:
+        hub = StreamHub()
+        hub.serve(collector, config['stream_address'], config['stream_port'] or DEFAULT_STREAM_PORT)
+        collector.add_sink(hub)
+    return collector
+
+
+def main():
+    # Required for the parse pool in frozen Windows builds
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Headless network device collector")
+    parser.add_argument('--config', required=True, metavar='FILE', help="YAML or JSON collector config")
+    args = parser.parse_args()
+
+    collector = build_collector(load_config(args.config))
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: collector.stop())
+    collector.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# content_cache.py
+import hashlib
+import json
+import threading
+from typing import Dict, Iterable, Optional
+
+# Fields that change every poll without the dataset meaningfully changing.
+# They are left out of the hash and travel in the "unchanged" notification.
+VOLATILE_FIELDS = {
+    'facts': ('uptime', 'cpu_usage'),
+    'neighbors': ('age',),
+}
+
+
+def _strip(data, volatile):
+    if isinstance(data, dict):
+        return {k: _strip(v, volatile) for k, v in data.items() if k not in volatile}
+    if isinstance(data, (list, tuple)):
+        return [_strip(v, volatile) for v in data]
+    return data
+
+
+def content_digest(data, volatile: Iterable[str] = ()) -> str:
+    """Stable digest of raw text/bytes or of a getter result (dict key order ignored)."""
+    if isinstance(data, bytes):
+        raw = data
+    elif isinstance(data, str):
+        raw = data.encode()
+    else:
+        volatile = frozenset(volatile)
+        if volatile:
+            data = _strip(data, volatile)
+        raw = json.dumps(data, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+class ContentHashCache:
+    """
+    Digest of the last payload delivered per (device, dataset).  One cache
+    belongs to one consumer (a dashboard), so "unchanged" always means
+    "identical to what that consumer already shows".
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._digests: Dict[tuple, str] = {}
+
+    def changed(self, hostname: str, dataset: str, data) -> bool:
+        """Record the payload's digest; False when it matches the previous one."""
+        digest = content_digest(data, VOLATILE_FIELDS.get(dataset, ()))
+        key = (hostname, dataset)
+        with self._lock:
+            if self._digests.get(key) == digest:
+                return False
+            self._digests[key] = digest
+            return True
+
+    def forget(self, hostname: Optional[str] = None, dataset: Optional[str] = None):
+        with self._lock:
+            for key in list(self._digests):
+                if (hostname is None or key[0] == hostname) and (dataset is None or key[1] == dataset):
+                    del self._digests[key]
@@ -0,0 +1,61 @@
+# counter_rates.py
+import time
+from typing import Dict, Optional
+
+# Cumulative counter -> rate name.  Octets are converted to bits per second.
+RATE_FIELDS = {
+    'rx_octets': 'rx_bps',
+    'tx_octets': 'tx_bps',
+    'rx_unicast_packets': 'rx_pps',
+    'tx_unicast_packets': 'tx_pps',
+    'rx_errors': 'rx_errors_ps',
+    'tx_errors': 'tx_errors_ps',
+    'rx_discards': 'rx_discards_ps',
+    'tx_discards': 'tx_discards_ps',
+}
+
+
+class RateEngine:
+    """
+    Turns cumulative interface counters into per-second rates.
+
+    Keeps the previous sample of every counter per (device, interface), so
+    partial updates (one streamed leaf at a time) work as well as full CLI
+    snapshots.  A counter that goes backwards (reset or wrap) yields no rate
+    for that sample instead of a huge negative spike.
+    """
+
+    def __init__(self):
+        self._last: Dict[tuple, Dict[str, tuple]] = {}
+
+    def update(self, device: str, interface: str, counters: dict,
+               timestamp: Optional[float] = None) -> dict:
+        """Feed cumulative counters; returns rates for the fields that have a previous sample."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        previous = self._last.setdefault((device, interface), {})
+
+        rates = {}
+        for field, rate_name in RATE_FIELDS.items():
+            if field not in counters:
+                continue
+            value = counters[field]
+            last = previous.get(field)
+            previous[field] = (timestamp, value)
+            if last is None:
+                continue
+            last_time, last_value = last
+            elapsed = timestamp - last_time
+            delta = value - last_value
+            if elapsed <= 0 or delta < 0:
+                continue
+            rate = delta / elapsed
+            if field.endswith('_octets'):
+                rate = rate * 8
+            rates[rate_name] = rate
+        return rates
+
+    def forget(self, device: str, interface: Optional[str] = None):
+        for key in list(self._last):
+            if key[0] == device and (interface is None or key[1] == interface):
+                del self._last[key]
@@ -1,12 +1,83 @@
 # custom_driver.py
+import json
+import threading
+import time
 import traceback
 from tfsm_fire import TextFSMAutoEngine
 
 
+TEMPLATE_DB = 'templates.db'
+
+# One engine per thread (sqlite connections are thread bound), so parse pool
+# workers keep their template database connection warm between polls
+_local = threading.local()
+
+
+def get_engine(db_path=TEMPLATE_DB):
+    engines = getattr(_local, 'engines', None)
+    if engines is None:
+        engines = _local.engines = {}
+    engine = engines.get(db_path)
+    if engine is None:
+        engine = TextFSMAutoEngine(db_path)
+        engines[db_path] = engine
+    return engine
+
+
+# Template filters used by parse_interfaces, warmed at startup
+INTERFACE_TEMPLATE_HINTS = (
+    'arista_eos_show_interfaces',
+    'cisco_nxos_show_ip_interface',
+    'cisco_ios_show_interfaces',
+    'cisco_nxos_show_interface',
+)
+
+
+def warm_engine(db_path=TEMPLATE_DB):
+    """Open this thread's engine and compile the interface templates."""
+    return get_engine(db_path).warm_templates(INTERFACE_TEMPLATE_HINTS)
+
+
+def parse_interfaces_output(raw_output, platform, db_path=TEMPLATE_DB):
+    """Pure-CPU interface parse: raw 'show interfaces' text in, (interfaces, counters, timings) out."""
+    parser = CustomDriver(None, engine=get_engine(db_path))
+    timings = {}
+    interfaces, counters = parser.parse_interfaces(raw_output, platform, timings)
+    return interfaces, counters, timings
+
+
+def parse_interfaces_json_output(raw_output, platform):
+    """Pure-CPU parse of '| json' interface output: (interfaces, counters, timings) out."""
+    parser = CustomDriver(None)
+    timings = {}
+    interfaces, counters = parser.parse_interfaces_json(raw_output, platform, timings)
+    return interfaces, counters, timings
+
+
+def _to_int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
 class CustomDriver:
-    def __init__(self, device):
+    def __init__(self, device, engine=None):
         self.device = device
-        self.engine = TextFSMAutoEngine('templates.db')
+        self._engine = engine
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = get_engine()
+        return self._engine
 
     def _parse_speed(self, speed_str, bandwidth_str):
         """
@@ -127,36 +198,157 @@ class CustomDriver:
 
         return common_data
 
-    def get_interfaces_custom(self):
-        """Get interface details using TextFSM parsing, including rates and counters."""
+    def get_interfaces_custom(self, parse_pool=None, timings=None, prefer_json=True):
+        """
+        Get interface details using TextFSM parsing, including rates and counters.
+        Stage durations (seconds) are added to `timings` when a dict is given.
+        """
+        if timings is None:
+            timings = {}
         if self.device.platform == "nxos_ssh":
             interface_cmd = "show interface"
         else:
             interface_cmd = "show interfaces"
 
+        # EOS and NX-OS can emit structured JSON, which skips the template search entirely
+        if prefer_json and ('eos' in self.device.platform or 'nxos' in self.device.platform):
+            json_cmd = interface_cmd + " | json"
+            try:
+                start = time.monotonic()
+                output = self.device.cli([json_cmd])
+                timings['cli:' + json_cmd] = time.monotonic() - start
+                if parse_pool is not None:
+                    interfaces, counters = parse_pool.parse_interfaces_json(
+                        output[json_cmd], self.device.platform, timings)
+                else:
+                    interfaces, counters = self.parse_interfaces_json(
+                        output[json_cmd], self.device.platform, timings)
+                if interfaces:
+                    return interfaces, counters
+                print("No interfaces in JSON output, falling back to TextFSM")
+            except Exception as e:
+                print("JSON interface collection failed, falling back to TextFSM:", str(e))
+
+        start = time.monotonic()
         output = self.device.cli([interface_cmd])
+        timings['cli:' + interface_cmd] = time.monotonic() - start
+
+        if parse_pool is not None:
+            return parse_pool.parse_interfaces(output[interface_cmd], self.device.platform, timings)
+        return self.parse_interfaces(output[interface_cmd], self.device.platform, timings)
+
+    def parse_interfaces_json(self, raw_output, platform, timings=None):
+        """Normalize EOS/NX-OS '| json' interface output into interface and counter records."""
+        if timings is None:
+            timings = {}
+        start = time.monotonic()
+        data = json.loads(raw_output)
+        if 'eos' in platform:
+            result = self.normalize_eos_interfaces(data)
+        elif 'nxos' in platform:
+            result = self.normalize_nxos_interfaces(data)
+        else:
+            raise ValueError("No JSON interface support for platform: " + platform)
+        timings['parse_interfaces'] = time.monotonic() - start
+        return result
+
+    def normalize_eos_interfaces(self, data):
+        interfaces = {}
+        counters = {}
+        for name, intf in data.get('interfaces', {}).items():
+            stats = intf.get('interfaceStatistics', {})
+            c = intf.get('interfaceCounters', {})
+            rx_rate = _to_float(stats.get('inBitsRate'))
+            tx_rate = _to_float(stats.get('outBitsRate'))
+            interfaces[name] = {
+                'is_up': intf.get('lineProtocolStatus', '') == 'up',
+                'is_enabled': intf.get('interfaceStatus', '') != 'disabled',
+                'description': intf.get('description', ''),
+                'mac_address': intf.get('physicalAddress', ''),
+                'mtu': _to_int(intf.get('mtu')),
+                'speed': _to_float(intf.get('bandwidth')) / 1_000_000.0,  # bps to Mbps
+                'input_rate': rx_rate,
+                'output_rate': tx_rate,
+                'input_packets': _to_int(c.get('inUcastPkts')),
+                'output_packets': _to_int(c.get('outUcastPkts')),
+            }
+            counters[name] = {
+                'tx_unicast_packets': _to_int(c.get('outUcastPkts')),
+                'rx_unicast_packets': _to_int(c.get('inUcastPkts')),
+                'tx_errors': _to_int(c.get('totalOutErrors')),
+                'rx_errors': _to_int(c.get('totalInErrors')),
+                'tx_discards': _to_int(c.get('outDiscards')),
+                'rx_discards': _to_int(c.get('inDiscards')),
+                'tx_octets': _to_int(c.get('outOctets')),
+                'rx_octets': _to_int(c.get('inOctets')),
+                'tx_rate': tx_rate,
+                'rx_rate': rx_rate,
+            }
+        return interfaces, counters
+
+    def normalize_nxos_interfaces(self, data):
+        rows = data.get('TABLE_interface', {}).get('ROW_interface', [])
+        if isinstance(rows, dict):
+            # NX-OS returns a bare dict when there is a single row
+            rows = [rows]
+        interfaces = {}
+        counters = {}
+        for intf in rows:
+            name = intf.get('interface', '')
+            if not name:
+                continue
+            rx_rate = _to_float(intf.get('eth_inrate1_bits'))
+            tx_rate = _to_float(intf.get('eth_outrate1_bits'))
+            interfaces[name] = {
+                'is_up': intf.get('state', '') == 'up',
+                'is_enabled': intf.get('admin_state', 'up') == 'up',
+                'description': intf.get('desc', ''),
+                'mac_address': intf.get('eth_hw_addr', ''),
+                'mtu': _to_int(intf.get('eth_mtu')),
+                'speed': _to_float(intf.get('eth_bw'), 1_000_000.0) / 1000.0,  # Kbit to Mbps
+                'input_rate': rx_rate,
+                'output_rate': tx_rate,
+                'input_packets': _to_int(intf.get('eth_inucast')),
+                'output_packets': _to_int(intf.get('eth_outucast')),
+            }
+            counters[name] = {
+                'tx_unicast_packets': _to_int(intf.get('eth_outucast')),
+                'rx_unicast_packets': _to_int(intf.get('eth_inucast')),
+                'tx_errors': _to_int(intf.get('eth_outerr')),
+                'rx_errors': _to_int(intf.get('eth_inerr')),
+                'tx_discards': _to_int(intf.get('eth_outdiscard')),
+                'rx_discards': _to_int(intf.get('eth_indiscard')),
+                'tx_octets': _to_int(intf.get('eth_outbytes')),
+                'rx_octets': _to_int(intf.get('eth_inbytes')),
+                'tx_rate': tx_rate,
+                'rx_rate': rx_rate,
+            }
+        return interfaces, counters
 
-        if 'eos' in self.device.platform:
+    def parse_interfaces(self, raw_output, platform, timings=None):
+        """Parse raw interface output for the given NAPALM platform."""
+        if timings is None:
+            timings = {}
+        start = time.monotonic()
+        if 'eos' in platform:
             hint = "arista_eos_show_interfaces"
-        elif 'nxos' in self.device.platform:
+        elif 'nxos' in platform:
             hint = "cisco_nxos_show_ip_interface"
         else:
             hint = "cisco_ios_show_interfaces"
 
-        template, parsed, score = self.engine.find_best_template(output[interface_cmd], hint)
-        print("Best template:", interface_cmd, "Score:", score)
+        template, parsed, score = self.engine.find_best_template(raw_output, hint)
         if score < 5:
-            template, parsed, score = self.engine.find_best_template(output[interface_cmd], 'cisco_nxos_show_interface')
+            template, parsed, score = self.engine.find_best_template(raw_output, 'cisco_nxos_show_interface')
+
+        timings['template_search'] = time.monotonic() - start
+        start = time.monotonic()
 
         if not parsed:
             return {}, {}
 
         interfaces = {}
         counters = {}
-        print("Parsed show interfaces")
-        print(parsed)
-        print("Reading parsed data...")
-        print("Detected driver for parsing:", self.device.platform)
 
         try:
             index = 0
@@ -164,9 +356,9 @@ class CustomDriver:
                 intf = parsed[index]
                 name = intf.get('INTERFACE', '')
                 device_type = "ios"
-                if "ios" in self.device.platform:
+                if "ios" in platform:
                     device_type = "ios"
-                elif "nxos" in self.device.platform:
+                elif "nxos" in platform:
                     device_type = "nxos"
                 else:
                     device_type = "ios"
@@ -212,5 +404,6 @@ class CustomDriver:
             print("Error reading parsed data:", e)
             traceback.print_exc()
 
+        timings['parse_interfaces'] = time.monotonic() - start
         return interfaces, counters
 
@@ -1,44 +1,127 @@
 import ipaddress
 import math
+import time
 import traceback
 
+import numpy as np
+
 # PyQt imports
 from PyQt6.QtSvgWidgets import QSvgWidget
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QLineEdit,
     QComboBox, QPushButton, QLabel, QTreeWidget, QTreeWidgetItem, QTabWidget,
-    QMessageBox, QTextEdit, QSizePolicy
+    QMessageBox, QTextEdit, QSizePolicy, QCompleter
 )
 from PyQt6.QtCharts import QChartView, QValueAxis, QChart, QLineSeries
-from PyQt6.QtCore import Qt, QTimer, QByteArray, QMargins, QThread
+from PyQt6.QtCore import Qt, QTimer, QByteArray, QMargins, QThreadPool, QPointF
 from PyQt6.QtGui import QFont, QColor, QPen, QPainter
 
 # Importing from separate modules (after splitting code)
 from themes import ThemeLibrary, LayeredHUDFrame, ThemeColors
 from hud import (apply_hud_styling, setup_chart_style, style_series, get_router_svg)
-from device_info_worker import DeviceInfoWorker
+from device_info_worker import (DeviceInfoWorker, CounterStreamWorker, CollectorStreamWorker,
+                                telemetry_fetch, snmp_fetch)
+from collector import interface_sample
+from content_cache import ContentHashCache
+from counter_rates import RateEngine
 from custom_driver import CustomDriver
+from history_db import HistoryDB
+from history_store import HistoryStore, DEFAULT_CAPACITY, TIERS, TIER_CAPACITY
+from device_health import get_health_tracker
+from inventory import napalm_driver
+from parse_pool import get_parse_pool, shutdown_parse_pool
+from poll_scheduler import AdaptivePollInterval, SpreadSchedule
+from poll_timing import open_timing_sink
+from table_delta import TableDiffer, diff_rows, table_rows
+from top_interfaces import TopInterfaces, METRICS as TOP_METRICS
+
+# Graph window choices (label, seconds) and the point budget per chart
+GRAPH_WINDOWS = [("15 minutes", 900), ("1 hour", 3600), ("6 hours", 21600),
+                 ("24 hours", 86400), ("7 days", 604800), ("30 days", 2592000)]
+GRAPH_MIN_POINTS = 60
+GRAPH_MAX_POINTS = 360
+# Threads of the separate pool prefetching inventory devices
+WARMUP_THREADS = 2
+# Route table protocol code -> network column color
+ROUTE_COLORS = {'C': "#22D3EE", 'L': "#22D3EE", 'S': "#10B981", 'D': "#3B82F6", 'O': "#F59E0B"}
+
 
 class DeviceDashboard(QMainWindow):
-    def __init__(self):
+    def __init__(self, record_dir=None, poll_interval=30.0, min_interval=5.0, max_interval=300.0,
+                 collect_cpu=False, timing_log=None, max_channels=3, telemetry_port=None,
+                 telemetry_host='127.0.0.1', snmp_community=None, snmp_port=161, counter_interval=5.0,
+                 transport='ssh', api_port=None,
+                 api_scheme='https', poll_jitter=0.05, inventory=None, route_probe=False,
+                 history_points=DEFAULT_CAPACITY, history_db=None, top_n=10,
+                 collector_url=None):
         super().__init__()
+        # Inventory devices are prefetched at startup so a chosen device paints at once
+        self.inventory = {device['hostname']: device for device in inventory or []}
+        self.warm_cache = {}
+        self.warm_workers = []
+        # 'http' polls eos/nxos over eAPI / NX-API with pooled keep-alive connections
+        self.transport = transport
+        self.api_port = api_port
+        self.api_scheme = api_scheme
+        self.route_probe = route_probe  # Skip unchanged routing tables via a summary probe
+        # Interface counters come from streaming telemetry on this port or from
+        # SNMP GETBULK instead of CLI polling when either is set
+        self.telemetry_port = telemetry_port
+        self.telemetry_host = telemetry_host
+        self.snmp_community = snmp_community
+        self.snmp_port = snmp_port
+        self.counter_interval = counter_interval
+        self.stream_worker = None
+        # Mirror devices from a collector's streaming API instead of polling them
+        self.collector_url = collector_url
+        self.collector_worker = None
+        self.max_channels = max_channels  # Concurrent SSH channels per device
+        # Optional JSON Lines file receiving one timing record per poll cycle
+        self.timing_sink = open_timing_sink(timing_log)
+        self.last_timing = None
+        self.gui_timings = {}
+        self.record_dir = record_dir  # Capture raw device output for the replay driver
+        self.collect_cpu = collect_cpu
+        self.poll_interval = AdaptivePollInterval(poll_interval, min_interval, max_interval)
+        # Per-device phase slot plus jitter, so dashboards never poll in lockstep
+        self.spread = SpreadSchedule(poll_jitter)
         self.theme_manager = ThemeLibrary()
         self._current_theme = "cyberpunk"
         self.setWindowTitle("Network Device Dashboard")
         self.setGeometry(100, 100, 1400, 900)
-        # Initialize history tracking
-        self.interface_history = {}
+        # Initialize history tracking: per-interface ring buffers of rates
+        self.history_length = history_points
+        self.interface_history = HistoryStore(history_points)
+        self.top_n = top_n
+        self.top_interfaces = TopInterfaces()  # ranked as samples arrive, never fully sorted
         self.interface_speeds = {}
-        self.history_length = 30
+        self.rate_engine = RateEngine()  # pps and errors/s from cumulative counters
+        # Optional SQLite file that keeps history across restarts
+        self.history_db = HistoryDB(history_db) if history_db else None
         self.theme_manager.apply_theme(self, self._current_theme)
         self.setup_ui()
         self.custom_driver = None  # Initialize custom_driver
         self.device = None  # Initialize device
-        self.worker = None
-        self.worker_thread = None
+        self.worker = None  # In-flight poll job, if any
+        self.poll_error = None  # First error line of the in-flight poll, if it failed
+        # Digests of the datasets on screen; identical polls skip the redraw
+        self.content_cache = ContentHashCache()
+        # Route/neighbor rows on screen, so polls deliver only the rows that changed
+        self.table_differ = TableDiffer()
+        self.shown_rows = {table: {} for table in self.table_trees}
+        self.table_items = {table: {} for table in self.table_trees}
+        self.thread_pool = QThreadPool.globalInstance()
+        # Warm-up runs on its own small pool so it can never hold the threads live polls need
+        self.warm_pool = QThreadPool()
+        self.warm_pool.setMaxThreadCount(WARMUP_THREADS)
+        self.poll_started = None
+        self.last_cpu = None
+        # Single shot: the next poll is scheduled only after the last one finishes
+        self.polling = False
         self.refresh_timer = QTimer()
-        self.refresh_timer.setInterval(30000)
+        self.refresh_timer.setSingleShot(True)
         self.refresh_timer.timeout.connect(self.refresh_data)
+        self.start_warmup()
 
     def setup_ui(self):
         central_widget = QWidget()
@@ -76,13 +159,20 @@ class DeviceDashboard(QMainWindow):
         group = QGroupBox("Device Connection")
         layout = QHBoxLayout()
         self.driver_combo = QComboBox()
-        self.driver_combo.addItems(['ios', 'eos', 'nxos'])
+        self.driver_combo.addItems(['ios', 'eos', 'nxos', 'replay'])
         self.hostname_input = QLineEdit()
         self.username_input = QLineEdit()
         self.password_input = QLineEdit()
         self.password_input.setEchoMode(QLineEdit.EchoMode.Password)
         self.connect_button = QPushButton("Connect")
         self.connect_button.clicked.connect(self.connect_device)
+        if self.inventory:
+            completer = QCompleter(sorted(self.inventory))
+            completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+            completer.activated.connect(self.fill_from_inventory)
+            self.hostname_input.setCompleter(completer)
+            self.hostname_input.editingFinished.connect(
+                lambda: self.fill_from_inventory(self.hostname_input.text()))
 
         layout.addWidget(QLabel("Driver:"))
         layout.addWidget(self.driver_combo)
@@ -200,7 +290,34 @@ class DeviceDashboard(QMainWindow):
         self.interfaces_tree.setColumnWidth(1, 80)
         self.interfaces_tree.setColumnWidth(2, 100)
         self.interfaces_tree.itemSelectionChanged.connect(self.update_interface_graph)
-        list_layout.addWidget(self.interfaces_tree)
+
+        # Hottest interfaces by the chosen metric; selecting one graphs it
+        top_container = QWidget()
+        top_layout = QVBoxLayout(top_container)
+        top_layout.setContentsMargins(0, 0, 0, 0)
+        self.top_metric_combo = QComboBox()
+        for metric, label in TOP_METRICS.items():
+            self.top_metric_combo.addItem(label, metric)
+        self.top_metric_combo.currentIndexChanged.connect(self.update_top_interfaces)
+        top_layout.addWidget(self.top_metric_combo)
+        self.top_tree = QTreeWidget()
+        self.top_tree.setHeaderLabels(["#", "INTERFACE", "VALUE"])
+        self.top_tree.setColumnWidth(0, 40)
+        self.top_tree.setColumnWidth(1, 150)
+        self.top_tree.itemSelectionChanged.connect(self.select_top_interface)
+        top_layout.addWidget(self.top_tree)
+
+        self.interface_tabs = QTabWidget()
+        self.interface_tabs.addTab(self.interfaces_tree, "All")
+        self.interface_tabs.addTab(top_container, f"Top {self.top_n}")
+        list_layout.addWidget(self.interface_tabs)
+
+        # Visible graph window; the history tier is picked to match it
+        self.graph_window_combo = QComboBox()
+        for label, seconds in GRAPH_WINDOWS:
+            self.graph_window_combo.addItem(label, seconds)
+        self.graph_window_combo.currentIndexChanged.connect(self.update_interface_graph)
+        list_layout.addWidget(self.graph_window_combo)
 
         self.chart = QChart()
         self.chart_view = QChartView(self.chart)
@@ -264,6 +381,7 @@ class DeviceDashboard(QMainWindow):
         self.route_tree.setHeaderLabels(["Network", "Mask", "Next Hop", "Protocol", "Interface", "Metric"])
         self.route_tree.setColumnWidth(0, 150)
         table_layout.addWidget(self.route_tree)
+        self.table_trees = {'lldp': self.lldp_tree, 'arp': self.arp_tree, 'routes': self.route_tree}
         self.route_tabs.addTab(table_container, "Table View")
 
         raw_container = QWidget()
@@ -279,14 +397,180 @@ class DeviceDashboard(QMainWindow):
         container.content_layout.addLayout(layout)
         return container
 
-    def cleanup_worker(self):
-        """Clean up existing worker thread."""
-        if self.worker_thread and self.worker_thread.isRunning():
-            print("Cleaning up existing worker thread")
-            self.worker_thread.quit()
-            self.worker_thread.wait()
+    def cancel_worker(self):
+        """Cancel the in-flight poll without waiting for it to finish."""
+        if self.worker is not None:
+            print("Cancelling in-flight poll")
+            self.worker.cancel()
+        self.worker = None
+
+    def fill_from_inventory(self, hostname):
+        device = self.inventory.get(hostname)
+        if device is None:
+            return
+        platform = 'nxos' if device['driver'] == 'nxos_ssh' else device['driver']
+        self.driver_combo.setCurrentText(platform)
+        self.username_input.setText(device['username'])
+        self.password_input.setText(device['password'])
+
+    def create_worker(self, conn, content_cache=None, table_differ=None, collect_tables=True):
+        return DeviceInfoWorker(
+            conn['driver'],
+            conn['hostname'],
+            conn['username'],
+            conn['password'],
+            record_dir=self.record_dir,
+            collect_cpu=self.collect_cpu,
+            max_channels=self.max_channels,
+            collect_interfaces=not self.counter_stream_enabled(),
+            transport=self.transport,
+            api_port=self.api_port,
+            api_scheme=self.api_scheme,
+            route_probe=self.route_probe,
+            content_cache=content_cache,
+            table_differ=table_differ,
+            collect_tables=collect_tables
+        )
+
+    def start_warmup(self):
+        """Start parse workers and prefetch facts and interfaces of every inventory device."""
+        get_parse_pool().warm_up()
+        for hostname, device in self.inventory.items():
+            conn = dict(device, driver=napalm_driver(device['driver']))
+            # Routing tables and neighbors wait for the live poll
+            worker = self.create_worker(conn, collect_tables=False)
+            cache = self.warm_cache.setdefault(hostname, {})
+            for key in ('facts', 'interfaces'):
+                getattr(worker.signals, key + '_ready').connect(
+                    lambda data, key=key, cache=cache: cache.__setitem__(key, data))
+            worker.signals.error.connect(
+                lambda error, hostname=hostname: print(f"Warm-up of {hostname} failed: {error}"))
+            worker.signals.finished.connect(lambda w=worker: self.warm_workers.remove(w))
+            self.warm_workers.append(worker)
+            self.warm_pool.start(worker)
+        if self.inventory:
+            print(f"Warming up {len(self.inventory)} inventory devices")
+
+    def paint_warm_cache(self, hostname):
+        """Show prefetched data for a device while its first live poll runs."""
+        cache = self.warm_cache.pop(hostname, None)
+        if not cache:
+            return
+        for key, update in (('facts', self.update_device_info), ('interfaces', self.update_interfaces)):
+            if key in cache:
+                update(cache[key])
+
+    def start_poll(self):
+        """Submit one poll cycle for the current connection to the thread pool."""
+        worker = self.create_worker(self.current_connection, self.content_cache, self.table_differ)
+
+        # Connect worker signals, timing each GUI update for the cycle record
+        worker.signals.facts_ready.connect(
+            lambda data: self.timed_update('gui:device_info', self.update_device_info, data))
+        worker.signals.interfaces_ready.connect(
+            lambda data: self.timed_update('gui:interfaces', self.update_interfaces, data))
+        worker.signals.neighbors_ready.connect(
+            lambda data: self.timed_update('gui:neighbors', self.update_neighbors, data))
+        worker.signals.routes_ready.connect(
+            lambda data: self.timed_update('gui:routes', self.update_routes, data))
+        worker.signals.delta.connect(
+            lambda dataset, delta: self.timed_update('gui:' + dataset, self.apply_delta, (dataset, delta)))
+        worker.signals.unchanged.connect(self.handle_unchanged)
+        worker.signals.error.connect(self.handle_error)
+        worker.signals.timing_ready.connect(self.record_timing)
+        worker.signals.finished.connect(lambda w=worker: self.poll_finished(w))
+
+        self.worker = worker
+        self.gui_timings = {}
+        self.poll_error = None
+        self.poll_started = time.monotonic()
+        self.thread_pool.start(worker)
+
+    def timed_update(self, stage, update, data):
+        started = time.monotonic()
+        try:
+            update(data)
+        finally:
+            self.gui_timings[stage] = time.monotonic() - started
+
+    def record_timing(self, record):
+        """Merge GUI update times into the worker's stage record and log it."""
+        record['stages'].update({name: round(seconds, 6) for name, seconds in self.gui_timings.items()})
+        self.last_timing = record
+        slowest = sorted(record['stages'].items(), key=lambda kv: kv[1], reverse=True)[:3]
+        print(f"Poll timing for {record['hostname']}: {record['total_seconds']:.2f}s total, slowest "
+              + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in slowest))
+        if self.timing_sink:
+            self.timing_sink.write(record)
+
+    def counter_stream_enabled(self):
+        return self.telemetry_port is not None or self.snmp_community is not None
+
+    def start_counter_stream(self):
+        """Replace CLI interface polling with telemetry or SNMP counters for the current device."""
+        self.stop_counter_stream()
+        hostname = self.current_connection['hostname']
+        if self.telemetry_port is not None:
+            worker = CounterStreamWorker(hostname, telemetry_fetch(hostname, self.telemetry_port, self.telemetry_host), 1.0)
+        else:
+            worker = CounterStreamWorker(hostname, snmp_fetch(hostname, self.snmp_community, self.snmp_port),
+                                         self.counter_interval)
+        worker.signals.interfaces_ready.connect(self.update_interfaces)
+        worker.signals.error.connect(self.handle_error)
+        self.stream_worker = worker
+        self.thread_pool.start(worker)
+
+    def start_collector_stream(self):
+        """Follow the current device through the collector: one poll loop feeds every viewer."""
+        self.stop_collector_stream()
+        hostname = self.current_connection['hostname']
+        worker = CollectorStreamWorker(self.collector_url, hostname)
+        worker.signals.facts_ready.connect(
+            lambda data: self.timed_update('gui:device_info', self.update_device_info, data))
+        worker.signals.interfaces_ready.connect(
+            lambda data: self.timed_update('gui:interfaces', self.update_interfaces, data))
+        worker.signals.neighbors_ready.connect(
+            lambda data: self.timed_update('gui:neighbors', self.update_neighbors, data))
+        worker.signals.routes_ready.connect(
+            lambda data: self.timed_update('gui:routes', self.update_routes, data))
+        worker.signals.delta.connect(
+            lambda dataset, delta: self.timed_update('gui:' + dataset, self.apply_delta, (dataset, delta)))
+        worker.signals.error.connect(self.handle_error)
+        worker.signals.timing_ready.connect(self.record_timing)
+        self.collector_worker = worker
+        self.statusBar().showMessage(f"{hostname}: following {self.collector_url}")
+        self.thread_pool.start(worker)
+
+    def stop_collector_stream(self):
+        if self.collector_worker is not None:
+            self.collector_worker.cancel()
+            self.collector_worker = None
+
+    def stop_counter_stream(self):
+        if self.stream_worker is not None:
+            self.stream_worker.cancel()
+            self.stream_worker = None
+
+    def poll_finished(self, worker):
+        # A cancelled worker may finish after its replacement started
+        if worker is not self.worker:
+            return
         self.worker = None
-        self.worker_thread = None
+        if not self.polling:
+            return
+
+        hostname = self.current_connection['hostname']
+        duration = time.monotonic() - self.poll_started
+        if self.poll_error is not None:
+            # Back off, and no sooner than the device's circuit breaker allows
+            interval = max(self.poll_interval.record_failure(), get_health_tracker().retry_in(hostname))
+            self.statusBar().showMessage(f"{hostname}: {self.poll_error} - retrying in {interval:.0f}s")
+        else:
+            interval = self.spread.next_delay(hostname, self.poll_interval.record_cycle(duration, self.last_cpu))
+            self.statusBar().showMessage(
+                f"{hostname}: polled in {duration:.1f}s at {time.strftime('%H:%M:%S')}, next in {interval:.0f}s")
+        print(f"Poll took {duration:.1f}s, next poll in {interval:.1f}s")
+        self.refresh_timer.start(int(interval * 1000))
 
     # Also update the worker's facts_ready signal handling
     # Modify connect_device method
@@ -297,19 +581,26 @@ class DeviceDashboard(QMainWindow):
         username = self.username_input.text()
         password = self.password_input.text()
 
-        if not all([hostname, username, password]):
+        if not hostname or (self.collector_url is None and not all([username, password])):
             QMessageBox.warning(self, "Missing Information", "Please fill in all connection details.")
             return
 
-        # Clean up any existing worker thread
-        self.cleanup_worker()
+        # Cancel any in-flight poll; never block the GUI waiting on it
+        self.cancel_worker()
+        self.stop_collector_stream()
 
         self.connect_button.setEnabled(False)
         self.setCursor(Qt.CursorShape.WaitCursor)
 
         try:
             # Set up connection parameters
-            driver = 'nxos_ssh' if platform == 'nxos' else platform
+            driver = napalm_driver(platform)
+
+            # Another device's history would otherwise be graphed as this one's
+            if hostname != getattr(self, 'current_connection', {}).get('hostname'):
+                self.interface_history.clear()
+                self.top_interfaces.clear()
+                self.load_history(hostname)
 
             # Store connection info for refresh
             self.current_connection = {
@@ -319,27 +610,22 @@ class DeviceDashboard(QMainWindow):
                 'password': password
             }
 
-            # Create new thread and worker
-            self.worker_thread = QThread()
-            self.worker = DeviceInfoWorker(driver, hostname, username, password)
-            self.worker.moveToThread(self.worker_thread)
-
-            # Connect worker signals
-            self.worker.facts_ready.connect(self.update_device_info)
-            self.worker.interfaces_ready.connect(self.update_interfaces)
-            self.worker.neighbors_ready.connect(self.update_neighbors)
-            self.worker.routes_ready.connect(self.update_routes)
-            self.worker.error.connect(self.handle_error)
-
-            # Connect thread signals
-            self.worker_thread.started.connect(self.worker.run)
-            self.worker.finished.connect(self.worker_thread.quit)
-            self.worker.finished.connect(self.worker.deleteLater)
-            self.worker_thread.finished.connect(self.worker_thread.deleteLater)
-
             print(f"Starting connection to {hostname} with driver {driver}")
-            self.worker_thread.start()
-            self.refresh_timer.start()
+            # An explicit connect retries immediately, even if the circuit was open
+            get_health_tracker().reset(hostname)
+            # New device on screen: every dataset must be drawn in full once
+            self.content_cache.forget()
+            self.table_differ.forget()
+            self.refresh_timer.stop()
+            self.last_cpu = None
+            self.polling = True
+            self.paint_warm_cache(hostname)
+            if self.collector_url:
+                self.start_collector_stream()
+                return
+            self.start_poll()
+            if self.counter_stream_enabled():
+                self.start_counter_stream()
 
         except Exception as e:
             self.handle_error(str(e))
@@ -351,8 +637,46 @@ class DeviceDashboard(QMainWindow):
 
     # Update the update_device_info method
 
+    def load_history(self, hostname):
+        """Backfill the in-memory rings from the history database."""
+        if self.history_db is None:
+            return
+        try:
+            for name in self.history_db.interfaces(hostname):
+                timestamps, values = self.history_db.query(hostname, name, limit=self.history_length)
+                self.interface_history.extend(name, timestamps, values)
+                for tier in TIERS:
+                    timestamps, values = self.history_db.query(hostname, name, limit=TIER_CAPACITY[tier], tier=tier)
+                    self.interface_history.extend(name, timestamps, values, tier=tier)
+                    starts, sketches = self.history_db.sketches(hostname, name, limit=TIER_CAPACITY[tier], tier=tier)
+                    self.interface_history.extend_sketches(name, tier, starts, sketches)
+            print(f"Loaded history for {len(self.interface_history)} interfaces of {hostname}")
+        except Exception as e:
+            print("Error loading history:", str(e))
+
+    def handle_unchanged(self, dataset, summary):
+        """Dataset identical to the last poll: only refresh its volatile fields in place."""
+        self.gui_timings['gui:' + dataset] = 0.0
+        if dataset == 'facts':
+            self.last_cpu = summary.get('cpu_usage')
+            self.set_device_fact("Uptime", str(summary.get('uptime', 'N/A')))
+            if self.last_cpu is not None:
+                self.set_device_fact("CPU", f"{self.last_cpu:.1f}%")
+
+    def set_device_fact(self, key, value):
+        items = self.device_info.findItems(key, Qt.MatchFlag.MatchExactly, 0)
+        if items:
+            items[0].setText(1, value)
+            return
+        theme_colors = self.theme_manager.get_colors(self._current_theme)
+        item = QTreeWidgetItem([key, value])
+        item.setForeground(0, QColor(theme_colors['text']))
+        item.setForeground(1, QColor(theme_colors['text']))
+        self.device_info.addTopLevelItem(item)
+
     def update_device_info(self, facts):
         try:
+            self.last_cpu = facts.get('cpu_usage')
             self.device_info.clear()
 
             theme_colors = self.theme_manager.get_colors(self._current_theme)
@@ -383,6 +707,8 @@ class DeviceDashboard(QMainWindow):
                 ("Uptime", str(facts.get('uptime', 'N/A'))),
                 ("Vendor", facts.get('vendor', 'N/A'))
             ]
+            if self.last_cpu is not None:
+                key_facts.append(("CPU", f"{self.last_cpu:.1f}%"))
 
             # Add each fact as a new QTreeWidgetItem
             index = 0
@@ -480,43 +806,22 @@ class DeviceDashboard(QMainWindow):
         counters = data.get('counters', {})
 
         print("\nCurrent interface history sizes:")
-        for name, history in self.interface_history.items():
-            print(f"{name}: {len(history)} points")
+        for name, size in self.interface_history.sizes().items():
+            print(f"{name}: {size} points")
 
+        hostname = getattr(self, 'current_connection', {}).get('hostname', '')
+        now = time.time()
+        samples = {}
         for name, details in interfaces.items():
-            # Get raw rate data directly from the interface details
-            rx_rate = float(details.get('input_rate', 0))  # These are in bps
-            tx_rate = float(details.get('output_rate', 0))
-            total_rate = rx_rate + tx_rate
-
-            # Get speed from bandwidth (which comes in Kbit)
-            bandwidth_str = details.get('BANDWIDTH', '10000 Kbit')  # Default to 10Mbit
-            try:
-                if 'Kbit' in bandwidth_str:
-                    speed_mbps = float(bandwidth_str.split()[0]) / 1000  # Convert Kbit to Mbit
-                elif 'Mbit' in bandwidth_str:
-                    speed_mbps = float(bandwidth_str.split()[0])
-                elif 'Gbit' in bandwidth_str:
-                    speed_mbps = float(bandwidth_str.split()[0]) * 1000
-                else:
-                    speed_mbps = 10.0  # Default to 10Mbps if parsing fails
-            except (ValueError, IndexError):
-                speed_mbps = 10.0  # Default to 10Mbps if parsing fails
-
+            # Parsed bps plus pps/errors/s from the cumulative counters
+            speed_mbps, sample = interface_sample(self.rate_engine, hostname, name, details, counters, now)
+            total_rate = sample['rx_bps'] + sample['tx_bps']
             self.interface_speeds[name] = speed_mbps
 
-            # Initialize history if needed
-            if name not in self.interface_history:
-                print(f"Initializing history for {name}")
-                self.interface_history[name] = []
-
-            # Store current rate in history
-            self.interface_history[name].append(total_rate)
-            print(f"Added point to {name} - now has {len(self.interface_history[name])} points")
-
-            # Trim history if needed
-            while len(self.interface_history[name]) > self.history_length:
-                self.interface_history[name].pop(0)
+            # Store current rates in history (O(1) ring-buffer append)
+            self.interface_history.append(name, now, sample)
+            self.top_interfaces.update(name, now, sample, speed_mbps * 1_000_000)
+            samples[name] = sample
 
             # Calculate utilization based on total rate
             utilization = (total_rate / (speed_mbps * 1_000_000)) * 100
@@ -540,8 +845,33 @@ class DeviceDashboard(QMainWindow):
                 f"{name} - Speed: {speed_mbps}Mbps, Total Rate: {total_rate / 1_000_000:.2f}Mbps, Utilization: {utilization:.2f}%")
 
         self.interfaces_tree.sortItems(0, Qt.SortOrder.AscendingOrder)
+        self.update_top_interfaces()
+        if self.history_db is not None and samples:
+            self.history_db.record_many(hostname, now, samples)
         print(f"\nUpdated {len(interfaces)} interfaces")
 
+    def update_top_interfaces(self):
+        """Redraw the top-N panel from the incrementally maintained ranking."""
+        metric = self.top_metric_combo.currentData() or 'utilization'
+        selected = [item.text(1) for item in self.top_tree.selectedItems()]
+        self.top_tree.blockSignals(True)
+        self.top_tree.clear()
+        for rank, (name, score) in enumerate(self.top_interfaces.top(metric, self.top_n), 1):
+            value = f"{score:.1f}%" if metric.startswith('utilization') else f"{score:.2f}"
+            item = QTreeWidgetItem([str(rank), name, value])
+            self.top_tree.addTopLevelItem(item)
+            item.setSelected(name in selected)
+        self.top_tree.blockSignals(False)
+
+    def select_top_interface(self):
+        """Graph the interface picked in the top-N panel."""
+        selected = self.top_tree.selectedItems()
+        if not selected:
+            return
+        matches = self.interfaces_tree.findItems(selected[0].text(1), Qt.MatchFlag.MatchExactly, 0)
+        if matches:
+            self.interfaces_tree.setCurrentItem(matches[0])
+
     def update_interface_graph(self):
         """Update the interface graph with historical data."""
         try:
@@ -554,38 +884,45 @@ class DeviceDashboard(QMainWindow):
                 print(f"No history data for interface {interface_name}")
                 return
 
-            # Get interface speed and history
+            # Coarsest history tier that still fills the visible window with enough points
             speed_mbps = self.interface_speeds.get(interface_name, 10.0)
-            history = self.interface_history[interface_name]
+            window = self.graph_window_combo.currentData() or GRAPH_WINDOWS[0][1]
+            tier = self.interface_history.best_tier(interface_name, window, GRAPH_MIN_POINTS)
+            timestamps, values = self.interface_history.window(interface_name, seconds=window, tier=tier)
+            if not len(timestamps):
+                return
+            if tier == 'raw':
+                rx, tx, rx_peak, tx_peak = values['rx_bps'], values['tx_bps'], values['rx_bps'], values['tx_bps']
+            else:
+                rx, tx = values['rx_bps_avg'], values['tx_bps_avg']
+                rx_peak, tx_peak = values['rx_bps_max'], values['tx_bps_max']
 
             print(f"\nUpdating graph for {interface_name}")
             print(f"Interface speed: {speed_mbps} Mbps")
-            print(f"History points: {len(history)}")
-
-            # Create series
+            print(f"History points: {len(timestamps)} ({tier})")
+
+            # Utilization % for every point at once; x is seconds relative to the newest point
+            scale = 100.0 / (float(speed_mbps) * 1_000_000)
+            utilization = (rx + tx) * scale
+            seconds = timestamps - timestamps[-1]
+            current_util = float(utilization[-1])
+            max_util = float(np.nanmax((rx_peak + tx_peak) * scale))
+            avg_util = float(np.nanmean(utilization))
+
+            # Window percentiles per direction from the merged bucket sketches
+            percentiles = {}
+            for field, label in (('rx_bps', 'RX'), ('tx_bps', 'TX')):
+                sketch = self.interface_history.sketch(interface_name, window, field)
+                if sketch is not None and sketch.count:
+                    p50, p95, p99 = (sketch.quantile(q) * scale for q in (0.5, 0.95, 0.99))
+                    percentiles[label] = f"{label} p50/p95/p99: {p50:.1f}/{p95:.1f}/{p99:.1f}%"
+
+            # Strided views keep the series within the point budget for any window
+            stride = max(1, -(-len(seconds) // GRAPH_MAX_POINTS))
             series = QLineSeries()
-            max_util = 0.0
-            total_util = 0.0
-            current_util = 0.0
-
-            # Process each data point
-            for i, rate_bps in enumerate(history):
-                # Convert rate to utilization percentage
-                utilization = (float(rate_bps) / (float(speed_mbps) * 1_000_000)) * 100.0
-
-                # Store current utilization for display
-                if i == len(history) - 1:
-                    current_util = utilization
-
-                # Add point to series
-                series.append(float(i), float(utilization))
-                max_util = max(max_util, utilization)
-                total_util += utilization
-
-                print(f"Point {i}: {utilization:.2f}% ({rate_bps / 1_000_000:.2f} Mbps)")
-
-            # Calculate average
-            avg_util = total_util / len(history) if history else 0
+            series.replace([QPointF(x, y) for x, y in zip(seconds[::-stride][::-1].tolist(),
+                                                           utilization[::-stride][::-1].tolist())
+                            if y == y])
 
             # Clear and reconfigure chart
             self.chart.removeAllSeries()
@@ -606,8 +943,8 @@ class DeviceDashboard(QMainWindow):
             series.attachAxis(self.axis_x)
             series.attachAxis(self.axis_y)
 
-            # Set up axis ranges
-            self.axis_x.setRange(0, 30)  # Fixed 30-second window
+            # Set up axis ranges: the selected window, ending at the newest point
+            self.axis_x.setRange(-float(window), 0)
 
             if max_util > 0:
                 new_max = math.ceil(max_util / 5.0) * 5.0 + 5.0
@@ -620,8 +957,9 @@ class DeviceDashboard(QMainWindow):
 
             # Update chart title
             self.chart.setTitle(
-                f"INTERFACE :: {interface_name} ({speed_mbps} Mbps)\n"
+                f"INTERFACE :: {interface_name} ({speed_mbps} Mbps) [{tier}]\n"
                 f"Current: {current_util:.1f}% | Max: {max_util:.1f}% | Avg: {avg_util:.1f}%"
+                + ("\n" + " | ".join(percentiles.values()) if percentiles else "")
             )
 
             # Force update
@@ -642,36 +980,13 @@ class DeviceDashboard(QMainWindow):
                 self.refresh_timer.stop()
                 return
 
-            # Clean up any existing worker thread
-            self.cleanup_worker()
-
-            # Create new thread and worker
-            conn = self.current_connection
-            print(f"Refreshing data for {conn['hostname']}")
-
-            self.worker_thread = QThread()
-            self.worker = DeviceInfoWorker(
-                conn['driver'],
-                conn['hostname'],
-                conn['username'],
-                conn['password']
-            )
-            self.worker.moveToThread(self.worker_thread)
-
-            # Connect worker signals
-            self.worker.facts_ready.connect(self.update_device_info)
-            self.worker.interfaces_ready.connect(self.update_interfaces)
-            self.worker.neighbors_ready.connect(self.update_neighbors)
-            self.worker.routes_ready.connect(self.update_routes)
-            self.worker.error.connect(self.handle_error)
-
-            # Connect thread signals
-            self.worker_thread.started.connect(self.worker.run)
-            self.worker.finished.connect(self.worker_thread.quit)
-            self.worker.finished.connect(self.worker.deleteLater)
-            self.worker_thread.finished.connect(self.worker_thread.deleteLater)
+            # Skip this cycle while the previous poll is still in flight
+            if self.worker is not None:
+                print(f"Previous poll of {self.current_connection['hostname']} still running, skipping cycle")
+                return
 
-            self.worker_thread.start()
+            print(f"Refreshing data for {self.current_connection['hostname']}")
+            self.start_poll()
 
         except Exception as e:
             print(f"Error in refresh_data: {str(e)}")
@@ -724,46 +1039,92 @@ class DeviceDashboard(QMainWindow):
         self.chart.addAxis(self.axis_x, Qt.AlignmentFlag.AlignBottom)
         self.chart.addAxis(self.axis_y, Qt.AlignmentFlag.AlignLeft)
     def update_neighbors(self, data):
-        self.lldp_tree.clear()
-        lldp = data.get('lldp', {})
-        for local_port in lldp:
-            neighbors = lldp[local_port]
-            j = 0
-            while j < len(neighbors):
-                neighbor = neighbors[j]
-                item = QTreeWidgetItem([
-                    local_port,
-                    neighbor.get('hostname', 'N/A'),
-                    neighbor.get('port', 'N/A')
-                ])
-                self.lldp_tree.addTopLevelItem(item)
-                j = j + 1
-
-        self.arp_tree.clear()
-        arp = data.get('arp', [])
-        i = 0
-        while i < len(arp):
-            entry = arp[i]
-            item = QTreeWidgetItem([
-                entry.get('ip', 'N/A'),
-                entry.get('mac', 'N/A'),
-                entry.get('interface', 'N/A')
-            ])
-            self.arp_tree.addTopLevelItem(item)
-            i = i + 1
+        self.show_tables('neighbors', data)
+
+    def show_tables(self, dataset, payload):
+        """Show a full dataset by diffing it against the rows on screen."""
+        for table, rows in table_rows(dataset, payload).items():
+            self.apply_table_diff(table, diff_rows(self.shown_rows[table], rows))
+
+    def apply_delta(self, args):
+        """Rows added, changed and removed since the last poll (DevicePoll with a TableDiffer)."""
+        dataset, delta = args
+        for table, diff in delta['tables'].items():
+            self.apply_table_diff(table, diff, reset=delta.get('reset', False))
+        if 'raw_output' in delta['fields']:
+            self.route_raw.setText(delta['fields']['raw_output'] or '')
+        routes = delta['tables'].get('routes')
+        if dataset == 'routes' and routes and (routes['added'] or routes['changed']):
+            self.resize_route_columns()
+
+    def apply_table_diff(self, table, diff, reset=False):
+        """Update a tree in place; rows that did not change keep their items."""
+        tree, items, shown = self.table_trees[table], self.table_items[table], self.shown_rows[table]
+        if reset:
+            tree.clear()
+            items.clear()
+            shown.clear()
+        removed = [key for key in diff['removed'] if key in items]
+        if len(removed) > len(items) // 4:
+            # takeTopLevelItem is O(n) per row: re-add the kept items in one pass instead
+            for key in removed:
+                del items[key], shown[key]
+            tree.invisibleRootItem().takeChildren()
+            tree.addTopLevelItems(list(items.values()))
+        else:
+            for key in removed:
+                tree.takeTopLevelItem(tree.indexOfTopLevelItem(items.pop(key)))
+                del shown[key]
+        added = []
+        for key, row in list(diff['changed'].items()) + list(diff['added'].items()):
+            shown[key] = row
+            item = items.get(key)
+            if item is None:
+                item = items[key] = QTreeWidgetItem(list(row))
+                added.append(item)
+            else:
+                for column, text in enumerate(row):
+                    item.setText(column, text)
+            if table == 'routes':
+                self.color_route(item, row)
+        if added:
+            tree.addTopLevelItems(added)
+
+    @staticmethod
+    def color_route(item, row):
+        network, mask, next_hop, protocol = row[:4]
+        color = ROUTE_COLORS.get(protocol) if next_hop != 'directly connected' else None
+        if color:
+            item.setForeground(0, QColor(color))
+        else:
+            item.setData(0, Qt.ItemDataRole.ForegroundRole, None)
 
     def handle_error(self, error_msg):
-        QMessageBox.critical(
-            self,
-            "Connection Error",
-            "Error connecting to device:\n" + error_msg
-        )
+        # Non-modal: report in the status bar and let poll_finished reschedule
+        self.poll_error = error_msg.splitlines()[0] if error_msg else 'unknown error'
+        self.statusBar().showMessage("Error: " + self.poll_error)
+
+    def closeEvent(self, event):
+        self.polling = False
         self.refresh_timer.stop()
+        self.cancel_worker()
+        for worker in self.warm_workers:
+            worker.cancel()
+        self.stop_counter_stream()
+        self.stop_collector_stream()
+        shutdown_parse_pool()
+        if self.history_db is not None:
+            self.history_db.close()
+        super().closeEvent(event)
 
     def change_theme(self, theme_name):
         self._current_theme = theme_name
         self.theme_manager.apply_theme(self, theme_name)
         self.setup_chart()
+        # Tree item colors come from the theme: redraw everything on the next poll
+        self.content_cache.forget()
+        if self.collector_worker is not None:
+            self.collector_worker.repaint()
 
     # def setup_chart(self):
     #     theme_colors = self.theme_manager.get_colors(self._current_theme)
@@ -862,109 +1223,17 @@ class DeviceDashboard(QMainWindow):
                 "Please enter a valid IP address.\nError: " + str(e)
             )
 
+    def resize_route_columns(self):
+        i = 0
+        while i < self.route_tree.columnCount():
+            self.route_tree.resizeColumnToContents(i)
+            i = i + 1
+
     def update_routes(self, route_info):
-        self.route_tree.clear()
         try:
-            structured_routes = route_info.get("structured_routes", {})
-            for prefix in structured_routes:
-                routes = structured_routes[prefix]
-                j = 0
-                while j < len(routes):
-                    route = routes[j]
-                    network, mask = prefix.split('/')
-                    item = QTreeWidgetItem([
-                        network,
-                        mask,
-                        route.get('next_hop', ''),
-                        route.get('protocol', ''),
-                        route.get('outgoing_interface', ''),
-                        str(route.get('preference', ''))
-                    ])
-                    self.route_tree.addTopLevelItem(item)
-                    j = j + 1
-
-            raw_output = route_info.get("raw_output", "")
-            self.route_raw.setText(raw_output)
-
-            lines = raw_output.split('\n')
-            current_network = None
-            current_mask = None
-            idx = 0
-            while idx < len(lines):
-                line = lines[idx].strip()
-                if line and not line.startswith('Codes:') and not line.startswith('Gateway of'):
-                    if 'is subnetted' in line:
-                        parts = line.split()
-                        current_network = parts[0]
-                    else:
-                        if (line.startswith('C') or line.startswith('L') or
-                            line.startswith('S') or line.startswith('D') or
-                            line.startswith('O') or line.startswith('B') or
-                            line.startswith('*')):
-                            parts = line.split()
-                            protocol = parts[0].replace('*', '')
-                            if 'via' in line:
-                                prefix = parts[1]
-                                if '/' not in prefix and current_network:
-                                    network = prefix
-                                else:
-                                    network, mask = prefix.split('/')
-                                via_index = 0
-                                v = 0
-                                while v < len(parts):
-                                    if parts[v] == 'via':
-                                        via_index = v
-                                    v = v + 1
-                                next_hop = parts[via_index + 1].rstrip(',')
-                                interface = ''
-                                last_part = parts[len(parts)-1]
-                                if 'Ethernet' in last_part or 'Loopback' in last_part:
-                                    interface = last_part
-                                metric = ''
-                                if '[' in line and ']' in line:
-                                    start_idx = line.index('[') + 1
-                                    end_idx = line.index(']')
-                                    metric = line[start_idx:end_idx]
-                                item = QTreeWidgetItem([
-                                    network,
-                                    mask,
-                                    next_hop,
-                                    protocol,
-                                    interface,
-                                    metric
-                                ])
-                                if protocol in ['C', 'L']:
-                                    item.setForeground(0, QColor("#22D3EE"))
-                                elif protocol == 'S':
-                                    item.setForeground(0, QColor("#10B981"))
-                                elif protocol == 'D':
-                                    item.setForeground(0, QColor("#3B82F6"))
-                                elif protocol == 'O':
-                                    item.setForeground(0, QColor("#F59E0B"))
-                                self.route_tree.addTopLevelItem(item)
-                            else:
-                                if 'is directly connected' in line:
-                                    network, mask = parts[1].split('/')
-                                    next_hop = 'directly connected'
-                                    interface = parts[len(parts)-1]
-                                    metric = ''
-                                    item = QTreeWidgetItem([
-                                        network,
-                                        mask,
-                                        next_hop,
-                                        protocol,
-                                        interface,
-                                        metric
-                                    ])
-                                    self.route_tree.addTopLevelItem(item)
-
-                idx = idx + 1
-
-            i = 0
-            while i < self.route_tree.columnCount():
-                self.route_tree.resizeColumnToContents(i)
-                i = i + 1
-
+            self.show_tables('routes', route_info)
+            self.route_raw.setText(route_info.get("raw_output", ""))
+            self.resize_route_columns()
         except Exception as e:
             print("Error updating routes:", e)
             QMessageBox.warning(
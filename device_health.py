@@ -0,0 +1,134 @@
+# device_health.py
+import random
+import socket
+import threading
+import time
+from typing import Dict, Optional
+
+CLOSED = 'closed'        # healthy, poll normally
+OPEN = 'open'            # failing, skip polls until the backoff expires
+HALF_OPEN = 'half_open'  # backoff expired and the probe answered; one trial poll
+
+
+class DeviceUnreachable(Exception):
+    """Raised instead of connecting while a device's circuit is open."""
+
+
+def tcp_probe(host: str, port: int, timeout: float = 2.0) -> bool:
+    """True when a TCP connection to host:port completes within timeout."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class DeviceHealth:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error = ''
+        self.last_success: Optional[float] = None
+
+
+class HealthTracker:
+    """
+    Per-device circuit breaker with exponential backoff.
+
+    After `threshold` consecutive failures the circuit opens and polls are
+    refused until the backoff (base * 2^n, capped, with jitter) expires.
+    The next poll then runs a TCP probe of the management port first; only
+    when it answers does one full trial poll go ahead, so a dead device
+    costs a probe timeout rather than a full SSH timeout per cycle.
+    """
+
+    def __init__(self, threshold: int = 2, base_backoff: float = 10.0, max_backoff: float = 600.0,
+                 probe_timeout: float = 2.0, jitter: float = 0.1):
+        self.threshold = threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._devices: Dict[str, DeviceHealth] = {}
+
+    def _health(self, host: str) -> DeviceHealth:
+        return self._devices.setdefault(host, DeviceHealth())
+
+    def backoff(self, failures: int) -> float:
+        delay = min(self.max_backoff, self.base_backoff * 2 ** max(0, failures - self.threshold))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def check(self, host: str, port: Optional[int] = None):
+        """
+        Gate a poll.  Raises DeviceUnreachable while the circuit is open or
+        the probe fails; `port=None` skips the probe (e.g. replay devices).
+        """
+        with self._lock:
+            health = self._health(host)
+            if health.state == CLOSED:
+                return
+            if health.state == OPEN and time.monotonic() < health.retry_at:
+                raise DeviceUnreachable(f"{host} skipped, retry in {self.retry_in(host):.0f}s "
+                                        f"(last error: {health.last_error})")
+
+        if port is not None and not tcp_probe(host, port, self.probe_timeout):
+            self.record_failure(host, f"no answer on TCP port {port}")
+            raise DeviceUnreachable(f"{host} did not answer on TCP port {port}")
+
+        with self._lock:
+            self._health(host).state = HALF_OPEN
+
+    def record_success(self, host: str):
+        with self._lock:
+            health = self._health(host)
+            health.state = CLOSED
+            health.failures = 0
+            health.retry_at = 0.0
+            health.last_success = time.time()
+
+    def record_failure(self, host: str, error: str = '') -> float:
+        """Count a failure; returns seconds until the device may be polled again."""
+        with self._lock:
+            health = self._health(host)
+            health.failures += 1
+            health.last_error = error
+            if health.failures < self.threshold and health.state == CLOSED:
+                return 0.0
+            delay = self.backoff(health.failures)
+            health.state = OPEN
+            health.retry_at = time.monotonic() + delay
+            return delay
+
+    def retry_in(self, host: str) -> float:
+        health = self._devices.get(host)
+        if health is None or health.state != OPEN:
+            return 0.0
+        return max(0.0, health.retry_at - time.monotonic())
+
+    def state(self, host: str) -> str:
+        with self._lock:
+            return self._health(host).state
+
+    def reset(self, host: str):
+        with self._lock:
+            self._devices.pop(host, None)
+
+    def summary(self) -> Dict[str, dict]:
+        with self._lock:
+            return {host: {'state': h.state, 'failures': h.failures, 'last_error': h.last_error,
+                           'retry_in': round(self.retry_in(host), 1)}
+                    for host, h in self._devices.items()}
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_health_tracker() -> HealthTracker:
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = HealthTracker()
+        return _tracker
@@ -1,241 +1,171 @@
 # device_info_worker.py
 
+import copy
 import json
-import traceback
-from pprint import pprint
+import threading
 
-from napalm import get_network_driver
-from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
 
-from custom_driver import CustomDriver
+from channel_pool import DEFAULT_MAX_CHANNELS
+from collector import DevicePoll, PollCancelled, telemetry_fetch, snmp_fetch
+from stream_api import DATASETS, DeviceState, rows_delta
+from table_delta import TABLES
 
-class DeviceInfoWorker(QThread):
-    """Worker thread to handle device operations without blocking the UI"""
+# Kept for callers that catch the old name
+WorkerCancelled = PollCancelled
+
+
+class WorkerSignals(QObject):
+    """Signals for DeviceInfoWorker; QRunnable itself cannot carry signals."""
     facts_ready = pyqtSignal(object)
     interfaces_ready = pyqtSignal(object)
     neighbors_ready = pyqtSignal(object)
     routes_ready = pyqtSignal(object)
     error = pyqtSignal(str)
-
-    def __init__(self, driver, hostname: str, username: str, password: str):
+    timing_ready = pyqtSignal(object)
+    # (dataset, small payload of volatile fields) when a dataset matches the last poll
+    unchanged = pyqtSignal(str, object)
+    # (dataset, rows added/changed/removed) in place of neighbors_ready/routes_ready
+    delta = pyqtSignal(str, object)
+    finished = pyqtSignal()
+
+
+class DeviceInfoWorker(QRunnable):
+    """
+    Pooled job to handle one poll cycle of device operations without
+    blocking the UI.  The collection itself is collector.DevicePoll; this
+    only relays its events as Qt signals.
+    """
+
+    def __init__(self, driver, hostname: str, username: str, password: str, record_dir=None,
+                 collect_cpu=False, max_channels=DEFAULT_MAX_CHANNELS, collect_interfaces=True,
+                 transport='ssh', api_port=None, api_scheme='https', route_probe=False,
+                 content_cache=None, table_differ=None, collect_tables=True):
         super().__init__()
-        self.driver = driver
+        # The dashboard keeps a reference and drops it on finished
+        self.setAutoDelete(False)
+        self.signals = WorkerSignals()
         self.hostname = hostname
-        self.username = username
-        self.password = password
+        self.poll = DevicePoll(
+            driver, hostname, username, password, record_dir=record_dir, collect_cpu=collect_cpu,
+            max_channels=max_channels, collect_interfaces=collect_interfaces, transport=transport,
+            api_port=api_port, api_scheme=api_scheme, route_probe=route_probe,
+            content_cache=content_cache, table_differ=table_differ, collect_tables=collect_tables,
+            emit=self._relay)
+
+    def _relay(self, event, *args):
+        getattr(self.signals, event).emit(*args)
+
+    def cancel(self):
+        """Request cancellation; takes effect at the next stage boundary."""
+        self.poll.cancel()
+
+    def is_cancelled(self):
+        return self.poll.is_cancelled()
 
     def run(self):
-        try:
-            device_open = False
-
-            # Initialize NAPALM driver
-            self.driver = get_network_driver(self.driver)
-            driver = self.driver
-
-            # Handle NXOS - switch to SSH if detected
-            if 'nxos' in str(driver):
-                self.driver = 'nxos_ssh'
-                optional_args = {
-                    'transport': 'ssh',
-                    'port': 22
-                }
-                driver = get_network_driver(self.driver)
-                device = driver(
-                    hostname=self.hostname,
-                    username=self.username,
-                    password=self.password,
-                    optional_args=optional_args
-                )
-
-            # Handle EOS with proper scope for SSH connection
-            elif 'eos' in str(self.driver):
-                optional_args = {
-                     'transport': 'ssh',
-                'use_eapi': False
-                }
-
-                device = driver(
-                    hostname=self.hostname,
-                    username=self.username,
-                    password=self.password,
-                    optional_args=optional_args
-                )
-
-            # Handle all other device types
-            else:
-                device = driver(
-                    hostname=self.hostname,
-                    username=self.username,
-                    password=self.password
-                )
-
-            device.open()
-            device_open = True
-            self.facts = device.get_facts()
-
-            # If "Kernel" in hostname, it's possibly a Nexus device using ios driver
-            if "Kernel" in self.facts['hostname']:
-                device.close()
-                driver = get_network_driver('nxos_ssh')
-                optional_args = {
-                    'transport': 'ssh',
-                    'port': 22
-                }
-                device = driver(
-                    hostname=self.hostname,
-                    username=self.username,
-                    password=self.password,
-                    optional_args=optional_args
-                )
-                device.open()
-                device_open = True
-
-            spanning_tree_output = device.cli(['show spanning-tree'])
-            if 'root' in str(spanning_tree_output).lower():
-                is_switch = True
-            else:
-                is_switch = False
+        self.poll.run()
+
 
-            self.facts = device.get_facts()
-            self.facts['is_switch'] = is_switch
-            self.facts_ready.emit(self.facts)
+class CounterStreamWorker(QRunnable):
+    """
+    Long-running job that republishes interface counters for one device
+    through interfaces_ready from a non-CLI source (streaming telemetry or
+    SNMP), in place of CLI interface polling.  `fetch` returns the
+    interfaces/counters payload.
+    """
 
-            # Get interface info using custom parser
-            custom = CustomDriver(device)
-            interfaces, counters = custom.get_interfaces_custom()
-            self.interfaces_ready.emit({"interfaces": interfaces, "counters": counters})
-            print("-------------- parsed data ------------------")
-            pprint(interfaces)
+    def __init__(self, hostname: str, fetch, interval: float = 1.0):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = WorkerSignals()
+        self.hostname = hostname
+        self.fetch = fetch
+        self.interval = interval
+        self._cancelled = threading.Event()
 
-            # Get neighbor info using NAPALM
-            lldp = device.get_lldp_neighbors()
+    def cancel(self):
+        self._cancelled.set()
 
-            if not '4.18.4F' in self.facts.get('os_version',''):
-                arp = device.get_arp_table()
+    def run(self):
+        try:
+            while not self._cancelled.is_set():
+                try:
+                    snapshot = self.fetch()
+                    if snapshot['interfaces'] and not self._cancelled.is_set():
+                        self.signals.interfaces_ready.emit(snapshot)
+                except Exception as e:
+                    print(f"Counter stream error for {self.hostname}:", str(e))
+                self._cancelled.wait(self.interval)
+        finally:
+            self.signals.finished.emit()
+
+
+class CollectorStreamWorker(QRunnable):
+    """
+    Long-running job that mirrors one device from a collector's streaming
+    API (stream_api) instead of polling it.  Each dataset a snapshot or
+    delta changes is emitted in full through the usual *_ready signals;
+    neighbors and routes go through `delta` as row changes, exactly as
+    from a local poll with a TableDiffer.
+    """
+
+    def __init__(self, url: str, hostname: str, retry_interval: float = 5.0):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = WorkerSignals()
+        self.url = url.rstrip('/') + '/ws'
+        self.hostname = hostname
+        self.retry_interval = retry_interval
+        self._cancelled = threading.Event()
+        self._repaint = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def repaint(self):
+        """Re-emit every dataset, e.g. after a theme change."""
+        self._repaint.set()
+
+    def _emit_datasets(self, state, datasets):
+        for dataset in datasets:
+            if self._cancelled.is_set():
+                break
+            if dataset in TABLES:
+                self.signals.delta.emit(dataset, state.table_delta(dataset))
             else:
-                arp = {}
-            self.neighbors_ready.emit({"lldp": lldp, "arp": arp})
-
-            # Get route information
-            try:
-                # Get raw CLI output for complete routing table
-                all_routes_output = device.cli(["show ip route"])
-                # Try to get structured route data for default route
-                default_route = {}
+                # Later deltas patch state.data in place on this thread: hand the GUI its own copy
+                getattr(self.signals, dataset + '_ready').emit(copy.deepcopy(state.data[dataset]))
+
+    def run(self):
+        from websockets.sync.client import connect
+        try:
+            while not self._cancelled.is_set():
                 try:
-                    default_route = device.get_route_to("0.0.0.0/0")
-                except:
-                    pass  # Some platforms might not support this
-
-                route_info = {
-                    "structured_routes": default_route,
-                    "raw_output": all_routes_output.get("show ip route", "")
-                }
-                self.routes_ready.emit(route_info)
-
-            except Exception as e:
-                print("Error getting routes:", str(e))
-                self.routes_ready.emit({})
-
-            device.close()
-
-        except Exception as e:
-            traceback.print_exc()
-            self.error.emit(str(e))    # def run(self):
-    #     try:
-    #         # Initialize NAPALM driver
-    #         self.driver = get_network_driver(self.driver)
-    #         driver = self.driver
-    #
-    #         optional_args = {}
-    #
-    #         # Handle NXOS - switch to SSH if detected
-    #         if 'nxos' in str(driver):
-    #             self.driver = 'nxos_ssh'
-    #             optional_args = {
-    #                 'transport': 'ssh',
-    #                 'port': 22
-    #             }
-    #             driver = get_network_driver(self.driver)
-    #
-    #         # Handle EOS - force SSH instead of pyeapi
-    #         elif self.driver == 'eos':
-    #             optional_args = {
-    #                 'transport': 'ssh',
-    #                 'use_eapi': False
-    #             }
-    #
-    #         # Initialize device with optional arguments
-    #         device = driver(
-    #             hostname=self.hostname,
-    #             username=self.username,
-    #             password=self.password,
-    #             optional_args=optional_args
-    #         )
-    #
-    #         device.open()
-    #         self.facts = device.get_facts()
-    #
-    #         # If "Kernel" in hostname, it's possibly a Nexus device using ios driver
-    #         if "Kernel" in self.facts['hostname']:
-    #             device.close()
-    #             driver = get_network_driver('nxos_ssh')
-    #             optional_args = {
-    #                 'transport': 'ssh',
-    #                 'port': 22
-    #             }
-    #             device = driver(
-    #                 hostname=self.hostname,
-    #                 username=self.username,
-    #                 password=self.password,
-    #                 optional_args=optional_args
-    #             )
-    #             device.open()
-    #
-    #         spanning_tree_output = device.cli(['show spanning-tree'])
-    #         if 'root' in str(spanning_tree_output).lower():
-    #             is_switch = True
-    #         else:
-    #             is_switch = False
-    #
-    #         self.facts = device.get_facts()
-    #         self.facts['is_switch'] = is_switch
-    #         self.facts_ready.emit(self.facts)
-    #
-    #         # Get interface info using custom parser
-    #         custom = CustomDriver(device)
-    #         interfaces, counters = custom.get_interfaces_custom()
-    #         self.interfaces_ready.emit({"interfaces""": interfaces, "counters": counters})
-    #         print("-------------- parsed data ------------------")
-    #         pprint(interfaces)
-    #         # Get neighbor info using NAPALM
-    #         lldp = device.get_lldp_neighbors()
-    #         arp = device.get_arp_table()
-    #         self.neighbors_ready.emit({"lldp": lldp, "arp": arp})
-    #
-    #         # Get route information
-    #         try:
-    #             # Get raw CLI output for complete routing table
-    #             all_routes_output = device.cli(["show ip route"])
-    #             # Try to get structured route data for default route
-    #             default_route = {}
-    #             try:
-    #                 default_route = device.get_route_to("0.0.0.0/0")
-    #             except:
-    #                 pass  # Some platforms might not support this
-    #
-    #             route_info = {
-    #                 "structured_routes": default_route,
-    #                 "raw_output": all_routes_output.get("show ip route", "")
-    #             }
-    #             self.routes_ready.emit(route_info)
-    #
-    #         except Exception as e:
-    #             print("Error getting routes:", str(e))
-    #             self.routes_ready.emit({})
-    #
-    #         device.close()
-    #
-    #     except Exception as e:
-    #         traceback.print_exc()
-    #         self.error.emit(str(e))
+                    with connect(self.url, open_timeout=10) as websocket:
+                        websocket.send(json.dumps({'subscribe': [self.hostname]}))
+                        state = DeviceState()
+                        while not self._cancelled.is_set():
+                            if self._repaint.is_set():
+                                self._repaint.clear()
+                                self._emit_datasets(state, [d for d in DATASETS
+                                                            if d in state.data or d in state.tables])
+                            try:
+                                message = json.loads(websocket.recv(timeout=0.5))
+                            except TimeoutError:
+                                continue
+                            if message['type'] == 'error':
+                                self.signals.error.emit(str(message['data']))
+                            elif message['type'] == 'timing':
+                                self.signals.timing_ready.emit(message['data'])
+                            elif message['type'] == 'rows':
+                                if state.apply(message) and not self._cancelled.is_set():
+                                    self.signals.delta.emit(message['dataset'], rows_delta(message))
+                            else:
+                                self._emit_datasets(state, state.apply(message))
+                except Exception as e:
+                    if not self._cancelled.is_set():
+                        self.signals.error.emit(f"Collector stream {self.url}: {e}")
+                        self._cancelled.wait(self.retry_interval)
+        finally:
+            self.signals.finished.emit()
@@ -0,0 +1,323 @@
+# history_db.py
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from history_store import (FIELDS, TIERS, ROLLUP_COLUMNS, COUNT_COLUMNS, SKETCH_FIELDS, SKETCH_KEY,
+                           BucketAccumulator)
+from quantile_sketch import merge_sketches
+
+DEFAULT_RETENTION = 7 * 86400
+# Rollup tiers outlive raw samples
+DEFAULT_TIER_RETENTION = {'1m': 30 * 86400, '1h': 400 * 86400}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    series_id INTEGER PRIMARY KEY,
+    device TEXT NOT NULL,
+    interface TEXT NOT NULL,
+    UNIQUE (device, interface)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    series_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    {columns},
+    PRIMARY KEY (series_id, ts)
+) WITHOUT ROWID;
+""".format(columns=',\n    '.join(f'{field} REAL' for field in FIELDS)) + "".join("""
+CREATE TABLE IF NOT EXISTS rollup_{tier} (
+    series_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    {columns},
+    {counts},
+    {sketches},
+    PRIMARY KEY (series_id, ts)
+) WITHOUT ROWID;
+""".format(tier=tier, columns=',\n    '.join(f'{column} REAL' for column in ROLLUP_COLUMNS),
+           counts=',\n    '.join(f'{column} INTEGER' for column in COUNT_COLUMNS),
+           sketches=',\n    '.join(f'{field}_sketch BLOB' for field in SKETCH_FIELDS)) for tier in TIERS)
+
+SKETCH_COLUMNS = tuple(f'{field}_sketch' for field in SKETCH_FIELDS)
+
+
+class HistoryDB:
+    """
+    Persistent interface history in SQLite (WAL mode).
+
+    record() only enqueues; a writer thread drains the queue and inserts in
+    batches, one transaction per flush, so collection never waits on disk.
+    Samples are clustered by (series_id, ts), which serves time-range
+    queries for one interface straight from the primary key.  The writer
+    also compacts periodically: rows older than `retention` are deleted
+    series by series, then the WAL is checkpointed and free pages released.
+
+    The writer rolls samples into 1m and 1h buckets (min/max/avg/last, plus
+    a serialized DDSketch per SKETCH_FIELDS entry) as they are inserted and
+    writes each bucket once it closes; every tier table has its own
+    retention.  Buckets still open at shutdown are written partial and
+    resumed from disk when their series is next sampled.
+    """
+
+    def __init__(self, path: str, retention: float = DEFAULT_RETENTION, flush_interval: float = 1.0,
+                 batch_size: int = 10000, compact_interval: float = 3600.0, max_queue: int = 100000,
+                 tier_retention: Optional[Dict[str, float]] = None):
+        self.path = path
+        self.retention = retention
+        self.tier_retention = dict(DEFAULT_TIER_RETENTION, **(tier_retention or {}))
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.compact_interval = compact_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._series: Dict[tuple, int] = {}
+        self._open: Dict[tuple, BucketAccumulator] = {}  # (series_id, tier) -> open bucket
+        self._local = threading.local()
+        self._stop = threading.Event()
+
+        # auto_vacuum only takes effect on a new database, before WAL mode or any
+        # table writes its header, so it gets a bare connection first
+        bare = sqlite3.connect(self.path, timeout=30.0)
+        bare.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        bare.close()
+        connection = self._connect()
+        connection.executescript(_SCHEMA)
+        self._migrate(connection)
+        connection.commit()
+        connection.close()
+        self._writer = threading.Thread(target=self._run, name="history-db-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30.0)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _migrate(self, connection):
+        # Rollup tables created before sketches and counts were kept lack their columns
+        for tier in TIERS:
+            existing = {row[1] for row in connection.execute(f"PRAGMA table_info(rollup_{tier})")}
+            for column in COUNT_COLUMNS:
+                if column not in existing:
+                    connection.execute(f"ALTER TABLE rollup_{tier} ADD COLUMN {column} INTEGER")
+            for column in SKETCH_COLUMNS:
+                if column not in existing:
+                    connection.execute(f"ALTER TABLE rollup_{tier} ADD COLUMN {column} BLOB")
+
+    def _reader(self):
+        # Readers get their own connection per thread; WAL lets them run beside the writer
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    # -- collection side ---------------------------------------------------
+
+    def record(self, device: str, interface: str, timestamp: float, values: Dict[str, float]):
+        """Queue one sample; never blocks."""
+        self.record_many(device, timestamp, {interface: values})
+
+    def record_many(self, device: str, timestamp: float, samples: Dict[str, Dict[str, float]]):
+        """
+        Queue one poll's samples ({interface: values}) as a single item; never
+        blocks.  Samples are dropped (and counted) if the writer falls behind.
+        """
+        rows = [(device, interface, timestamp) + tuple(values.get(field) for field in FIELDS)
+                for interface, values in samples.items()]
+        try:
+            self._queue.put_nowait(rows)
+        except queue.Full:
+            self.dropped += len(rows)
+
+    # -- writer thread -----------------------------------------------------
+
+    def _series_id(self, connection, device, interface):
+        key = (device, interface)
+        series_id = self._series.get(key)
+        if series_id is None:
+            connection.execute("INSERT OR IGNORE INTO series (device, interface) VALUES (?, ?)", key)
+            series_id = connection.execute(
+                "SELECT series_id FROM series WHERE device = ? AND interface = ?", key).fetchone()[0]
+            self._series[key] = series_id
+        return series_id
+
+    def _drain(self, block_for: float) -> List[tuple]:
+        rows = []
+        try:
+            rows.extend(self._queue.get(timeout=block_for))
+            while len(rows) < self.batch_size:
+                rows.extend(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return rows
+
+    def _write(self, connection, rows):
+        placeholders = ', '.join('?' * (2 + len(FIELDS)))
+        samples = [(self._series_id(connection, row[0], row[1]),) + row[2:] for row in rows]
+        with connection:
+            connection.executemany(f"INSERT OR REPLACE INTO samples VALUES ({placeholders})", samples)
+            self._write_buckets(connection, self._roll_up(samples, connection=connection))
+
+    def _roll_up(self, samples, flush=False, connection=None):
+        """Feed samples to the open buckets; returns {tier: [closed bucket rows]}."""
+        closed = {tier: [] for tier in TIERS}
+        for sample in samples:
+            series_id, timestamp, values = sample[0], sample[1], sample[2:]
+            for tier, width in TIERS.items():
+                accumulator = self._open.get((series_id, tier))
+                if accumulator is None:
+                    accumulator = self._open[(series_id, tier)] = BucketAccumulator(width)
+                    if connection is not None:
+                        self._resume(connection, series_id, tier, accumulator, timestamp)
+                bucket = accumulator.add_row(timestamp, values)
+                if bucket:
+                    closed[tier].append((series_id, bucket))
+        if flush:
+            for (series_id, tier), accumulator in self._open.items():
+                bucket = accumulator.flush()
+                if bucket:
+                    closed[tier].append((series_id, bucket))
+        return closed
+
+    def _resume(self, connection, series_id, tier, accumulator, timestamp):
+        # A bucket flushed partial at shutdown is extended, not replaced, by later samples
+        start = timestamp - timestamp % TIERS[tier]
+        columns = ROLLUP_COLUMNS + COUNT_COLUMNS + SKETCH_COLUMNS
+        row = connection.execute(f"SELECT {', '.join(columns)} FROM rollup_{tier} WHERE series_id = ? AND ts = ?",
+                                 (series_id, start)).fetchone()
+        if row is None:
+            return
+        values = dict(zip(columns, row))
+        if any(values[column] is None for column in COUNT_COLUMNS):
+            return  # written before counts were kept: cannot be merged
+        accumulator.seed(start, values, {field: values[f'{field}_sketch'] for field in SKETCH_FIELDS})
+
+    def _write_buckets(self, connection, closed):
+        columns = ('series_id', 'ts') + ROLLUP_COLUMNS + COUNT_COLUMNS + SKETCH_COLUMNS
+        sql = "INSERT OR REPLACE INTO rollup_{tier} ({columns}) VALUES ({placeholders})"
+        for tier, buckets in closed.items():
+            if buckets:
+                connection.executemany(
+                    sql.format(tier=tier, columns=', '.join(columns), placeholders=', '.join('?' * len(columns))),
+                    [(series_id, start) + tuple(row[column] for column in ROLLUP_COLUMNS + COUNT_COLUMNS)
+                     + tuple(row[SKETCH_KEY].get(field) for field in SKETCH_FIELDS)
+                     for series_id, (start, row) in buckets])
+
+    def _run(self):
+        connection = self._connect()
+        next_compaction = time.monotonic() + self.compact_interval
+        while not (self._stop.is_set() and self._queue.empty()):
+            rows = self._drain(self.flush_interval)
+            if rows:
+                try:
+                    self._write(connection, rows)
+                except sqlite3.Error as e:
+                    print(f"History DB write of {len(rows)} samples failed:", str(e))
+            if time.monotonic() >= next_compaction:
+                self._compact(connection)
+                next_compaction = time.monotonic() + self.compact_interval
+        # Keep the partial buckets too; after a restart _resume() picks them up again
+        try:
+            with connection:
+                self._write_buckets(connection, self._roll_up([], flush=True))
+        except sqlite3.Error as e:
+            print("History DB rollup flush failed:", str(e))
+        connection.close()
+
+    def _compact(self, connection):
+        now = time.time()
+        cutoffs = {'samples': now - self.retention}
+        cutoffs.update({f'rollup_{tier}': now - self.tier_retention[tier] for tier in TIERS})
+        try:
+            series_ids = [row[0] for row in connection.execute("SELECT series_id FROM series")]
+            for series_id in series_ids:
+                with connection:
+                    for table, cutoff in cutoffs.items():
+                        connection.execute(f"DELETE FROM {table} WHERE series_id = ? AND ts < ?",
+                                           (series_id, cutoff))
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            connection.execute("PRAGMA incremental_vacuum")
+        except sqlite3.Error as e:
+            print("History DB compaction failed:", str(e))
+
+    # -- query side --------------------------------------------------------
+
+    def interfaces(self, device: str) -> List[str]:
+        rows = self._reader().execute(
+            "SELECT interface FROM series WHERE device = ? ORDER BY interface", (device,))
+        return [row[0] for row in rows]
+
+    def query(self, device: str, interface: str, start: Optional[float] = None,
+              end: Optional[float] = None, limit: Optional[int] = None, tier: str = 'raw'):
+        """
+        Samples (or, for a tier, closed rollup buckets) for one interface in
+        [start, end] as (timestamps, {column: values}) NumPy arrays, oldest
+        first.  `limit` keeps the newest rows.
+        """
+        if tier == 'raw':
+            table, columns = 'samples', FIELDS
+        elif tier in TIERS:
+            table, columns = f'rollup_{tier}', ROLLUP_COLUMNS
+        else:
+            raise ValueError(f"Unknown history tier {tier!r}")
+        sql = (f"SELECT ts, {', '.join(columns)} FROM {table} JOIN series USING (series_id) "
+               "WHERE device = ? AND interface = ? AND ts >= ? AND ts <= ? ORDER BY ts DESC")
+        params = [device, interface, start if start is not None else float('-inf'),
+                  end if end is not None else float('inf')]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._reader().execute(sql, params).fetchall()[::-1]
+        data = np.array(rows, dtype=np.float64).reshape(len(rows), 1 + len(columns))
+        return data[:, 0], {column: data[:, i + 1] for i, column in enumerate(columns)}
+
+    def sketches(self, device: str, interface: str, start: Optional[float] = None,
+                 end: Optional[float] = None, limit: Optional[int] = None, tier: str = '1m'):
+        """
+        Closed-bucket sketches for one interface as (bucket starts, [{field:
+        bytes}]), oldest first, for HistoryStore.extend_sketches().
+        """
+        if tier not in TIERS:
+            raise ValueError(f"Unknown history tier {tier!r}")
+        sql = (f"SELECT ts, {', '.join(SKETCH_COLUMNS)} FROM rollup_{tier} JOIN series USING (series_id) "
+               "WHERE device = ? AND interface = ? AND ts >= ? AND ts <= ? ORDER BY ts DESC")
+        params = [device, interface, start if start is not None else float('-inf'),
+                  end if end is not None else float('inf')]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._reader().execute(sql, params).fetchall()[::-1]
+        return ([row[0] for row in rows],
+                [{field: blob for field, blob in zip(SKETCH_FIELDS, row[1:]) if blob is not None} for row in rows])
+
+    def quantiles(self, series, start: float, end: Optional[float] = None, field: str = 'rx_bps',
+                  tier: str = '1h', qs=(0.5, 0.95, 0.99)):
+        """
+        Quantiles of `field` across every bucket of the given (device,
+        interface) pairs in [start, end], merged in one pass: e.g. p95 over a
+        month for a whole group of uplinks across devices.
+        """
+        if field not in SKETCH_FIELDS:
+            raise ValueError(f"No sketches kept for {field!r}")
+        if tier not in TIERS:
+            raise ValueError(f"Unknown history tier {tier!r}")
+        sql = (f"SELECT {field}_sketch FROM rollup_{tier} JOIN series USING (series_id) "
+               "WHERE device = ? AND interface = ? AND ts >= ? AND ts <= ? "
+               f"AND {field}_sketch IS NOT NULL")
+        connection = self._reader()
+        end = end if end is not None else float('inf')
+        merged = merge_sketches(row[0] for device, interface in series
+                                for row in connection.execute(sql, (device, interface, start, end)))
+        return merged.quantiles(qs) if merged is not None else {q: None for q in qs}
+
+    def close(self):
+        """Flush everything queued, then stop the writer."""
+        self._stop.set()
+        self._writer.join()
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
@@ -0,0 +1,347 @@
+# history_store.py
+import math
+from collections import deque
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+from quantile_sketch import DDSketch, merge_sketches
+
+# Per-sample series kept for every interface
+FIELDS = ('rx_bps', 'tx_bps', 'rx_pps', 'tx_pps', 'rx_errors_ps', 'tx_errors_ps')
+DEFAULT_CAPACITY = 4096
+
+# Rollup tiers: bucket width in seconds and buckets retained in memory
+TIERS = {'1m': 60, '1h': 3600}
+TIER_CAPACITY = {'1m': 1440, '1h': 720}  # one day of minutes, thirty days of hours
+STATS = ('min', 'max', 'avg', 'last')
+ROLLUP_COLUMNS = tuple(f'{field}_{stat}' for field in FIELDS for stat in STATS)
+# Samples behind each field's avg; finished bucket rows carry them so a
+# stored partial bucket can be resumed (BucketAccumulator.seed)
+COUNT_COLUMNS = tuple(f'{field}_count' for field in FIELDS)
+
+# Fields with a quantile sketch per rollup bucket; a finished bucket row
+# carries them as {field: DDSketch.to_bytes()} under SKETCH_KEY
+SKETCH_FIELDS = ('rx_bps', 'tx_bps')
+SKETCH_KEY = 'sketches'
+_SKETCH_INDEX = tuple(FIELDS.index(field) for field in SKETCH_FIELDS)
+
+
+class InterfaceRing:
+    """
+    Fixed-capacity ring of (timestamp, columns...) samples in contiguous
+    NumPy arrays.
+
+    Every sample is written twice, at i and i + capacity, so the most
+    recent n samples are always one contiguous slice: append is O(1) and
+    window() returns views, never copies.  Views stay valid until the
+    slots they cover are overwritten, so copy them before keeping them.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, columns=FIELDS):
+        if capacity < 1:
+            raise ValueError("History capacity must be at least 1")
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self._timestamps = np.zeros(2 * capacity, dtype=np.float64)
+        self._values = np.zeros((len(self.columns), 2 * capacity), dtype=np.float64)
+        self._next = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp: float, values: Dict[str, float]):
+        i = self._next
+        j = i + self.capacity
+        self._timestamps[i] = self._timestamps[j] = timestamp
+        for row, column in enumerate(self.columns):
+            self._values[row, i] = self._values[row, j] = values.get(column, np.nan)
+        self._next = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def extend(self, timestamps, values: Dict[str, np.ndarray]):
+        """Append many samples at once (oldest first), e.g. backfilled from disk."""
+        timestamps = np.asarray(timestamps, dtype=np.float64)[-self.capacity:]
+        n = len(timestamps)
+        if not n:
+            return
+        slots = (self._next + np.arange(n)) % self.capacity
+        for offset in (0, self.capacity):
+            self._timestamps[slots + offset] = timestamps
+            for row, column in enumerate(self.columns):
+                data = values.get(column)
+                self._values[row, slots + offset] = np.nan if data is None else np.asarray(data)[-n:]
+        self._next = int((self._next + n) % self.capacity)
+        self.count = min(self.count + n, self.capacity)
+
+    def _bounds(self, points: int) -> Tuple[int, int]:
+        # [next, next + capacity) holds the last `capacity` samples, oldest first
+        end = self._next + self.capacity
+        return end - points, end
+
+    def window(self, seconds: Optional[float] = None, points: Optional[int] = None):
+        """
+        Newest samples as (timestamps, {column: values}) views, limited to
+        the last `points` samples and/or the last `seconds` before the
+        newest sample.
+        """
+        n = self.count if points is None else min(points, self.count)
+        start, end = self._bounds(n)
+        timestamps = self._timestamps[start:end]
+        if seconds is not None and n:
+            first = int(np.searchsorted(timestamps, timestamps[-1] - seconds, side='left'))
+            start += first
+            timestamps = timestamps[first:]
+        return timestamps, {column: self._values[row, start:end] for row, column in enumerate(self.columns)}
+
+    def count_since(self, timestamp: float) -> int:
+        """Number of retained samples at or after `timestamp`."""
+        start, end = self._bounds(self.count)
+        return end - start - int(np.searchsorted(self._timestamps[start:end], timestamp, side='left'))
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        if not self.count:
+            return None
+        i = (self._next - 1) % self.capacity
+        sample = {column: float(self._values[row, i]) for row, column in enumerate(self.columns)}
+        sample['timestamp'] = float(self._timestamps[i])
+        return sample
+
+
+class BucketAccumulator:
+    """
+    Running min/max/sum/count/last per field, and a DDSketch per
+    SKETCH_FIELDS entry, for one series' open bucket.  add() returns the
+    previous bucket, finalized, when a sample starts a new one, so tiers are
+    maintained incrementally without rescanning samples.  Plain floats
+    rather than NumPy: per-sample work on six values is dominated by call
+    overhead.
+    """
+
+    def __init__(self, width: float):
+        self.width = width
+        self.start: Optional[float] = None
+        self._reset()
+
+    def _reset(self):
+        n = len(FIELDS)
+        self._min = [math.inf] * n
+        self._max = [-math.inf] * n
+        self._sum = [0.0] * n
+        self._count = [0] * n
+        self._last = [math.nan] * n
+        self.sketches = {field: DDSketch() for field in SKETCH_FIELDS}
+
+    def add(self, timestamp: float, values: Dict[str, float]) -> Optional[Tuple[float, Dict[str, float]]]:
+        return self.add_row(timestamp, [values.get(field) for field in FIELDS])
+
+    def add_row(self, timestamp: float, row) -> Optional[Tuple[float, Dict[str, float]]]:
+        """add() for values already in FIELDS order; None or NaN means missing."""
+        start = timestamp - timestamp % self.width
+        finished = None
+        if self.start is not None and start != self.start:
+            if start < self.start:
+                return None  # late sample for a closed bucket
+            finished = self.flush()
+        self.start = start
+
+        for i, value in enumerate(row):
+            if value is None or value != value:
+                continue
+            if value < self._min[i]:
+                self._min[i] = value
+            if value > self._max[i]:
+                self._max[i] = value
+            self._sum[i] += value
+            self._count[i] += 1
+            self._last[i] = value
+        for i, field in zip(_SKETCH_INDEX, SKETCH_FIELDS):
+            self.sketches[field].add(row[i])
+        return finished
+
+    def flush(self) -> Optional[Tuple[float, Dict[str, float]]]:
+        """
+        Finalize the open bucket as (bucket_start, {rollup column: value}),
+        with the bucket's serialized sketches under SKETCH_KEY.
+        """
+        if self.start is None:
+            return None
+        row = {}
+        for i, field in enumerate(FIELDS):
+            count = self._count[i]
+            row[f'{field}_min'] = self._min[i] if count else math.nan
+            row[f'{field}_max'] = self._max[i] if count else math.nan
+            row[f'{field}_avg'] = self._sum[i] / count if count else math.nan
+            row[f'{field}_last'] = self._last[i]
+            row[f'{field}_count'] = count
+        row[SKETCH_KEY] = {field: sketch.to_bytes() for field, sketch in self.sketches.items() if sketch.count}
+        bucket = (self.start, row)
+        self.start = None
+        self._reset()
+        return bucket
+
+    def seed(self, start: float, row: Dict[str, float], sketches: Dict[str, bytes]):
+        """
+        Resume a partial bucket written earlier (e.g. before a restart) from
+        its rollup columns, COUNT_COLUMNS and serialized sketches, so later
+        samples extend it instead of replacing it.
+        """
+        self.start = start
+        self._reset()
+        for i, field in enumerate(FIELDS):
+            count = row.get(f'{field}_count') or 0
+            if not count:
+                continue
+            self._min[i] = row[f'{field}_min']
+            self._max[i] = row[f'{field}_max']
+            self._sum[i] = row[f'{field}_avg'] * count
+            self._count[i] = count
+            self._last[i] = row[f'{field}_last']
+        for field, data in sketches.items():
+            if data is not None and field in self.sketches:
+                self.sketches[field] = DDSketch.from_bytes(data)
+
+
+class SeriesHistory:
+    """
+    Raw ring plus, per tier, a rollup ring, the closed buckets' serialized
+    sketches and the open bucket, for one interface.
+    """
+
+    def __init__(self, capacity: int):
+        self.raw = InterfaceRing(capacity)
+        self.tiers = {name: InterfaceRing(TIER_CAPACITY[name], ROLLUP_COLUMNS) for name in TIERS}
+        self.sketches = {name: deque(maxlen=TIER_CAPACITY[name]) for name in TIERS}
+        self._open = {name: BucketAccumulator(width) for name, width in TIERS.items()}
+
+    def append(self, timestamp: float, values: Dict[str, float]):
+        self.raw.append(timestamp, values)
+        for name, accumulator in self._open.items():
+            finished = accumulator.add(timestamp, values)
+            if finished:
+                self.tiers[name].append(*finished)
+                self.sketches[name].append((finished[0], finished[1][SKETCH_KEY]))
+
+    def extend_sketches(self, tier: str, starts, sketches):
+        """Backfill closed-bucket sketches ({field: bytes} per bucket), oldest first."""
+        self.sketches[tier].extend(zip(starts, sketches))
+
+    def ring(self, tier: str) -> InterfaceRing:
+        return self.raw if tier == 'raw' else self.tiers[tier]
+
+    def _oldest(self, tier: str) -> float:
+        if tier == 'raw':
+            timestamps, _ = self.raw.window()
+            return float(timestamps[0]) if len(timestamps) else math.inf
+        buckets = self.sketches[tier]
+        return buckets[0][0] if buckets else math.inf
+
+    def sketch(self, field: str, since: float) -> Optional[DDSketch]:
+        """
+        Sketch of `field` from `since` on.  Raw samples are used when they
+        reach back that far, otherwise the finest tier that does (or, failing
+        that, whichever reaches back furthest), merging its closed buckets
+        that overlap the window with its open bucket.
+        """
+        sources = ('raw',) + tuple(sorted(TIERS, key=TIERS.get))
+        oldest = {source: self._oldest(source) for source in sources}
+        tier = next((source for source in sources if oldest[source] <= since), None)
+        if tier is None:
+            tier = min(sources, key=oldest.get)
+        if tier == 'raw':
+            timestamps, values = self.raw.window()
+            result = DDSketch()
+            result.update(values[field][int(np.searchsorted(timestamps, since, side='left')):])
+            return result
+        width = TIERS[tier]
+        closed = (sketches.get(field) for start, sketches in self.sketches[tier] if start + width > since)
+        return merge_sketches(list(closed) + [self._open[tier].sketches[field]])
+
+
+class HistoryStore:
+    """
+    Interface name -> SeriesHistory, all with the same raw retention.  Raw
+    samples and the 1m / 1h rollups (min, max, avg, last per field) are kept
+    side by side, so any window can be drawn from a bounded number of points.
+    Rollup buckets also keep DDSketches of the SKETCH_FIELDS, so quantiles
+    over any window, or over several interfaces, cost a bounded merge.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._series: Dict[str, SeriesHistory] = {}
+
+    def __contains__(self, name):
+        return name in self._series
+
+    def __len__(self):
+        return len(self._series)
+
+    def _get(self, name: str) -> SeriesHistory:
+        series = self._series.get(name)
+        if series is None:
+            series = self._series[name] = SeriesHistory(self.capacity)
+        return series
+
+    def append(self, name: str, timestamp: float, values: Dict[str, float]):
+        self._get(name).append(timestamp, values)
+
+    def extend(self, name: str, timestamps, values: Dict[str, np.ndarray], tier: str = 'raw'):
+        """Backfill raw samples or finished rollup buckets, oldest first."""
+        self._get(name).ring(tier).extend(timestamps, values)
+
+    def extend_sketches(self, name: str, tier: str, starts, sketches):
+        self._get(name).extend_sketches(tier, starts, sketches)
+
+    def window(self, name: str, seconds: Optional[float] = None, points: Optional[int] = None,
+               tier: str = 'raw'):
+        return self._series[name].ring(tier).window(seconds, points)
+
+    def best_tier(self, name: str, seconds: float, min_points: int = 60) -> str:
+        """
+        Coarsest tier that still gives `min_points` buckets across the window
+        and holds that much data; otherwise whichever tier has the most
+        points in it (usually raw for short windows).
+        """
+        series = self._series[name]
+        newest = series.raw.latest()
+        since = (newest['timestamp'] if newest else 0.0) - seconds
+        counts = {'raw': series.raw.count_since(since)}
+        counts.update({tier: ring.count_since(since) for tier, ring in series.tiers.items()})
+        for tier, width in sorted(TIERS.items(), key=lambda kv: kv[1], reverse=True):
+            if seconds / width >= min_points and counts[tier] >= min_points:
+                return tier
+        return max(counts, key=counts.get)
+
+    def sketch(self, names: Union[str, Iterable[str]], seconds: float,
+               field: str = 'rx_bps') -> Optional[DDSketch]:
+        """
+        Merged sketch of `field` over the last `seconds` (before the newest
+        sample among them) for one interface or several.  None when none of
+        them has history.  Merge with other devices' via merge_sketches().
+        """
+        if field not in SKETCH_FIELDS:
+            raise ValueError(f"No sketches kept for {field!r}")
+        names = [names] if isinstance(names, str) else list(names)
+        series = [self._series[name] for name in names if name in self._series]
+        newest = [sample['timestamp'] for sample in (s.raw.latest() for s in series) if sample]
+        if not newest:
+            return None
+        since = max(newest) - seconds
+        return merge_sketches(s.sketch(field, since) for s in series)
+
+    def percentiles(self, name: str, seconds: float, field: str = 'rx_bps',
+                    qs: Iterable[float] = (0.5, 0.95, 0.99)) -> Dict[float, Optional[float]]:
+        sketch = self.sketch(name, seconds, field)
+        return sketch.quantiles(qs) if sketch is not None else {q: None for q in qs}
+
+    def latest(self, name: str) -> Optional[Dict[str, float]]:
+        series = self._series.get(name)
+        return series.raw.latest() if series is not None else None
+
+    def sizes(self) -> Dict[str, int]:
+        return {name: len(series.raw) for name, series in self._series.items()}
+
+    def clear(self):
+        self._series.clear()
@@ -0,0 +1,228 @@
+# http_api.py
+import argparse
+import itertools
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Union
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+JSON_SUFFIX = ' | json'
+
+
+class HttpApiError(Exception):
+    """Raised for HTTP failures and JSON-RPC error responses."""
+
+
+class HttpApiPool:
+    """
+    One requests Session shared across the fleet.  urllib3 keeps up to
+    `connections_per_device` keep-alive connections per host and up to
+    `max_devices` host pools, so repeated polls skip TCP and TLS setup.
+    `verify` is False (no certificate checks), True (system CAs) or the
+    path of a CA bundle.
+    """
+
+    def __init__(self, max_devices: int = 500, connections_per_device: int = 4,
+                 verify: Union[bool, str] = False, timeout: float = 60.0):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.verify = verify
+        adapter = HTTPAdapter(pool_connections=max_devices, pool_maxsize=connections_per_device,
+                              max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if verify is False:
+            # Device APIs almost always run on self-signed certificates; say so
+            # once instead of warning on every request
+            print("HTTP API: TLS certificates are not verified (use --api-verify to check them)")
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    def post(self, url: str, auth, payload, content_type: str):
+        try:
+            response = self.session.post(url, data=json.dumps(payload), auth=auth, timeout=self.timeout,
+                                         headers={'Content-Type': content_type})
+        except requests.RequestException as e:
+            raise HttpApiError(f"HTTP request to {url} failed: {e}")
+        if response.status_code != 200:
+            raise HttpApiError(f"HTTP {response.status_code} from {url}: {response.text[:200]}")
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+_verify: Union[bool, str] = False
+
+
+def configure_http_api(verify: Union[bool, str] = False):
+    """TLS verification for the shared pool: False, True or a CA bundle path.  Call before polling."""
+    global _verify
+    with _shared_lock:
+        _verify = verify
+        if _shared_pool is not None:
+            _shared_pool.session.verify = verify
+
+
+def get_http_pool() -> HttpApiPool:
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = HttpApiPool(verify=_verify)
+        return _shared_pool
+
+
+class HttpApiDevice:
+    """
+    NAPALM-style cli() over Arista eAPI or Cisco NX-API JSON-RPC.
+
+    Commands ending in '| json' are sent as one structured request and
+    returned as JSON text, so CustomDriver's JSON path works unchanged; all
+    other commands go in one text request.  A poll's commands therefore
+    cost at most two requests on a pooled keep-alive connection.
+    """
+
+    def __init__(self, hostname: str, username: str, password: str, platform: str,
+                 port: Optional[int] = None, scheme: str = 'https', pool: Optional[HttpApiPool] = None):
+        if 'eos' not in platform and 'nxos' not in platform:
+            raise ValueError("HTTP API transport supports eos and nxos, not " + platform)
+        self.hostname = hostname
+        self.platform = platform
+        self.auth = (username, password)
+        self.pool = pool or get_http_pool()
+        port = port or (443 if scheme == 'https' else 80)
+        path = '/command-api' if 'eos' in platform else '/ins'
+        self.url = f"{scheme}://{hostname}:{port}{path}"
+        self._ids = itertools.count(1)
+
+    def cli(self, commands: List[str]) -> Dict[str, str]:
+        structured = [c for c in commands if c.endswith(JSON_SUFFIX)]
+        text = [c for c in commands if not c.endswith(JSON_SUFFIX)]
+        output = {}
+        if structured:
+            results = self.run_commands([c[:-len(JSON_SUFFIX)] for c in structured], 'json')
+            for command, result in zip(structured, results):
+                output[command] = json.dumps(result)
+        if text:
+            output.update(zip(text, self.run_commands(text, 'text')))
+        return output
+
+    def run_commands(self, commands: List[str], encoding: str = 'json') -> list:
+        """One JSON-RPC request for all commands; returns one result per command."""
+        if 'eos' in self.platform:
+            return self._run_eapi(commands, encoding)
+        return self._run_nxapi(commands, encoding)
+
+    def _run_eapi(self, commands, encoding):
+        payload = {
+            'jsonrpc': '2.0',
+            'method': 'runCmds',
+            'params': {'version': 1, 'cmds': commands, 'format': encoding},
+            'id': next(self._ids),
+        }
+        reply = self.pool.post(self.url, self.auth, payload, 'application/json')
+        if 'error' in reply:
+            raise HttpApiError(f"eAPI error from {self.hostname}: {reply['error'].get('message')}")
+        results = reply.get('result', [])
+        if encoding == 'text':
+            return [result.get('output', '') for result in results]
+        return results
+
+    def _run_nxapi(self, commands, encoding):
+        method = 'cli' if encoding == 'json' else 'cli_ascii'
+        payload = [{
+            'jsonrpc': '2.0',
+            'method': method,
+            'params': {'cmd': command, 'version': 1},
+            'id': next(self._ids),
+        } for command in commands]
+        reply = self.pool.post(self.url, self.auth, payload, 'application/json-rpc')
+        if isinstance(reply, dict):
+            # NX-API answers a single command with a bare object
+            reply = [reply]
+        results = []
+        for item in reply:
+            if 'error' in item:
+                raise HttpApiError(f"NX-API error from {self.hostname}: {item['error'].get('message')}")
+            body = (item.get('result') or {}).get('body', {} if encoding == 'json' else '')
+            if encoding == 'text' and isinstance(body, dict):
+                body = body.get('msg', '')
+            results.append(body)
+        return results
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real APIs
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        commands = self.server.capture.get('cli', {})
+
+        def answer(command, encoding):
+            if encoding == 'json':
+                return json.loads(commands.get(command + JSON_SUFFIX, '{}'))
+            return commands.get(command, '')
+
+        if self.path == '/command-api':
+            params = request['params']
+            results = [answer(c, params.get('format', 'json')) for c in params['cmds']]
+            if params.get('format') == 'text':
+                results = [{'output': r} for r in results]
+            reply = {'jsonrpc': '2.0', 'result': results, 'id': request['id']}
+        else:
+            reply = []
+            for item in request if isinstance(request, list) else [request]:
+                encoding = 'json' if item['method'] == 'cli' else 'text'
+                body = answer(item['params']['cmd'], encoding)
+                if encoding == 'text':
+                    body = {'msg': body}
+                reply.append({'jsonrpc': '2.0', 'result': {'body': body}, 'id': item['id']})
+            if len(reply) == 1:
+                reply = reply[0]
+
+        data = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ApiStandInServer:
+    """
+    Local plain-HTTP eAPI/NX-API stand-in answering from a replay_driver
+    capture file (use transport scheme 'http' against it).
+    """
+
+    def __init__(self, capture_path: str, host: str = '127.0.0.1', port: int = 0):
+        with open(capture_path) as f:
+            capture = json.load(f)
+        self._server = ThreadingHTTPServer((host, port), _StandInHandler)
+        self._server.daemon_threads = True
+        self._server.capture = capture
+        self.port = self._server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"HTTP API stand-in on port {self.port}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve a replay capture as a local eAPI/NX-API stand-in")
+    parser.add_argument('capture', help="capture file written by record mode")
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+    ApiStandInServer(args.capture, port=args.port)._server.serve_forever()
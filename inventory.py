@@ -0,0 +1,54 @@
+# inventory.py
+import json
+import os
+from typing import Dict, List
+
+REQUIRED_FIELDS = ('hostname', 'driver', 'username', 'password')
+
+
+def read_config(path: str) -> dict:
+    """Parse a YAML (.yaml/.yml) or JSON file; a bare list becomes {'devices': [...]}."""
+    with open(path) as f:
+        if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+            import yaml
+            data = yaml.safe_load(f) or {}
+        else:
+            data = json.load(f)
+    if isinstance(data, list):
+        data = {'devices': data}
+    return data
+
+
+def inventory_devices(data: dict) -> List[Dict[str, str]]:
+    """Devices of a parsed inventory, each merged over its defaults and validated."""
+    defaults = data.get('defaults', {})
+    devices = []
+    for entry in data.get('devices', []):
+        if isinstance(entry, str):
+            entry = {'hostname': entry}
+        device = {**defaults, **entry}
+        missing = [field for field in REQUIRED_FIELDS if not device.get(field)]
+        if missing:
+            raise ValueError(f"Inventory entry {entry} is missing {', '.join(missing)}")
+        devices.append({field: str(device[field]) for field in REQUIRED_FIELDS})
+    return devices
+
+
+def load_inventory(path: str) -> List[Dict[str, str]]:
+    """
+    Read a YAML or JSON inventory:
+
+        defaults: {driver: eos, username: admin, password: admin}
+        devices:
+          - hostname: 10.0.0.1
+          - {hostname: 10.0.0.2, driver: nxos}
+
+    Each device inherits the defaults; returns one dict per device with
+    hostname, driver, username and password.
+    """
+    return inventory_devices(read_config(path))
+
+
+def napalm_driver(platform: str) -> str:
+    """Driver name the worker is started with for a dashboard/inventory platform."""
+    return 'nxos_ssh' if platform == 'nxos' else platform
@@ -1,11 +1,83 @@
 # main.py example:
 from PyQt6.QtWidgets import QApplication
+import argparse
+import multiprocessing
 import sys
 from device_dashboard import DeviceDashboard
+from http_api import configure_http_api
+from inventory import load_inventory
+from poll_scheduler import configure_session_limiter
+from replay_driver import configure_replay
+from route_probe import configure_route_cache
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    window = DeviceDashboard()
+    # Required for the parse pool in frozen Windows builds
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Network Device Dashboard")
+    parser.add_argument('--record', metavar='DIR', help="capture raw device output to DIR")
+    parser.add_argument('--captures', metavar='DIR', help="capture directory for the replay driver")
+    parser.add_argument('--latency', type=float, default=0.0, help="replay latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="replay jitter in seconds")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="replay failure probability")
+    parser.add_argument('--interval', type=float, default=30.0, help="initial poll interval in seconds")
+    parser.add_argument('--min-interval', type=float, default=5.0, help="fastest adaptive poll interval")
+    parser.add_argument('--max-interval', type=float, default=300.0, help="slowest adaptive poll interval")
+    parser.add_argument('--collect-cpu', action='store_true', help="back off polling when device CPU is high")
+    parser.add_argument('--timing-log', metavar='FILE', help="append per-stage poll timings as JSON Lines")
+    parser.add_argument('--max-channels', type=int, default=3, help="concurrent SSH channels per device")
+    parser.add_argument('--telemetry-port', type=int, help="ingest streamed interface counters (gnmic event format) on this port")
+    parser.add_argument('--telemetry-host', default='127.0.0.1', help="address the telemetry listener binds (0.0.0.0 for all)")
+    parser.add_argument('--snmp-community', help="poll interface counters with SNMP GETBULK using this community")
+    parser.add_argument('--snmp-port', type=int, default=161, help="SNMP agent UDP port")
+    parser.add_argument('--counter-interval', type=float, default=5.0, help="SNMP counter poll interval in seconds")
+    parser.add_argument('--transport', choices=['ssh', 'http'], default='ssh', help="eos/nxos transport: SSH or eAPI/NX-API")
+    parser.add_argument('--api-port', type=int, help="eAPI/NX-API port (default 443, or 80 with --api-scheme http)")
+    parser.add_argument('--api-scheme', choices=['https', 'http'], default='https', help="eAPI/NX-API scheme")
+    parser.add_argument('--api-verify', nargs='?', const=True, default=False, metavar='CA_BUNDLE',
+                        help="verify eAPI/NX-API TLS certificates (system CAs, or this CA bundle)")
+    parser.add_argument('--poll-jitter', type=float, default=0.05, help="poll jitter as a fraction of the interval")
+    parser.add_argument('--session-rate', type=float, default=5.0, help="max new device sessions per second")
+    parser.add_argument('--inventory', metavar='FILE', help="YAML/JSON device inventory to pre-connect and warm up at startup")
+    parser.add_argument('--route-probe', action='store_true', help="re-pull the routing table only when 'show ip route summary' changes")
+    parser.add_argument('--route-max-age', type=float, default=300.0, help="seconds before a cached routing table is re-pulled anyway")
+    parser.add_argument('--history-points', type=int, default=4096, help="samples of interface history kept per interface")
+    parser.add_argument('--history-db', metavar='FILE', help="persist interface history to this SQLite file")
+    parser.add_argument('--collector', metavar='URL', help="follow devices through a collector's streaming API (e.g. ws://collector:8765) instead of polling")
+    parser.add_argument('--top-n', type=int, default=10, help="interfaces listed in the top-N panel")
+    args, qt_args = parser.parse_known_args()
+
+    configure_replay(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate)
+    if args.captures:
+        configure_replay(capture_dir=args.captures)
+
+    configure_session_limiter(args.session_rate)
+    configure_route_cache(args.route_max_age)
+    configure_http_api(args.api_verify)
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = DeviceDashboard(
+        record_dir=args.record,
+        poll_interval=args.interval,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        collect_cpu=args.collect_cpu,
+        timing_log=args.timing_log,
+        max_channels=args.max_channels,
+        telemetry_port=args.telemetry_port,
+        telemetry_host=args.telemetry_host,
+        snmp_community=args.snmp_community,
+        snmp_port=args.snmp_port,
+        counter_interval=args.counter_interval,
+        transport=args.transport,
+        api_port=args.api_port,
+        api_scheme=args.api_scheme,
+        poll_jitter=args.poll_jitter,
+        inventory=load_inventory(args.inventory) if args.inventory else None,
+        route_probe=args.route_probe,
+        history_points=args.history_points,
+        history_db=args.history_db,
+        top_n=args.top_n,
+        collector_url=args.collector
+    )
     window.show()
     sys.exit(app.exec())
-
@@ -0,0 +1,258 @@
+# metrics_exporter.py
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PREFIX = 'netdash_'
+DEFAULT_METRICS_PORT = 9464
+
+# Metric families: name -> (type, help).  Counter samples get a _total suffix.
+FAMILIES = {
+    'interface_up': ('gauge', "Interface operational state (1 up, 0 down)"),
+    'interface_speed_bits_per_second': ('gauge', "Interface bandwidth"),
+    'interface_receive_bits_per_second': ('gauge', "Received bits per second"),
+    'interface_transmit_bits_per_second': ('gauge', "Transmitted bits per second"),
+    'interface_receive_packets_per_second': ('gauge', "Received unicast packets per second"),
+    'interface_transmit_packets_per_second': ('gauge', "Transmitted unicast packets per second"),
+    'interface_receive_errors_per_second': ('gauge', "Receive errors per second"),
+    'interface_transmit_errors_per_second': ('gauge', "Transmit errors per second"),
+    'interface_receive_discards_per_second': ('gauge', "Receive discards per second"),
+    'interface_transmit_discards_per_second': ('gauge', "Transmit discards per second"),
+    'interface_receive_octets': ('counter', "Received octets as reported by the device"),
+    'interface_transmit_octets': ('counter', "Transmitted octets as reported by the device"),
+    'interface_receive_errors': ('counter', "Receive errors as reported by the device"),
+    'interface_transmit_errors': ('counter', "Transmit errors as reported by the device"),
+    'interface_receive_discards': ('counter', "Receive discards as reported by the device"),
+    'interface_transmit_discards': ('counter', "Transmit discards as reported by the device"),
+    'poll_up': ('gauge', "Whether the last poll of the device succeeded"),
+    'poll_duration_seconds': ('gauge', "Duration of the last poll cycle"),
+    'poll_stage_duration_seconds': ('gauge', "Duration of each stage of the last poll cycle"),
+    'poll_last_success_timestamp_seconds': ('gauge', "Unix time the last successful poll finished"),
+    'polls': ('counter', "Poll cycles by outcome"),
+    'exporter_render_seconds': ('gauge', "Time taken to render the last exposition buffer"),
+    'exporter_series': ('gauge', "Samples in the last exposition buffer"),
+}
+
+# Sample field -> family, for rates and for the raw counters
+RATE_FAMILIES = {
+    'rx_bps': 'interface_receive_bits_per_second',
+    'tx_bps': 'interface_transmit_bits_per_second',
+    'rx_pps': 'interface_receive_packets_per_second',
+    'tx_pps': 'interface_transmit_packets_per_second',
+    'rx_errors_ps': 'interface_receive_errors_per_second',
+    'tx_errors_ps': 'interface_transmit_errors_per_second',
+    'rx_discards_ps': 'interface_receive_discards_per_second',
+    'tx_discards_ps': 'interface_transmit_discards_per_second',
+}
+COUNTER_FAMILIES = {
+    'rx_octets': 'interface_receive_octets',
+    'tx_octets': 'interface_transmit_octets',
+    'rx_errors': 'interface_receive_errors',
+    'tx_errors': 'interface_transmit_errors',
+    'rx_discards': 'interface_receive_discards',
+    'tx_discards': 'interface_transmit_discards',
+}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sample(family: str, labels: str, value) -> str:
+    suffix = '_total' if FAMILIES[family][0] == 'counter' else ''
+    return f'{PREFIX}{family}{suffix}{{{labels}}} {float(value)!r}\n'
+
+
+class MetricsExporter:
+    """
+    OpenMetrics exposition of the collector's interface metrics plus poll
+    self-metrics, as a Collector sink.
+
+    Each device's samples are rendered to text once, when its poll ends
+    (its interface families) or its timing arrives (its poll families).
+    A refresh thread stitches those fragments into one exposition buffer,
+    and its gzip form, at most once per `refresh_interval` and only when
+    something changed; scrapes just send the prebuilt bytes.
+    """
+
+    def __init__(self, refresh_interval: float = 1.0, speeds: Optional[Dict[tuple, float]] = None):
+        self.refresh_interval = refresh_interval
+        # (device, interface) -> Mbps, shared with the Collector
+        self.speeds = speeds if speeds is not None else {}
+        self._lock = threading.Lock()
+        self._fragments: Dict[str, Dict[str, str]] = {}  # device -> family -> rendered samples
+        self._poll_counts: Dict[str, Dict[str, int]] = {}
+        self._last_success: Dict[str, float] = {}
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        self._body = b'# EOF\n'
+        self._body_gzip = gzip.compress(self._body)
+        self._render_seconds = 0.0
+        self._series = 0
+        self._server = None
+        self._thread = threading.Thread(target=self._refresh_loop, name='metrics-refresh', daemon=True)
+        self._thread.start()
+
+    # -- Collector sink ----------------------------------------------------
+
+    def handle(self, hostname: str, event: str, payload):
+        if event == 'timing_ready':
+            self._render_poll(hostname, payload)
+
+    def write_snapshot(self, hostname: str, snapshot: dict):
+        self._render_interfaces(hostname, snapshot)
+
+    def close(self):
+        self._stop.set()
+        self._dirty.set()
+        if self._server is not None:
+            self._server.stop()
+
+    def serve(self, host: str = '127.0.0.1', port: int = DEFAULT_METRICS_PORT) -> 'MetricsServer':
+        """Start serving /metrics; the server stops with close()."""
+        self._server = MetricsServer(self, host, port).start()
+        return self._server
+
+    def forget(self, hostname: str):
+        with self._lock:
+            self._fragments.pop(hostname, None)
+            self._poll_counts.pop(hostname, None)
+            self._last_success.pop(hostname, None)
+        self._dirty.set()
+
+    # -- rendering ---------------------------------------------------------
+
+    def _store(self, hostname: str, lines: Dict[str, List[str]]):
+        with self._lock:
+            fragments = self._fragments.setdefault(hostname, {})
+            for family, samples in lines.items():
+                fragments[family] = ''.join(samples)
+        self._dirty.set()
+
+    def _render_interfaces(self, hostname: str, snapshot: dict):
+        data = snapshot.get('interfaces') or {}
+        interfaces = data.get('interfaces', {})
+        counters = data.get('counters', {})
+        rates = snapshot.get('rates', {})
+        device = _escape(hostname)
+        lines = {family: [] for family in ('interface_up', 'interface_speed_bits_per_second',
+                                           *RATE_FAMILIES.values(), *COUNTER_FAMILIES.values())}
+        for name in sorted(set(interfaces) | set(rates)):
+            labels = f'device="{device}",interface="{_escape(name)}"'
+            details = interfaces.get(name, {})
+            if 'is_up' in details:
+                lines['interface_up'].append(_sample('interface_up', labels, bool(details['is_up'])))
+            speed = self.speeds.get((hostname, name))
+            if speed:
+                lines['interface_speed_bits_per_second'].append(
+                    _sample('interface_speed_bits_per_second', labels, speed * 1_000_000))
+            for field, value in rates.get(name, {}).items():
+                family = RATE_FAMILIES.get(field)
+                if family and value is not None:
+                    lines[family].append(_sample(family, labels, value))
+            for field, value in counters.get(name, {}).items():
+                family = COUNTER_FAMILIES.get(field)
+                if family and value is not None:
+                    lines[family].append(_sample(family, labels, value))
+        self._store(hostname, lines)
+
+    def _render_poll(self, hostname: str, record: dict):
+        status = record.get('status', 'ok')
+        device = _escape(hostname)
+        labels = f'device="{device}"'
+        with self._lock:
+            counts = self._poll_counts.setdefault(hostname, {})
+            counts[status] = counts.get(status, 0) + 1
+            counts = dict(counts)
+            if status == 'ok':
+                self._last_success[hostname] = record.get('started_at', 0.0) + record.get('total_seconds', 0.0)
+            last_success = self._last_success.get(hostname)
+        lines = {
+            'poll_up': [_sample('poll_up', labels, status == 'ok')],
+            'poll_duration_seconds': [_sample('poll_duration_seconds', labels, record.get('total_seconds', 0.0))],
+            'poll_stage_duration_seconds': [
+                _sample('poll_stage_duration_seconds', f'{labels},stage="{_escape(stage)}"', seconds)
+                for stage, seconds in sorted(record.get('stages', {}).items())],
+            'poll_last_success_timestamp_seconds': [
+                _sample('poll_last_success_timestamp_seconds', labels, last_success)] if last_success else [],
+            'polls': [_sample('polls', f'{labels},status="{_escape(s)}"', n) for s, n in sorted(counts.items())],
+        }
+        self._store(hostname, lines)
+
+    def render(self) -> bytes:
+        """Stitch the device fragments into one exposition, families grouped as OpenMetrics requires."""
+        started = time.perf_counter()
+        with self._lock:
+            devices = [self._fragments[hostname] for hostname in sorted(self._fragments)]
+        parts = []
+        for family, (kind, help_text) in FAMILIES.items():
+            if family.startswith('exporter_'):
+                continue
+            samples = [fragments[family] for fragments in devices if fragments.get(family)]
+            if samples:
+                parts.append(f'# TYPE {PREFIX}{family} {kind}\n# HELP {PREFIX}{family} {help_text}\n')
+                parts.extend(samples)
+        body = ''.join(parts)
+        self._series = body.count('\n') - 2 * sum(1 for part in parts if part.startswith('# TYPE'))
+        self._render_seconds = time.perf_counter() - started
+        for family, value in (('exporter_render_seconds', self._render_seconds), ('exporter_series', self._series)):
+            kind, help_text = FAMILIES[family]
+            body += f'# TYPE {PREFIX}{family} {kind}\n# HELP {PREFIX}{family} {help_text}\n{PREFIX}{family} {float(value)!r}\n'
+        return (body + '# EOF\n').encode()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            self._dirty.wait()
+            if self._stop.is_set():
+                break
+            self._dirty.clear()
+            body = self.render()
+            self._body, self._body_gzip = body, gzip.compress(body, compresslevel=1)
+            # Coalesce the polls finishing in the meantime into the next render
+            self._stop.wait(self.refresh_interval)
+
+    def exposition(self, gzipped: bool = False) -> bytes:
+        return self._body_gzip if gzipped else self._body
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+        data = self.server.exporter.exposition(gzipped)
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """Serves an exporter's current buffer at http://host:port/metrics."""
+
+    def __init__(self, exporter: MetricsExporter, host: str = '127.0.0.1', port: int = DEFAULT_METRICS_PORT):
+        self._server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.exporter = exporter
+        self.port = self._server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        print(f"OpenMetrics exporter on port {self.port}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,114 @@
+# parse_pool.py
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from custom_driver import TEMPLATE_DB, warm_engine, parse_interfaces_output, parse_interfaces_json_output
+from route_parser import parse_route_output
+
+# 0 workers parses inline on the calling thread (useful for debugging)
+DEFAULT_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+def _init_worker(db_path):
+    # Open the template database and compile the interface templates once per worker process
+    try:
+        warm_engine(db_path)
+    except Exception as e:
+        print("Parse worker failed to open template database:", e)
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+class ParsePool:
+    """
+    Persistent process pool for the pure-CPU parse stages (TextFSM interface
+    matching and route parsing).  Raw text goes in and compact results come
+    back, so template scoring never holds the GUI interpreter's GIL.
+    Device I/O stays on threads.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, db_path=TEMPLATE_DB):
+        self.workers = workers
+        self.db_path = db_path
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=(self.db_path,)
+                )
+            return self._executor
+
+    def _run(self, func, *args):
+        executor = self._get_executor()
+        if executor is None:
+            return func(*args)
+        try:
+            return executor.submit(func, *args).result()
+        except BrokenProcessPool:
+            traceback.print_exc()
+            print("Parse pool broken, restarting and parsing inline for this call")
+            with self._lock:
+                self._executor = None
+            return func(*args)
+
+    def warm_up(self):
+        """Start every worker process now (templates compile in the initializer); returns the futures."""
+        executor = self._get_executor()
+        if executor is None:
+            warm_engine(self.db_path)
+            return []
+        return [executor.submit(_worker_ready) for _ in range(self.workers)]
+
+    def parse_interfaces(self, raw_output, platform, timings=None):
+        interfaces, counters, parse_timings = self._run(
+            parse_interfaces_output, raw_output, platform, self.db_path)
+        if timings is not None:
+            timings.update(parse_timings)
+        return interfaces, counters
+
+    def parse_interfaces_json(self, raw_output, platform, timings=None):
+        interfaces, counters, parse_timings = self._run(
+            parse_interfaces_json_output, raw_output, platform)
+        if timings is not None:
+            timings.update(parse_timings)
+        return interfaces, counters
+
+    def parse_routes(self, raw_output):
+        return self._run(parse_route_output, raw_output)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def get_parse_pool() -> ParsePool:
+    """Process-wide pool shared by every DeviceInfoWorker."""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = ParsePool()
+        return _shared_pool
+
+
+def shutdown_parse_pool():
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is not None:
+            _shared_pool.shutdown()
+            _shared_pool = None
@@ -0,0 +1,139 @@
+# poll_scheduler.py
+import random
+import threading
+import time
+import zlib
+from typing import Optional
+
+
+class AdaptivePollInterval:
+    """
+    Chooses the next poll interval from the measured cycle time and, when
+    available, the device's control-plane CPU.
+
+    The interval never drops below `headroom` times the last cycle duration,
+    so cycles cannot overlap.  Slow or busy devices back off immediately;
+    healthy ones speed up gradually toward the minimum.
+    """
+
+    def __init__(self, initial: float = 30.0, minimum: float = 5.0, maximum: float = 300.0,
+                 headroom: float = 2.0, cpu_high: float = 70.0, cpu_low: float = 40.0,
+                 speed_up: float = 0.8, back_off: float = 2.0):
+        if minimum <= 0 or minimum > maximum:
+            raise ValueError("Poll interval bounds must satisfy 0 < minimum <= maximum")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.headroom = headroom
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.speed_up = speed_up
+        self.back_off = back_off
+        self.interval = self._clamp(initial)
+        self.last_duration = None
+        self.last_cpu = None
+
+    def _clamp(self, value: float) -> float:
+        return max(self.minimum, min(self.maximum, value))
+
+    def record_cycle(self, duration: float, cpu: Optional[float] = None) -> float:
+        """Feed one completed cycle and return the interval (seconds) until the next."""
+        self.last_duration = duration
+        self.last_cpu = cpu
+        floor = duration * self.headroom
+
+        if cpu is not None and cpu >= self.cpu_high:
+            # Fragile box under load: poll less, whatever the cycle time says
+            interval = max(floor, self.interval * self.back_off)
+        elif floor > self.interval:
+            interval = floor
+        elif cpu is None or cpu <= self.cpu_low:
+            interval = max(floor, self.interval * self.speed_up)
+        else:
+            # CPU between thresholds: hold steady
+            interval = max(floor, self.interval)
+
+        self.interval = self._clamp(interval)
+        return self.interval
+
+    def record_failure(self) -> float:
+        """Back off after a failed cycle and return the interval until the retry."""
+        self.interval = self._clamp(self.interval * self.back_off)
+        return self.interval
+
+
+def phase_offset(key: str) -> float:
+    """Stable fraction in [0, 1) for a device, the same in every process and run."""
+    return (zlib.crc32(key.encode()) & 0xffffffff) / 2 ** 32
+
+
+class SpreadSchedule:
+    """
+    Spreads device polls evenly across the interval instead of firing them
+    together.  Each device polls in its own slot, at
+    k * interval + phase_offset(device) * interval on the wall clock, plus
+    up to `jitter` of the interval either way.  Devices sharing an interval
+    land evenly across it in every process, so collector load stays flat.
+    """
+
+    def __init__(self, jitter: float = 0.05, clock=time.time):
+        self.jitter = jitter
+        self.clock = clock
+
+    def next_delay(self, device: str, interval: float) -> float:
+        """Seconds until the device's next slot at least half an interval from now."""
+        now = self.clock()
+        offset = phase_offset(device) * interval
+        earliest = now + interval / 2
+        slots = -(-(earliest - offset) // interval)  # ceil
+        due = slots * interval + offset
+        due += random.uniform(-self.jitter, self.jitter) * interval
+        return max(0.0, due - now)
+
+
+class SessionRateLimiter:
+    """
+    Token bucket capping new SSH/API session establishment per second across
+    the process, so many due polls do not hit AAA/TACACS at the same instant.
+    """
+
+    def __init__(self, rate: float = 5.0, burst: int = 5):
+        if rate <= 0:
+            raise ValueError("Session rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long the caller must wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, cancelled: Optional[threading.Event] = None) -> bool:
+        """Block until a session may be opened; False if `cancelled` was set meanwhile."""
+        wait = self._reserve()
+        if wait <= 0:
+            return True
+        if cancelled is not None:
+            return not cancelled.wait(wait)
+        time.sleep(wait)
+        return True
+
+
+_session_limiter = SessionRateLimiter()
+
+
+def configure_session_limiter(rate: float, burst: Optional[int] = None):
+    global _session_limiter
+    _session_limiter = SessionRateLimiter(rate, burst if burst is not None else max(1, int(rate)))
+
+
+def get_session_limiter() -> SessionRateLimiter:
+    return _session_limiter
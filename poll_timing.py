@@ -0,0 +1,80 @@
+# poll_timing.py
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class CycleTimer:
+    """
+    Times the stages of one poll cycle with a monotonic clock.
+    Repeated stage names accumulate, e.g. the two get_facts calls.
+    """
+
+    def __init__(self, hostname: str, driver: str = ''):
+        self.hostname = hostname
+        self.driver = driver
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        self.stages: Dict[str, float] = {}
+        self._running: Dict[str, float] = {}
+
+    def start(self, name: str):
+        self._running[name] = time.monotonic()
+
+    def stop(self, name: str):
+        started = self._running.pop(name, None)
+        if started is not None:
+            self.add(name, time.monotonic() - started)
+
+    @contextmanager
+    def stage(self, name: str):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_stages(self, stages: Dict[str, float]):
+        for name, seconds in stages.items():
+            self.add(name, seconds)
+
+    def finish(self, status: str = 'ok') -> dict:
+        """Build the structured record for this cycle."""
+        # A stage interrupted by an exception still counts up to now
+        for name in list(self._running):
+            self.stop(name)
+        return {
+            'hostname': self.hostname,
+            'driver': self.driver,
+            'started_at': self.started_at,
+            'total_seconds': round(time.monotonic() - self._start, 6),
+            'status': status,
+            'stages': {name: round(seconds, 6) for name, seconds in self.stages.items()},
+        }
+
+
+class JsonlTimingSink:
+    """Appends one JSON object per line; safe to share between worker threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, record: dict):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+
+
+def open_timing_sink(path: Optional[str]) -> Optional[JsonlTimingSink]:
+    return JsonlTimingSink(path) if path else None
@@ -0,0 +1,156 @@
+# quantile_sketch.py
+import math
+import struct
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+DEFAULT_ACCURACY = 0.01
+
+# Serialized form: header, then int32 bin keys, then uint32 bin counts
+_HEADER = struct.Struct('<ddQddI')
+
+
+class DDSketch:
+    """
+    Mergeable streaming quantile sketch (DDSketch, Masson et al. 2019).
+
+    Positive values land in logarithmic bins of ratio gamma, so any
+    quantile comes back within `relative_accuracy` of the true value.
+    Values at or below `min_value` (idle links) are counted as zero.
+    Memory is bounded by `max_bins`; when exceeded, the lowest bins are
+    collapsed together, which only affects the lowest quantiles.
+    Two sketches with the same accuracy merge by adding bin counts.
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_ACCURACY, max_bins: int = 2048,
+                 min_value: float = 1.0):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self):
+        return self.count
+
+    def add(self, value: float, weight: int = 1):
+        if value is None or value != value:
+            return
+        self.count += weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= self.min_value:
+            self.zero_count += weight
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + weight
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def update(self, values):
+        """Add many values at once; NaNs are skipped."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > self.min_value]
+        self.zero_count += len(values) - len(positive)
+        keys, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64),
+                                 return_counts=True)
+        self._add_bins(keys.tolist(), counts.tolist())
+
+    def _add_bins(self, keys, counts):
+        bins = self.bins
+        for key, count in zip(keys, counts):
+            bins[key] = bins.get(key, 0) + count
+        if len(bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_bins
+        target = keys[excess]
+        for key in keys[:excess]:
+            self.bins[target] += self.bins.pop(key)
+
+    def merge(self, other: 'DDSketch') -> 'DDSketch':
+        """Fold another sketch (same relative accuracy) into this one; returns self."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative accuracy can be merged")
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._add_bins(other.bins.keys(), other.bins.values())
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0 if self.min > 0 else self.min
+        seen = self.zero_count
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                # Bin midpoint in the relative sense keeps the error within the accuracy
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def quantiles(self, qs: Iterable[float] = (0.5, 0.95, 0.99)) -> Dict[float, Optional[float]]:
+        return {q: self.quantile(q) for q in qs}
+
+    def to_bytes(self) -> bytes:
+        """Compact binary form, used for closed buckets in memory and on disk."""
+        keys = np.fromiter(self.bins.keys(), dtype='<i4', count=len(self.bins))
+        counts = np.fromiter(self.bins.values(), dtype='<u4', count=len(self.bins))
+        header = _HEADER.pack(self.relative_accuracy, self.min_value, self.zero_count,
+                              self.min, self.max, len(self.bins))
+        return header + keys.tobytes() + counts.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'DDSketch':
+        accuracy, min_value, zero_count, lo, hi, n = _HEADER.unpack_from(data)
+        sketch = cls(accuracy, min_value=min_value)
+        offset = _HEADER.size
+        keys = np.frombuffer(data, dtype='<i4', count=n, offset=offset)
+        counts = np.frombuffer(data, dtype='<u4', count=n, offset=offset + 4 * n)
+        sketch.bins = dict(zip(keys.tolist(), counts.tolist()))
+        sketch.zero_count = zero_count
+        sketch.count = zero_count + int(counts.sum())
+        sketch.min, sketch.max = lo, hi
+        return sketch
+
+
+def merge_sketches(sketches: Iterable) -> Optional[DDSketch]:
+    """
+    Merge any number of sketches, or their to_bytes() forms, into a new one
+    (e.g. across buckets, interfaces or devices).  None if there were none.
+    """
+    merged = None
+    for sketch in sketches:
+        if sketch is None:
+            continue
+        if isinstance(sketch, (bytes, bytearray, memoryview)):
+            sketch = DDSketch.from_bytes(bytes(sketch))
+        if merged is None:
+            merged = DDSketch(sketch.relative_accuracy, sketch.max_bins, sketch.min_value)
+        merged.merge(sketch)
+    return merged
@@ -0,0 +1,221 @@
+# replay_driver.py
+import fnmatch
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+REPLAY_DRIVER_NAME = 'replay'
+
+# Defaults used when the driver is created without optional_args, which is how
+# DeviceInfoWorker builds ios-style devices.  configure_replay() updates these.
+REPLAY_DEFAULTS = {
+    'capture_dir': 'captures',
+    'latency': 0.0,        # mean seconds added to every call
+    'jitter': 0.0,         # +/- seconds of uniform noise around latency
+    'failure_rate': 0.0,   # probability (0-1) that a call raises ReplayError
+    'seed': None,
+}
+
+
+class ReplayError(Exception):
+    """Raised for injected failures and missing captures."""
+
+
+def configure_replay(**kwargs):
+    """Update the defaults used by every ReplayDriver created afterwards."""
+    for key, value in kwargs.items():
+        if key not in REPLAY_DEFAULTS:
+            raise ValueError("Unknown replay option: " + key)
+        REPLAY_DEFAULTS[key] = value
+
+
+def get_network_driver(name: str):
+    """Drop-in for napalm.get_network_driver that also knows the replay driver."""
+    if name == REPLAY_DRIVER_NAME:
+        return ReplayDriver
+    from napalm import get_network_driver as napalm_get_network_driver
+    return napalm_get_network_driver(name)
+
+
+def _getter_key(name: str, args, kwargs) -> str:
+    if not args and not kwargs:
+        return name
+    return name + ":" + json.dumps([list(args), kwargs], sort_keys=True, default=str)
+
+
+class RecordingDevice:
+    """
+    Wraps an open NAPALM device and captures every cli() and get_*() response.
+    The capture is written to <capture_dir>/<hostname>.json on close().
+    """
+
+    def __init__(self, device, capture_dir: str):
+        self._device = device
+        self._capture_dir = capture_dir
+        self._capture = {
+            'hostname': device.hostname,
+            'platform': getattr(device, 'platform', 'ios'),
+            'recorded_at': time.time(),
+            'cli': {},
+            'getters': {},
+        }
+
+    def __getattr__(self, name):
+        attr = getattr(self._device, name)
+        if name.startswith('get_') and callable(attr):
+            def recorded_getter(*args, **kwargs):
+                result = attr(*args, **kwargs)
+                self._capture['getters'][_getter_key(name, args, kwargs)] = result
+                return result
+            return recorded_getter
+        return attr
+
+    def cli(self, commands, *args, **kwargs):
+        output = self._device.cli(commands, *args, **kwargs)
+        self._capture['cli'].update(output)
+        return output
+
+    def record_cli(self, output):
+        """Record CLI output fetched outside this wrapper (e.g. extra SSH channels)."""
+        self._capture['cli'].update(output)
+
+    def close(self):
+        try:
+            self.save()
+        finally:
+            self._device.close()
+
+    def save(self) -> str:
+        os.makedirs(self._capture_dir, exist_ok=True)
+        path = os.path.join(self._capture_dir, self._capture['hostname'] + '.json')
+        with open(path, 'w') as f:
+            json.dump(self._capture, f, indent=2, default=str)
+        print(f"Recorded {len(self._capture['cli'])} commands and "
+              f"{len(self._capture['getters'])} getters to {path}")
+        return path
+
+
+class ReplayDriver:
+    """
+    Fake NAPALM driver serving responses captured by RecordingDevice.
+
+    Captures are looked up as <capture_dir>/<hostname>.json, then through the
+    glob patterns in replay_map.json, then 'default.json', so thousands of
+    simulated hostnames can share one recording.  Loaded captures are cached
+    per process.
+    """
+
+    _capture_cache: Dict[str, dict] = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, hostname: str, username: str = '', password: str = '',
+                 timeout: int = 60, optional_args: Optional[dict] = None):
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+
+        options = dict(REPLAY_DEFAULTS)
+        options.update(optional_args or {})
+        self.capture_dir = options['capture_dir']
+        self.latency = float(options['latency'])
+        self.jitter = float(options['jitter'])
+        self.failure_rate = float(options['failure_rate'])
+        self._random = random.Random(options['seed'])
+
+        self.capture = self._load_capture()
+        self.platform = self.capture.get('platform', 'ios')
+        self.is_open = False
+
+    def _find_capture_path(self) -> Optional[str]:
+        exact = os.path.join(self.capture_dir, self.hostname + '.json')
+        if os.path.exists(exact):
+            return exact
+        # replay_map.json maps hostname glob patterns to capture files,
+        # e.g. {"sim-*": "core1.json"}
+        map_path = os.path.join(self.capture_dir, 'replay_map.json')
+        if os.path.exists(map_path):
+            with open(map_path) as f:
+                host_map = json.load(f)
+            for pattern, file_name in host_map.items():
+                if fnmatch.fnmatch(self.hostname, pattern):
+                    return os.path.join(self.capture_dir, file_name)
+        default = os.path.join(self.capture_dir, 'default.json')
+        if os.path.exists(default):
+            return default
+        return None
+
+    def _load_capture(self) -> dict:
+        path = self._find_capture_path()
+        if path is None:
+            raise ReplayError(f"No capture for {self.hostname} in {self.capture_dir}")
+        with self._cache_lock:
+            capture = self._capture_cache.get(path)
+            if capture is None:
+                with open(path) as f:
+                    capture = json.load(f)
+                self._capture_cache[path] = capture
+        return capture
+
+    def _simulate(self, what: str):
+        """Apply configured latency/jitter and failure injection."""
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise ReplayError(f"Injected failure on {self.hostname}: {what}")
+
+    def open(self):
+        self._simulate('open')
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def cli(self, commands, encoding: str = 'text'):
+        self._simulate('cli')
+        recorded = self.capture.get('cli', {})
+        output = {}
+        for command in commands:
+            if command not in recorded:
+                raise ReplayError(f"Command not captured for {self.hostname}: {command}")
+            output[command] = recorded[command]
+        return output
+
+    def _getter(self, name, *args, **kwargs):
+        self._simulate(name)
+        getters = self.capture.get('getters', {})
+        key = _getter_key(name, args, kwargs)
+        if key in getters:
+            return getters[key]
+        if name in getters:
+            return getters[name]
+        raise ReplayError(f"Getter not captured for {self.hostname}: {key}")
+
+    def get_facts(self):
+        facts = dict(self._getter('get_facts'))
+        if self.capture.get('hostname') != self.hostname:
+            facts['hostname'] = self.hostname
+        return facts
+
+    def get_lldp_neighbors(self):
+        return self._getter('get_lldp_neighbors')
+
+    def get_arp_table(self, *args, **kwargs):
+        return self._getter('get_arp_table', *args, **kwargs)
+
+    def get_route_to(self, *args, **kwargs):
+        return self._getter('get_route_to', *args, **kwargs)
+
+    def get_environment(self):
+        return self._getter('get_environment')
+
+    def __getattr__(self, name):
+        if name.startswith('get_'):
+            return lambda *args, **kwargs: self._getter(name, *args, **kwargs)
+        raise AttributeError(name)
@@ -0,0 +1,55 @@
+# route_parser.py
+from typing import List
+
+ROUTE_PROTOCOL_PREFIXES = ('C', 'L', 'S', 'D', 'O', 'B', '*')
+
+
+def parse_route_output(raw_output: str) -> List[list]:
+    """
+    Parse 'show ip route' text into rows of
+    [network, mask, next_hop, protocol, interface, metric].
+    Pure function with no Qt dependency so it can run in the parse pool.
+    """
+    rows = []
+    lines = raw_output.split('\n')
+    current_network = None
+    mask = ''
+    idx = 0
+    while idx < len(lines):
+        line = lines[idx].strip()
+        if line and not line.startswith('Codes:') and not line.startswith('Gateway of'):
+            if 'is subnetted' in line:
+                parts = line.split()
+                current_network = parts[0]
+            elif line.startswith(ROUTE_PROTOCOL_PREFIXES):
+                parts = line.split()
+                protocol = parts[0].replace('*', '')
+                if 'via' in line:
+                    prefix = parts[1]
+                    if '/' not in prefix and current_network:
+                        network = prefix
+                    else:
+                        network, mask = prefix.split('/')
+                    via_index = 0
+                    v = 0
+                    while v < len(parts):
+                        if parts[v] == 'via':
+                            via_index = v
+                        v = v + 1
+                    next_hop = parts[via_index + 1].rstrip(',')
+                    interface = ''
+                    last_part = parts[len(parts) - 1]
+                    if 'Ethernet' in last_part or 'Loopback' in last_part:
+                        interface = last_part
+                    metric = ''
+                    if '[' in line and ']' in line:
+                        start_idx = line.index('[') + 1
+                        end_idx = line.index(']')
+                        metric = line[start_idx:end_idx]
+                    rows.append([network, mask, next_hop, protocol, interface, metric])
+                elif 'is directly connected' in line:
+                    network, mask = parts[1].split('/')
+                    rows.append([network, mask, 'directly connected', protocol,
+                                 parts[len(parts) - 1], ''])
+        idx = idx + 1
+    return rows
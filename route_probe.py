@@ -0,0 +1,80 @@
+# route_probe.py
+import hashlib
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+ROUTE_PROBE_COMMAND = 'show ip route summary'
+DEFAULT_MAX_AGE = 300.0
+
+# Lines that change without the RIB changing (clocks, uptimes)
+_VOLATILE = re.compile(r'\d+:\d+:\d+|\b\d+[wdhms]\d+[dhms]\b|uptime|last (?:reset|update)', re.IGNORECASE)
+
+
+def route_signature(summary: str) -> Optional[str]:
+    """
+    Hash of a route summary with volatile lines removed, or None when the
+    probe is unsupported (error or empty output) and the full table must
+    always be fetched.
+    """
+    if not summary or not summary.strip() or summary.lstrip().startswith('%'):
+        return None
+    lines = [' '.join(line.split()) for line in summary.splitlines()]
+    stable = [line for line in lines if line and not _VOLATILE.search(line)]
+    return hashlib.sha1('\n'.join(stable).encode()).hexdigest()
+
+
+class RouteCache:
+    """
+    Last full routing table per device, keyed by the route summary
+    signature it was fetched under.  Entries older than `max_age` are
+    ignored so changes that leave every count the same are still picked up.
+    """
+
+    def __init__(self, max_age: float = DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries: Dict[str, tuple] = {}
+
+    def lookup(self, hostname: str, signature: Optional[str]) -> Optional[dict]:
+        if signature is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(hostname)
+        if entry is None:
+            return None
+        cached_signature, fetched_at, route_info = entry
+        if cached_signature != signature or time.monotonic() - fetched_at > self.max_age:
+            return None
+        return route_info
+
+    def store(self, hostname: str, signature: Optional[str], route_info: dict):
+        if signature is None:
+            return
+        with self._lock:
+            self._entries[hostname] = (signature, time.monotonic(), route_info)
+
+    def refresh(self, hostname: str, signature: Optional[str], raw_output: str):
+        """Re-stamp the entry as fetched now when a full fetch found the same table."""
+        if signature is None:
+            return
+        with self._lock:
+            entry = self._entries.get(hostname)
+            if entry is not None and entry[2].get('raw_output') == raw_output:
+                self._entries[hostname] = (signature, time.monotonic(), entry[2])
+
+    def forget(self, hostname: str):
+        with self._lock:
+            self._entries.pop(hostname, None)
+
+
+_cache = RouteCache()
+
+
+def configure_route_cache(max_age: float):
+    _cache.max_age = max_age
+
+
+def get_route_cache() -> RouteCache:
+    return _cache
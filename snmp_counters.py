@@ -0,0 +1,453 @@
+# snmp_counters.py
+import argparse
+import bisect
+import random
+import socket
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from counter_rates import RateEngine
+
+# BER / SNMP tags
+INTEGER = 0x02
+OCTET_STRING = 0x04
+NULL = 0x05
+OBJECT_IDENTIFIER = 0x06
+SEQUENCE = 0x30
+IP_ADDRESS = 0x40
+COUNTER32 = 0x41
+GAUGE32 = 0x42
+TIMETICKS = 0x43
+COUNTER64 = 0x46
+NO_SUCH_OBJECT = 0x80
+NO_SUCH_INSTANCE = 0x81
+END_OF_MIB_VIEW = 0x82
+GET_REQUEST = 0xA0
+GET_NEXT_REQUEST = 0xA1
+GET_RESPONSE = 0xA2
+GET_BULK_REQUEST = 0xA5
+
+CONSTRUCTED = (SEQUENCE, GET_REQUEST, GET_NEXT_REQUEST, GET_RESPONSE, GET_BULK_REQUEST)
+UNSIGNED = (COUNTER32, GAUGE32, TIMETICKS, COUNTER64)
+SNMP_V2C = 1
+
+
+def oid(text: str) -> Tuple[int, ...]:
+    return tuple(int(part) for part in text.strip('.').split('.'))
+
+
+# IF-MIB / ifXTable columns
+IF_NAME = oid('1.3.6.1.2.1.31.1.1.1.1')
+IF_ALIAS = oid('1.3.6.1.2.1.31.1.1.1.18')
+IF_MTU = oid('1.3.6.1.2.1.2.2.1.4')
+IF_ADMIN_STATUS = oid('1.3.6.1.2.1.2.2.1.7')
+IF_OPER_STATUS = oid('1.3.6.1.2.1.2.2.1.8')
+IF_IN_DISCARDS = oid('1.3.6.1.2.1.2.2.1.13')
+IF_IN_ERRORS = oid('1.3.6.1.2.1.2.2.1.14')
+IF_OUT_DISCARDS = oid('1.3.6.1.2.1.2.2.1.19')
+IF_OUT_ERRORS = oid('1.3.6.1.2.1.2.2.1.20')
+IF_HC_IN_OCTETS = oid('1.3.6.1.2.1.31.1.1.1.6')
+IF_HC_IN_UCAST_PKTS = oid('1.3.6.1.2.1.31.1.1.1.7')
+IF_HC_OUT_OCTETS = oid('1.3.6.1.2.1.31.1.1.1.10')
+IF_HC_OUT_UCAST_PKTS = oid('1.3.6.1.2.1.31.1.1.1.11')
+IF_HIGH_SPEED = oid('1.3.6.1.2.1.31.1.1.1.15')
+
+# Column -> cumulative counter name used by the RateEngine
+COUNTER_COLUMNS = {
+    IF_HC_IN_OCTETS: 'rx_octets',
+    IF_HC_OUT_OCTETS: 'tx_octets',
+    IF_HC_IN_UCAST_PKTS: 'rx_unicast_packets',
+    IF_HC_OUT_UCAST_PKTS: 'tx_unicast_packets',
+    IF_IN_ERRORS: 'rx_errors',
+    IF_OUT_ERRORS: 'tx_errors',
+    IF_IN_DISCARDS: 'rx_discards',
+    IF_OUT_DISCARDS: 'tx_discards',
+}
+STATUS_COLUMNS = [IF_OPER_STATUS, IF_ADMIN_STATUS, IF_HIGH_SPEED]
+INDEX_COLUMNS = [IF_NAME, IF_ALIAS, IF_MTU]
+
+
+class SnmpError(Exception):
+    """Raised for timeouts, malformed packets and SNMP error-status responses."""
+
+
+# --- BER encoding -----------------------------------------------------------
+
+def _encode_length(length: int) -> bytes:
+    if length < 0x80:
+        return bytes([length])
+    body = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([0x80 | len(body)]) + body
+
+
+def _tlv(tag: int, body: bytes) -> bytes:
+    return bytes([tag]) + _encode_length(len(body)) + body
+
+
+def _encode_integer(value: int, tag: int = INTEGER) -> bytes:
+    if tag in UNSIGNED:
+        body = value.to_bytes(value.bit_length() // 8 + 1, 'big')
+    else:
+        body = value.to_bytes(max(1, (value.bit_length() + 8) // 8), 'big', signed=True)
+    return _tlv(tag, body)
+
+
+def _encode_oid(value: Tuple[int, ...]) -> bytes:
+    body = bytearray([40 * value[0] + value[1]])
+    for arc in value[2:]:
+        chunk = [arc & 0x7F]
+        arc >>= 7
+        while arc:
+            chunk.append(0x80 | (arc & 0x7F))
+            arc >>= 7
+        body.extend(reversed(chunk))
+    return _tlv(OBJECT_IDENTIFIER, bytes(body))
+
+
+def _encode_value(tag: int, value) -> bytes:
+    if tag in (INTEGER,) + UNSIGNED:
+        return _encode_integer(int(value), tag)
+    if tag == OCTET_STRING:
+        return _tlv(OCTET_STRING, value if isinstance(value, bytes) else str(value).encode())
+    if tag == OBJECT_IDENTIFIER:
+        return _encode_oid(value)
+    return _tlv(tag, b'')
+
+
+def _encode_message(community: str, pdu_tag: int, request_id: int, field2: int, field3: int,
+                    varbinds: List[Tuple[tuple, int, object]]) -> bytes:
+    bindings = b''.join(_tlv(SEQUENCE, _encode_oid(name) + _encode_value(tag, value))
+                        for name, tag, value in varbinds)
+    pdu = _tlv(pdu_tag, _encode_integer(request_id) + _encode_integer(field2) +
+               _encode_integer(field3) + _tlv(SEQUENCE, bindings))
+    return _tlv(SEQUENCE, _encode_integer(SNMP_V2C) +
+                _encode_value(OCTET_STRING, community.encode()) + pdu)
+
+
+# --- BER decoding -----------------------------------------------------------
+
+def _decode(data: bytes, offset: int = 0):
+    """Decode one TLV at offset; returns (tag, value, next_offset)."""
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    body = data[offset:offset + length]
+    end = offset + length
+    if len(body) != length:
+        raise SnmpError("Truncated SNMP packet")
+
+    if tag in CONSTRUCTED:
+        children = []
+        position = 0
+        while position < length:
+            child_tag, child_value, position = _decode(body, position)
+            children.append((child_tag, child_value))
+        return tag, children, end
+    if tag == INTEGER:
+        return tag, int.from_bytes(body, 'big', signed=True), end
+    if tag in UNSIGNED:
+        return tag, int.from_bytes(body, 'big'), end
+    if tag == OBJECT_IDENTIFIER:
+        arcs = [body[0] // 40, body[0] % 40]
+        arc = 0
+        for byte in body[1:]:
+            arc = (arc << 7) | (byte & 0x7F)
+            if not byte & 0x80:
+                arcs.append(arc)
+                arc = 0
+        return tag, tuple(arcs), end
+    if tag == OCTET_STRING:
+        return tag, bytes(body), end
+    return tag, None, end
+
+
+def _decode_message(data: bytes):
+    """Return (community, pdu_tag, request_id, field2, field3, [(oid, tag, value)])."""
+    _, message, _ = _decode(data)
+    version, community, (pdu_tag, pdu) = message[0][1], message[1][1], message[2]
+    if version != SNMP_V2C:
+        raise SnmpError("Only SNMPv2c is supported")
+    request_id, field2, field3 = pdu[0][1], pdu[1][1], pdu[2][1]
+    varbinds = []
+    for _, binding in pdu[3][1]:
+        (_, name), (tag, value) = binding
+        varbinds.append((name, tag, value))
+    return community.decode(errors='replace'), pdu_tag, request_id, field2, field3, varbinds
+
+
+# --- Client -----------------------------------------------------------------
+
+class SnmpClient:
+    """Minimal SNMPv2c client over UDP: GET and GETBULK table walks."""
+
+    def __init__(self, host: str, community: str = 'public', port: int = 161,
+                 timeout: float = 2.0, retries: int = 1):
+        self.address = (host, port)
+        self.community = community
+        self.timeout = timeout
+        self.retries = retries
+        self._request_id = random.randint(1, 2 ** 30)
+
+    def _request(self, pdu_tag: int, names: List[tuple], field2: int = 0, field3: int = 0):
+        self._request_id = (self._request_id % (2 ** 31 - 1)) + 1
+        request_id = self._request_id
+        packet = _encode_message(self.community, pdu_tag, request_id, field2, field3,
+                                 [(name, NULL, None) for name in names])
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(self.timeout)
+            for attempt in range(self.retries + 1):
+                sock.sendto(packet, self.address)
+                try:
+                    while True:
+                        data, _ = sock.recvfrom(65535)
+                        _, tag, response_id, error_status, error_index, varbinds = _decode_message(data)
+                        if response_id == request_id:
+                            break
+                except socket.timeout:
+                    continue
+                if error_status:
+                    raise SnmpError(f"SNMP error-status {error_status} at index {error_index}")
+                return varbinds
+        raise SnmpError(f"SNMP timeout from {self.address[0]}")
+
+    def get(self, names: List[tuple]):
+        return self._request(GET_REQUEST, names)
+
+    def get_bulk(self, names: List[tuple], max_repetitions: int = 25, non_repeaters: int = 0):
+        return self._request(GET_BULK_REQUEST, names, non_repeaters, max_repetitions)
+
+    def bulk_walk(self, columns: List[tuple], max_repetitions: int = 25) -> Dict[tuple, Dict[tuple, object]]:
+        """Walk several table columns together; returns {column: {index: value}}."""
+        results = {column: {} for column in columns}
+        cursor = {column: column for column in columns}
+        active = list(columns)
+        while active:
+            varbinds = self.get_bulk([cursor[column] for column in active], max_repetitions)
+            if not varbinds:
+                break
+            finished = set()
+            progressed = set()
+            for position, (name, tag, value) in enumerate(varbinds):
+                column = active[position % len(active)]
+                if column in finished:
+                    continue
+                if tag == END_OF_MIB_VIEW or name[:len(column)] != column:
+                    finished.add(column)
+                    continue
+                results[column][name[len(column):]] = value
+                cursor[column] = name
+                progressed.add(column)
+            active = [column for column in active if column not in finished and column in progressed]
+        return results
+
+
+# --- Counter backend ----------------------------------------------------------
+
+class SnmpCounterBackend:
+    """
+    Interface counters via GETBULK of the 64-bit ifXTable columns, producing
+    the same {"interfaces": ..., "counters": ...} payload as CustomDriver.
+    The ifIndex -> name mapping is cached and refreshed every
+    `index_refresh` seconds or when an unknown ifIndex shows up.
+    """
+
+    def __init__(self, host: str, community: str = 'public', port: int = 161,
+                 index_refresh: float = 600.0, client: Optional[SnmpClient] = None):
+        self.host = host
+        self.client = client or SnmpClient(host, community, port)
+        self.index_refresh = index_refresh
+        self._rates = RateEngine()
+        self._index = {}
+        self._index_loaded = 0.0
+
+    def _refresh_index(self):
+        table = self.client.bulk_walk(INDEX_COLUMNS)
+        index = {}
+        for row, name in table[IF_NAME].items():
+            index[row] = {
+                'name': name.decode(errors='replace'),
+                'description': table[IF_ALIAS].get(row, b'').decode(errors='replace'),
+                'mtu': table[IF_MTU].get(row, 0),
+            }
+        self._index = index
+        self._index_loaded = time.monotonic()
+
+    def poll(self) -> dict:
+        if not self._index or time.monotonic() - self._index_loaded > self.index_refresh:
+            self._refresh_index()
+
+        table = self.client.bulk_walk(list(COUNTER_COLUMNS) + STATUS_COLUMNS)
+        now = time.monotonic()
+        rows = set()
+        for column in table.values():
+            rows.update(column)
+        if rows - set(self._index):
+            self._refresh_index()
+
+        interfaces = {}
+        counters = {}
+        for row in sorted(rows):
+            meta = self._index.get(row)
+            if meta is None:
+                continue
+            name = meta['name']
+            values = {field: table[column][row]
+                      for column, field in COUNTER_COLUMNS.items() if row in table[column]}
+            rates = self._rates.update(self.host, name, values, now)
+            interfaces[name] = {
+                'is_up': table[IF_OPER_STATUS].get(row) == 1,
+                'is_enabled': table[IF_ADMIN_STATUS].get(row) == 1,
+                'description': meta['description'],
+                'mac_address': '',
+                'mtu': meta['mtu'],
+                'speed': float(table[IF_HIGH_SPEED].get(row, 0) or 1000),
+                'input_rate': rates.get('rx_bps', 0.0),
+                'output_rate': rates.get('tx_bps', 0.0),
+                'input_packets': values.get('rx_unicast_packets', 0),
+                'output_packets': values.get('tx_unicast_packets', 0),
+            }
+            counters[name] = {
+                'tx_unicast_packets': values.get('tx_unicast_packets', 0),
+                'rx_unicast_packets': values.get('rx_unicast_packets', 0),
+                'tx_errors': values.get('tx_errors', 0),
+                'rx_errors': values.get('rx_errors', 0),
+                'tx_discards': values.get('tx_discards', 0),
+                'rx_discards': values.get('rx_discards', 0),
+                'tx_rate': rates.get('tx_bps', 0.0),
+                'rx_rate': rates.get('rx_bps', 0.0),
+            }
+        return {"interfaces": interfaces, "counters": counters}
+
+
+_backends: Dict[tuple, SnmpCounterBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_snmp_backend(host: str, community: str = 'public', port: int = 161) -> SnmpCounterBackend:
+    """Shared backend per device so the ifIndex cache and rate state survive polls."""
+    key = (host, community, port)
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = SnmpCounterBackend(host, community, port)
+            _backends[key] = backend
+        return backend
+
+
+# --- Local stand-in responder ---------------------------------------------------
+
+class _ResponderHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        try:
+            community, pdu_tag, request_id, field2, field3, varbinds = _decode_message(data)
+        except Exception as e:
+            print("Bad SNMP request:", str(e))
+            return
+        if community != self.server.responder.community:
+            return
+        response = self.server.responder.respond(pdu_tag, [name for name, _, _ in varbinds], field2, field3)
+        sock.sendto(_encode_message(community, GET_RESPONSE, request_id, 0, 0, response), self.client_address)
+
+
+class SnmpStandInResponder:
+    """
+    Local SNMPv2c agent serving a synthetic IF-MIB whose 64-bit counters grow
+    in real time.  Answers GET, GETNEXT and GETBULK.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, community: str = 'public',
+                 interfaces: int = 48, mean_bps: float = 100_000_000.0):
+        self.community = community
+        self.interfaces = interfaces
+        self.mean_bps = mean_bps
+        self._started = time.monotonic()
+        self._rates = {row: random.uniform(0.2, 1.8) * mean_bps for row in range(1, interfaces + 1)}
+        self._server = socketserver.ThreadingUDPServer((host, port), _ResponderHandler)
+        self._server.daemon_threads = True
+        self._server.responder = self
+        self.port = self._server.server_address[1]
+
+    def _table(self):
+        elapsed = time.monotonic() - self._started
+        table = {}
+        for row in range(1, self.interfaces + 1):
+            octets = int(self._rates[row] * elapsed / 8)
+            table[IF_NAME + (row,)] = (OCTET_STRING, f"Gi1/0/{row}".encode())
+            table[IF_ALIAS + (row,)] = (OCTET_STRING, f"port {row}".encode())
+            table[IF_MTU + (row,)] = (INTEGER, 1500)
+            table[IF_ADMIN_STATUS + (row,)] = (INTEGER, 1)
+            table[IF_OPER_STATUS + (row,)] = (INTEGER, 1 if row % 10 else 2)
+            table[IF_HIGH_SPEED + (row,)] = (GAUGE32, 1000)
+            table[IF_HC_IN_OCTETS + (row,)] = (COUNTER64, octets)
+            table[IF_HC_OUT_OCTETS + (row,)] = (COUNTER64, octets // 2)
+            table[IF_HC_IN_UCAST_PKTS + (row,)] = (COUNTER64, octets // 800)
+            table[IF_HC_OUT_UCAST_PKTS + (row,)] = (COUNTER64, octets // 1600)
+            table[IF_IN_ERRORS + (row,)] = (COUNTER32, int(elapsed) // 60)
+            table[IF_OUT_ERRORS + (row,)] = (COUNTER32, 0)
+            table[IF_IN_DISCARDS + (row,)] = (COUNTER32, 0)
+            table[IF_OUT_DISCARDS + (row,)] = (COUNTER32, int(elapsed) // 120)
+        return table
+
+    def respond(self, pdu_tag, names, non_repeaters, max_repetitions):
+        table = self._table()
+        keys = sorted(table)
+
+        def next_after(name):
+            position = bisect.bisect_right(keys, name)
+            if position >= len(keys):
+                return name, END_OF_MIB_VIEW, None
+            key = keys[position]
+            return (key,) + table[key]
+
+        if pdu_tag == GET_REQUEST:
+            return [(name,) + table[name] if name in table else (name, NO_SUCH_INSTANCE, None)
+                    for name in names]
+        if pdu_tag == GET_NEXT_REQUEST:
+            return [next_after(name) for name in names]
+
+        response = [next_after(name) for name in names[:non_repeaters]]
+        cursors = list(names[non_repeaters:])
+        for _ in range(max(1, max_repetitions)):
+            for position, name in enumerate(cursors):
+                binding = next_after(name)
+                cursors[position] = binding[0]
+                response.append(binding)
+        return response
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"SNMP stand-in responder on udp/{self.port}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="SNMP counter backend / stand-in responder")
+    parser.add_argument('host', nargs='?', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=161)
+    parser.add_argument('--community', default='public')
+    parser.add_argument('--standin', action='store_true', help="serve a synthetic IF-MIB on --port")
+    parser.add_argument('--interfaces', type=int, default=48)
+    args = parser.parse_args()
+
+    if args.standin:
+        SnmpStandInResponder(args.host, args.port, args.community, args.interfaces).start()
+        while True:
+            time.sleep(60)
+    else:
+        backend = SnmpCounterBackend(args.host, args.community, args.port)
+        while True:
+            snapshot = backend.poll()
+            for name, intf in snapshot['interfaces'].items():
+                print(f"{name}: rx {intf['input_rate'] / 1e6:.1f} Mbps tx {intf['output_rate'] / 1e6:.1f} Mbps")
+            time.sleep(5)
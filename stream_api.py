@@ -0,0 +1,365 @@
+# stream_api.py
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from table_delta import FIELDS, TABLES, TableDiffer, table_rows
+
+DATASETS = ('facts', 'interfaces', 'neighbors', 'routes')
+DEFAULT_STREAM_PORT = 8765
+# Messages buffered per client before it is resynchronized with a snapshot
+MAX_PENDING = 256
+# Nested dict levels diffed key by key; deeper values are replaced whole
+DELTA_DEPTH = 4
+# Bulky payload fields left out of the stream; GET /devices/{hostname} still has them
+UNSTREAMED = {'routes': ('raw_output',)}
+
+
+def json_delta(old, new, path=(), depth: int = DELTA_DEPTH):
+    """
+    (sets, dels) turning `old` into `new`: sets are [path, value] pairs and
+    dels are paths, a path being the list of keys from the dataset root.
+    """
+    sets, dels = [], []
+    if not (isinstance(old, dict) and isinstance(new, dict)) or depth == 0:
+        if old != new:
+            sets.append([list(path), new])
+        return sets, dels
+    for key, value in new.items():
+        if key not in old:
+            sets.append([list(path) + [key], value])
+        elif old[key] != value:
+            child_sets, child_dels = json_delta(old[key], value, path + (key,), depth - 1)
+            sets.extend(child_sets)
+            dels.extend(child_dels)
+    dels.extend(list(path) + [key] for key in old if key not in new)
+    return sets, dels
+
+
+def apply_delta(root: dict, sets, dels):
+    """Apply json_delta() output in place; `root` maps dataset -> payload."""
+    for path in dels:
+        parent = root
+        for key in path[:-1]:
+            parent = parent.get(key, {})
+        parent.pop(path[-1], None)
+    for path, value in sets:
+        parent = root
+        for key in path[:-1]:
+            parent = parent.setdefault(key, {})
+        parent[path[-1]] = value
+
+
+def rows_delta(message: dict) -> dict:
+    """A 'rows' message in the TableDiffer delta form DeviceDashboard.apply_delta() takes."""
+    return {'reset': message.get('reset', False), 'fields': message.get('fields', {}),
+            'tables': {table: {'added': {}, 'removed': [tuple(key) for key in change['del']],
+                               'changed': {tuple(key): tuple(row) for key, row in change['set']}}
+                       for table, change in message['tables'].items()}}
+
+
+class DeviceState:
+    """
+    Client-side mirror of one device built from snapshot, delta and rows
+    messages.  apply() returns the datasets a message changed, ready to be
+    painted; messages no newer than the current state are ignored, so a
+    resync snapshot racing queued deltas is harmless.
+
+    The TABLES datasets (neighbors, routes) are kept as keyed rows plus
+    their FIELDS rather than as payloads, since the hub only sends their
+    row changes; table_delta() returns them ready to paint.
+    """
+
+    def __init__(self):
+        self.seq = -1
+        self.data: Dict[str, dict] = {}
+        self.tables: Dict[str, Dict[str, dict]] = {}
+        self.fields: Dict[str, dict] = {}
+
+    def apply(self, message: dict) -> List[str]:
+        kind = message.get('type')
+        if kind == 'snapshot':
+            self.seq = message['seq']
+            self.data = message['data']
+            for dataset in TABLES:
+                payload = self.data.pop(dataset, None)
+                if payload is not None:
+                    self.tables[dataset] = table_rows(dataset, payload)
+                    self.fields[dataset] = {name: payload[name] for name in FIELDS[dataset] if name in payload}
+            return [dataset for dataset in DATASETS if dataset in self.data or dataset in self.tables]
+        if kind in ('delta', 'rows'):
+            if message['seq'] <= self.seq:
+                return []
+            self.seq = message['seq']
+        if kind == 'delta':
+            apply_delta(self.data, message.get('set', []), message.get('del', []))
+            return sorted({path[0] for path in message.get('del', [])}
+                          | {path[0] for path, _ in message.get('set', [])})
+        if kind == 'rows':
+            dataset = message['dataset']
+            tables = self.tables.setdefault(dataset, {table: {} for table in TABLES[dataset]})
+            if message.get('reset'):
+                for rows in tables.values():
+                    rows.clear()
+            for table, change in message['tables'].items():
+                rows = tables.setdefault(table, {})
+                for key in change['del']:
+                    rows.pop(tuple(key), None)
+                rows.update((tuple(key), tuple(row)) for key, row in change['set'])
+            self.fields.setdefault(dataset, {}).update(message.get('fields', {}))
+            return [dataset]
+        return []
+
+    def table_delta(self, dataset: str) -> dict:
+        """Every row of a TABLES dataset as a reset delta; copies, safe to hand to another thread."""
+        return {'reset': True, 'fields': dict(self.fields.get(dataset, {})),
+                'tables': {table: {'added': dict(rows), 'changed': {}, 'removed': []}
+                           for table, rows in self.tables.get(dataset, {}).items()}}
+
+
+class _Subscriber:
+    """One client connection: an asyncio queue fed from collector threads."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.devices: Set[str] = set()
+
+    def offer(self, hostname: str, text: str):
+        # Runs on the event loop.  A client that falls behind gets its backlog
+        # dropped and a fresh snapshot instead of an unbounded queue.
+        if self.queue.qsize() >= MAX_PENDING:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            for device in self.devices:
+                self.queue.put_nowait((device, None))
+            return
+        self.queue.put_nowait((hostname, text))
+
+
+class StreamHub:
+    """
+    Latest datasets per device, kept as a Collector sink, and the fan-out of
+    their changes to any number of subscribers.
+
+    Each delivered dataset is diffed against the previous one (json_delta)
+    and only the difference is published, serialized once for all
+    subscribers.  The TABLES datasets are diffed by row key instead
+    (TableDiffer) and published as 'rows' messages, so one changed ARP
+    entry is one row on the wire, not the whole table.  Every change bumps the device's sequence number; a new
+    subscriber gets a snapshot at the current sequence, then the deltas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._devices: Dict[str, dict] = {}
+        self._subscribers: Dict[str, Set[_Subscriber]] = {}
+        # Row changes only: raw route output is never streamed (UNSTREAMED)
+        self._differ = TableDiffer(fields={})
+        self._server = None
+
+    def _device(self, hostname: str) -> dict:
+        device = self._devices.get(hostname)
+        if device is None:
+            device = self._devices[hostname] = {'seq': 0, 'data': {}, 'status': {}}
+        return device
+
+    # -- Collector sink ----------------------------------------------------
+
+    def handle(self, hostname: str, event: str, payload):
+        if event.endswith('_ready') and event[:-len('_ready')] in DATASETS:
+            dataset = event[:-len('_ready')]
+            if dataset in TABLES and not payload:
+                # A failed route collection, not an empty table: keep what viewers have
+                return
+            with self._lock:
+                device = self._device(hostname)
+                if dataset in TABLES:
+                    device['data'][dataset] = payload
+                    self._publish_rows(hostname, device, dataset, self._differ.diff(hostname, dataset, payload))
+                    return
+                sets, dels = json_delta({dataset: device['data'].get(dataset)}, {dataset: payload})
+                # Payloads are shared with other sinks: replace, never patch in place
+                device['data'][dataset] = payload
+                self._publish_delta(hostname, device, sets, dels)
+        elif event == 'unchanged':
+            dataset, summary = payload
+            with self._lock:
+                device = self._device(hostname)
+                if isinstance(device['data'].get(dataset), dict):
+                    sets = [[[dataset, key], value] for key, value in summary.items()
+                            if device['data'][dataset].get(key) != value]
+                    device['data'][dataset] = dict(device['data'][dataset], **summary)
+                    self._publish_delta(hostname, device, sets, [])
+        elif event in ('timing_ready', 'error'):
+            with self._lock:
+                device = self._device(hostname)
+                if event == 'error':
+                    device['status'].update(error=payload)
+                else:
+                    device['status'].update(status=payload.get('status'), polled_at=time.time(),
+                                            duration=payload.get('total_seconds'))
+                    if payload.get('status') == 'ok':
+                        device['status'].pop('error', None)
+                message = {'type': event[:-len('_ready')] if event == 'timing_ready' else 'error',
+                           'device': hostname, 'seq': device['seq'], 'data': payload}
+                self._publish(hostname, json.dumps(message, default=str))
+
+    def close(self):
+        if self._server is not None:
+            self._server.stop()
+
+    def serve(self, collector=None, host: str = '127.0.0.1', port: int = DEFAULT_STREAM_PORT) -> 'StreamServer':
+        """Start the HTTP/WebSocket API; it stops with close()."""
+        self._server = StreamServer(self, collector, host, port).start()
+        return self._server
+
+    # -- fan-out -------------------------------------------------------------
+
+    def _publish_delta(self, hostname: str, device: dict, sets, dels):
+        if not sets and not dels:
+            return
+        device['seq'] += 1
+        message = {'type': 'delta', 'device': hostname, 'seq': device['seq'], 'set': sets, 'del': dels}
+        self._publish(hostname, json.dumps(message, default=str))
+
+    def _publish_rows(self, hostname: str, device: dict, dataset: str, delta: dict):
+        tables = {table: {'set': [[key, row] for key, row in {**diff['changed'], **diff['added']}.items()],
+                          'del': diff['removed']}
+                  for table, diff in delta['tables'].items() if diff['added'] or diff['changed'] or diff['removed']}
+        if not tables and not delta['fields'] and not delta.get('reset'):
+            return
+        device['seq'] += 1
+        message = {'type': 'rows', 'device': hostname, 'seq': device['seq'], 'dataset': dataset,
+                   'reset': delta.get('reset', False), 'tables': tables, 'fields': delta['fields']}
+        self._publish(hostname, json.dumps(message, default=str))
+
+    def _publish(self, hostname: str, text: str):
+        for subscriber in self._subscribers.get(hostname, ()):
+            subscriber.loop.call_soon_threadsafe(subscriber.offer, hostname, text)
+
+    def snapshot(self, hostname: str, streamed: bool = False) -> Optional[dict]:
+        """The device's datasets; `streamed` leaves out the UNSTREAMED fields, as subscribers get it."""
+        with self._lock:
+            device = self._devices.get(hostname)
+            if device is None:
+                return None
+            data = dict(device['data'])
+            if streamed:
+                for dataset, names in UNSTREAMED.items():
+                    if isinstance(data.get(dataset), dict):
+                        data[dataset] = {key: value for key, value in data[dataset].items() if key not in names}
+            return {'type': 'snapshot', 'device': hostname, 'seq': device['seq'],
+                    'data': data, 'status': dict(device['status'])}
+
+    def snapshot_text(self, hostname: str) -> str:
+        snapshot = self.snapshot(hostname, streamed=True) or {'type': 'snapshot', 'device': hostname, 'seq': 0, 'data': {}}
+        return json.dumps(snapshot, default=str)
+
+    def devices(self) -> Dict[str, dict]:
+        with self._lock:
+            return {hostname: dict(device['status'], seq=device['seq'], datasets=sorted(device['data']))
+                    for hostname, device in self._devices.items()}
+
+    def subscribe(self, subscriber: _Subscriber, hostname: str):
+        # Registered under the lock, with the snapshot queued first, so no delta is missed
+        with self._lock:
+            self._subscribers.setdefault(hostname, set()).add(subscriber)
+            subscriber.devices.add(hostname)
+        subscriber.queue.put_nowait((hostname, None))
+
+    def unsubscribe(self, subscriber: _Subscriber, hostname: Optional[str] = None):
+        with self._lock:
+            for device in [hostname] if hostname else list(subscriber.devices):
+                self._subscribers.get(device, set()).discard(subscriber)
+                subscriber.devices.discard(device)
+
+
+def create_app(hub: StreamHub, collector=None):
+    """
+    FastAPI app over a hub:
+
+      GET /devices              status of every device
+      GET /devices/{hostname}   snapshot of one device
+      GET /top?metric=&n=       fleet-wide top interfaces (with a collector)
+      WS  /ws                   send {"subscribe": [...]} / {"unsubscribe": [...]};
+                                receive a snapshot per device, then deltas
+                                (and keyed 'rows' changes for neighbors/routes)
+    """
+    from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+
+    app = FastAPI(title="Network Device Dashboard collector")
+
+    @app.get('/devices')
+    def devices():
+        return hub.devices()
+
+    @app.get('/devices/{hostname}')
+    def device(hostname: str):
+        snapshot = hub.snapshot(hostname)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail=f"No data for {hostname}")
+        return snapshot
+
+    @app.get('/top')
+    def top(metric: str = 'utilization', n: int = 10):
+        if collector is None:
+            raise HTTPException(status_code=404, detail="No collector attached")
+        try:
+            ranking = collector.top_interfaces.top(metric, n)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return [{'device': key[0], 'interface': key[1], 'value': value} for key, value in ranking]
+
+    @app.websocket('/ws')
+    async def stream(websocket: WebSocket):
+        await websocket.accept()
+        subscriber = _Subscriber(asyncio.get_running_loop())
+
+        async def receive():
+            while True:
+                request = json.loads(await websocket.receive_text())
+                for hostname in request.get('subscribe', []):
+                    hub.subscribe(subscriber, hostname)
+                for hostname in request.get('unsubscribe', []):
+                    hub.unsubscribe(subscriber, hostname)
+
+        receiver = asyncio.create_task(receive())
+        try:
+            while not receiver.done():
+                getter = asyncio.ensure_future(subscriber.queue.get())
+                await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                hostname, text = getter.result()
+                if hostname in subscriber.devices:
+                    await websocket.send_text(text if text is not None else hub.snapshot_text(hostname))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            receiver.cancel()
+            hub.unsubscribe(subscriber)
+
+    return app
+
+
+class StreamServer:
+    """uvicorn serving create_app() on a background thread."""
+
+    def __init__(self, hub: StreamHub, collector=None, host: str = '127.0.0.1',
+                 port: int = DEFAULT_STREAM_PORT):
+        import uvicorn
+        config = uvicorn.Config(create_app(hub, collector), host=host, port=port, log_level='warning')
+        self._server = uvicorn.Server(config)
+        self.host, self.port = host, port
+
+    def start(self):
+        threading.Thread(target=self._server.run, name='stream-api', daemon=True).start()
+        print(f"Streaming API on ws://{self.host}:{self.port}/ws")
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
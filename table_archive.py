@@ -0,0 +1,295 @@
+# table_archive.py
+import argparse
+import datetime
+import json
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from table_delta import TABLES, diff_rows, table_rows
+
+DEFAULT_RETENTION = 7 * 86400
+# A full snapshot at least this often, and after this many deltas, bounds the replay per lookup
+DEFAULT_SNAPSHOT_INTERVAL = 3600.0
+DEFAULT_SNAPSHOT_EVERY = 60
+
+SNAPSHOT, DELTA = 0, 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    device TEXT NOT NULL,
+    tbl TEXT NOT NULL,
+    ts REAL NOT NULL,
+    kind INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (device, tbl, ts)
+) WITHOUT ROWID;
+"""
+
+
+def _encode(value) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(',', ':'), default=str).encode(), 6)
+
+
+def _decode(blob: bytes):
+    return json.loads(zlib.decompress(blob))
+
+
+class TableArchive:
+    """
+    Point-in-time archive of the LLDP, ARP and route tables in SQLite (WAL).
+
+    record() only enqueues; a writer thread diffs each delivered table
+    against the last one it stored (table_delta keys) and writes just the
+    rows added, changed and removed, zlib-compressed JSON.  An unchanged
+    table writes nothing.  A full snapshot is written first, then again
+    every `snapshot_interval` seconds or `snapshot_every` deltas, or when a
+    delta would be larger than half the table, so reconstruct() replays at
+    most `snapshot_every` deltas on top of the nearest earlier snapshot.
+
+    Compaction keeps `retention` seconds: whole snapshot chains older than
+    that are deleted, always keeping the snapshot the oldest kept delta
+    builds on.  With `max_bytes`, the oldest chains are also dropped until
+    the live pages fit.  Raw CLI output is not archived, only table rows.
+    """
+
+    def __init__(self, path: str, retention: float = DEFAULT_RETENTION, max_bytes: Optional[int] = None,
+                 snapshot_interval: float = DEFAULT_SNAPSHOT_INTERVAL, snapshot_every: int = DEFAULT_SNAPSHOT_EVERY,
+                 flush_interval: float = 1.0, compact_interval: float = 3600.0, max_queue: int = 1000):
+        self.path = path
+        self.retention = retention
+        self.max_bytes = max_bytes
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_every = snapshot_every
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        # (device, table) -> [rows, last snapshot ts, deltas since]; writer thread only
+        self._last: Dict[tuple, list] = {}
+        self._local = threading.local()
+        self._stop = threading.Event()
+
+        # auto_vacuum only takes effect on a new database, before WAL mode or any
+        # table writes its header, so it gets a bare connection first
+        bare = sqlite3.connect(self.path, timeout=30.0)
+        bare.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        bare.close()
+        connection = self._connect()
+        connection.executescript(_SCHEMA)
+        connection.commit()
+        connection.close()
+        self._writer = threading.Thread(target=self._run, name="table-archive-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30.0)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _reader(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    # -- collection side ---------------------------------------------------
+
+    def record(self, device: str, dataset: str, timestamp: float, payload: dict):
+        """Queue one neighbors or routes payload; never blocks."""
+        if dataset not in TABLES:
+            raise ValueError(f"No tables archived for dataset {dataset!r}")
+        try:
+            self._queue.put_nowait((device, dataset, timestamp, payload))
+        except queue.Full:
+            self.dropped += 1
+
+    # Collector sink
+    def handle(self, hostname: str, event: str, payload):
+        dataset = event[:-len('_ready')] if event.endswith('_ready') else None
+        # An empty routes payload means the poll failed, not that the table emptied
+        if dataset in TABLES and payload:
+            self.record(hostname, dataset, time.time(), payload)
+
+    # -- writer thread -----------------------------------------------------
+
+    def _records(self, device: str, dataset: str, timestamp: float, payload: dict) -> List[tuple]:
+        records = []
+        for table, rows in table_rows(dataset, payload).items():
+            last = self._last.get((device, table))
+            if last is None:
+                diff = None
+            else:
+                diff = diff_rows(last[0], rows)
+                changes = len(diff['added']) + len(diff['changed']) + len(diff['removed'])
+                if not changes:
+                    continue
+                if (timestamp - last[1] >= self.snapshot_interval or last[2] >= self.snapshot_every
+                        or 2 * changes > len(rows)):
+                    diff = None
+            if diff is None:
+                self._last[(device, table)] = [rows, timestamp, 0]
+                data = _encode([[key, row] for key, row in rows.items()])
+                records.append((device, table, timestamp, SNAPSHOT, data))
+            else:
+                last[0] = rows
+                last[2] += 1
+                data = _encode({'set': [[key, row] for key, row in {**diff['changed'], **diff['added']}.items()],
+                                'del': diff['removed']})
+                records.append((device, table, timestamp, DELTA, data))
+        return records
+
+    def _drain(self, block_for: float) -> list:
+        items = []
+        try:
+            items.append(self._queue.get(timeout=block_for))
+            while True:
+                items.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return items
+
+    def _run(self):
+        connection = self._connect()
+        next_compaction = time.monotonic() + self.compact_interval
+        while not (self._stop.is_set() and self._queue.empty()):
+            items = self._drain(self.flush_interval)
+            if items:
+                try:
+                    records = [record for item in items for record in self._records(*item)]
+                    with connection:
+                        connection.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)", records)
+                except (sqlite3.Error, ValueError) as e:
+                    # The next delivery starts a fresh snapshot chain
+                    self._last.clear()
+                    print(f"Table archive write of {len(items)} tables failed:", str(e))
+            if time.monotonic() >= next_compaction:
+                self._compact(connection)
+                next_compaction = time.monotonic() + self.compact_interval
+        connection.close()
+
+    def _compact(self, connection):
+        cutoff = time.time() - self.retention
+        try:
+            pairs = connection.execute("SELECT DISTINCT device, tbl FROM records").fetchall()
+            for device, table in pairs:
+                # Keep the snapshot the records after the cutoff are replayed from
+                base = connection.execute(
+                    "SELECT MAX(ts) FROM records WHERE device = ? AND tbl = ? AND kind = ? AND ts <= ?",
+                    (device, table, SNAPSHOT, cutoff)).fetchone()[0]
+                if base is not None:
+                    with connection:
+                        connection.execute("DELETE FROM records WHERE device = ? AND tbl = ? AND ts < ?",
+                                           (device, table, base))
+            while self.max_bytes and self._live_bytes(connection) > self.max_bytes:
+                if not self._drop_oldest_chain(connection, pairs):
+                    break
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            connection.execute("PRAGMA incremental_vacuum")
+        except sqlite3.Error as e:
+            print("Table archive compaction failed:", str(e))
+
+    @staticmethod
+    def _live_bytes(connection) -> int:
+        pages = connection.execute("PRAGMA page_count").fetchone()[0]
+        free = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages - free) * connection.execute("PRAGMA page_size").fetchone()[0]
+
+    @staticmethod
+    def _drop_oldest_chain(connection, pairs) -> bool:
+        """Delete the oldest snapshot and its deltas of whichever table has the oldest; False if none can go."""
+        oldest = None
+        for device, table in pairs:
+            snapshots = connection.execute(
+                "SELECT ts FROM records WHERE device = ? AND tbl = ? AND kind = ? ORDER BY ts LIMIT 2",
+                (device, table, SNAPSHOT)).fetchall()
+            # The newest chain of a table is never dropped
+            if len(snapshots) == 2 and (oldest is None or snapshots[0][0] < oldest[0]):
+                oldest = (snapshots[0][0], device, table, snapshots[1][0])
+        if oldest is None:
+            return False
+        with connection:
+            connection.execute("DELETE FROM records WHERE device = ? AND tbl = ? AND ts < ?",
+                               (oldest[1], oldest[2], oldest[3]))
+        return True
+
+    # -- query side --------------------------------------------------------
+
+    def devices(self) -> List[str]:
+        return [row[0] for row in self._reader().execute("SELECT DISTINCT device FROM records ORDER BY device")]
+
+    def versions(self, device: str, table: str, start: Optional[float] = None,
+                 end: Optional[float] = None) -> List[float]:
+        """Timestamps at which `table` changed (or was snapshotted) in [start, end]."""
+        rows = self._reader().execute(
+            "SELECT ts FROM records WHERE device = ? AND tbl = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+            (device, table, start if start is not None else float('-inf'),
+             end if end is not None else float('inf')))
+        return [row[0] for row in rows]
+
+    def reconstruct(self, device: str, table: str, timestamp: float) -> Optional[Dict[tuple, tuple]]:
+        """
+        The table as of `timestamp` ({key: row}): the newest snapshot at or
+        before it plus the deltas up to it.  None when nothing that old is kept.
+        """
+        connection = self._reader()
+        snapshot = connection.execute(
+            "SELECT ts, data FROM records WHERE device = ? AND tbl = ? AND kind = ? AND ts <= ? "
+            "ORDER BY ts DESC LIMIT 1", (device, table, SNAPSHOT, timestamp)).fetchone()
+        if snapshot is None:
+            return None
+        rows = {tuple(key): tuple(row) for key, row in _decode(snapshot[1])}
+        deltas = connection.execute(
+            "SELECT data FROM records WHERE device = ? AND tbl = ? AND ts > ? AND ts <= ? ORDER BY ts",
+            (device, table, snapshot[0], timestamp))
+        for (data,) in deltas:
+            delta = _decode(data)
+            for key in delta['del']:
+                rows.pop(tuple(key), None)
+            rows.update((tuple(key), tuple(row)) for key, row in delta['set'])
+        return rows
+
+    def close(self):
+        """Write everything queued, then stop the writer."""
+        self._stop.set()
+        self._writer.join()
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+
+
+def parse_time(text: str) -> float:
+    """Unix seconds, an ISO date/time, or a time of day (today, local time)."""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        at = datetime.time.fromisoformat(text)
+        return datetime.datetime.combine(datetime.date.today(), at).timestamp()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Show an archived table as of a point in time")
+    parser.add_argument('archive', help="table archive SQLite file")
+    parser.add_argument('device')
+    parser.add_argument('table', choices=[table for tables in TABLES.values() for table in tables])
+    parser.add_argument('--at', default=None, metavar='TIME',
+                        help="unix time, ISO date/time or HH:MM today (default: now)")
+    args = parser.parse_args()
+
+    archive = TableArchive(args.archive)
+    at = parse_time(args.at) if args.at else time.time()
+    rows = archive.reconstruct(args.device, args.table, at)
+    archive.close()
+    if rows is None:
+        print(f"No {args.table} table archived for {args.device} at {time.ctime(at)}")
+    else:
+        for row in rows.values():
+            print('\t'.join(row))
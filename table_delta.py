@@ -0,0 +1,108 @@
+# table_delta.py
+import threading
+from typing import Dict, Optional, Tuple
+
+from route_parser import parse_route_output
+
+Row = Tuple[str, ...]
+
+# Dataset -> tables it is shown as, and payload fields sent whole when they change
+TABLES = {'neighbors': ('lldp', 'arp'), 'routes': ('routes',)}
+FIELDS = {'neighbors': (), 'routes': ('raw_output',)}
+
+
+def lldp_rows(lldp: dict) -> Dict[tuple, Row]:
+    """(local port, neighbor, remote port) rows keyed by the same triple."""
+    rows = {}
+    for local_port, neighbors in lldp.items():
+        for neighbor in neighbors:
+            row = (local_port, neighbor.get('hostname', 'N/A'), neighbor.get('port', 'N/A'))
+            rows[row] = row
+    return rows
+
+
+def arp_rows(arp: list) -> Dict[tuple, Row]:
+    """(ip, mac, interface) rows keyed by IP, so a moved MAC is a change, not a churn."""
+    return {(entry.get('ip', 'N/A'),): (entry.get('ip', 'N/A'), entry.get('mac', 'N/A'),
+                                        entry.get('interface', 'N/A')) for entry in arp}
+
+
+def route_rows(route_info: dict) -> Dict[tuple, Row]:
+    """
+    Route table rows keyed by (source, network, mask, next hop): the NAPALM
+    get_route_to entries and the parsed CLI table, as the dashboard shows them.
+    """
+    rows = {}
+    for prefix, routes in (route_info.get('structured_routes') or {}).items():
+        network, mask = prefix.split('/')
+        for route in routes:
+            row = (network, mask, route.get('next_hop', ''), route.get('protocol', ''),
+                   route.get('outgoing_interface', ''), str(route.get('preference', '')))
+            rows[('napalm', network, mask, row[2])] = row
+    parsed = route_info.get('routes')
+    if parsed is None:
+        parsed = parse_route_output(route_info.get('raw_output', ''))
+    for row in parsed:
+        row = tuple(row)
+        rows[('cli', row[0], row[1], row[2])] = row
+    return rows
+
+
+def table_rows(dataset: str, payload: dict) -> Dict[str, Dict[tuple, Row]]:
+    if dataset == 'neighbors':
+        return {'lldp': lldp_rows(payload.get('lldp') or {}), 'arp': arp_rows(payload.get('arp') or [])}
+    if dataset == 'routes':
+        return {'routes': route_rows(payload)}
+    raise ValueError(f"No tables for dataset {dataset!r}")
+
+
+def diff_rows(old: Dict[tuple, Row], new: Dict[tuple, Row]) -> dict:
+    """{'added': {key: row}, 'changed': {key: row}, 'removed': [key]} from old to new."""
+    added, changed = {}, {}
+    for key, row in new.items():
+        previous = old.get(key)
+        if previous is None:
+            added[key] = row
+        elif previous != row:
+            changed[key] = row
+    return {'added': added, 'changed': changed, 'removed': [key for key in old if key not in new]}
+
+
+def is_empty(delta: dict) -> bool:
+    return not delta.get('reset') and not delta['fields'] and not any(
+        diff['added'] or diff['changed'] or diff['removed'] for diff in delta['tables'].values())
+
+
+class TableDiffer:
+    """
+    Rows last delivered per (device, dataset) to one consumer, so each
+    delivery can be reduced to the rows added, changed and removed since.
+    The first delivery (or the first after forget()) is a full table
+    marked 'reset'.  `fields` overrides FIELDS, the payload fields passed
+    along whole when they change.
+    """
+
+    def __init__(self, fields: Optional[Dict[str, tuple]] = None):
+        self.fields = FIELDS if fields is None else fields
+        self._lock = threading.Lock()
+        self._last: Dict[tuple, tuple] = {}
+
+    def diff(self, hostname: str, dataset: str, payload: dict) -> dict:
+        tables = table_rows(dataset, payload)
+        fields = {name: payload.get(name) for name in self.fields.get(dataset, ())}
+        key = (hostname, dataset)
+        with self._lock:
+            previous = self._last.get(key)
+            self._last[key] = (tables, fields)
+        if previous is None:
+            return {'reset': True, 'fields': fields,
+                    'tables': {name: diff_rows({}, rows) for name, rows in tables.items()}}
+        old_tables, old_fields = previous
+        return {'fields': {name: value for name, value in fields.items() if old_fields.get(name) != value},
+                'tables': {name: diff_rows(old_tables[name], rows) for name, rows in tables.items()}}
+
+    def forget(self, hostname: Optional[str] = None, dataset: Optional[str] = None):
+        with self._lock:
+            for key in list(self._last):
+                if (hostname is None or key[0] == hostname) and (dataset is None or key[1] == dataset):
+                    del self._last[key]
@@ -0,0 +1,281 @@
+# telemetry_stream.py
+import argparse
+import json
+import random
+import socket
+import socketserver
+import threading
+import time
+from typing import Dict, Optional
+
+from counter_rates import RateEngine
+
+# Paths to subscribe to (gnmic subscribe --path ... --mode stream --stream-mode sample)
+SUBSCRIPTION_PATHS = [
+    '/interfaces/interface/state/counters',
+    '/interfaces/interface/state/oper-status',
+    '/interfaces/interface/state/admin-status',
+    '/interfaces/interface/state/description',
+    '/interfaces/interface/ethernet/state/port-speed',
+]
+
+# OpenConfig counter leaf -> our cumulative counter name
+COUNTER_LEAVES = {
+    'in-octets': 'rx_octets',
+    'out-octets': 'tx_octets',
+    'in-unicast-pkts': 'rx_unicast_packets',
+    'out-unicast-pkts': 'tx_unicast_packets',
+    'in-errors': 'rx_errors',
+    'out-errors': 'tx_errors',
+    'in-discards': 'rx_discards',
+    'out-discards': 'tx_discards',
+}
+
+DEFAULT_TELEMETRY_PORT = 57500
+# The ingest port is unauthenticated: listen on loopback unless told otherwise
+DEFAULT_TELEMETRY_HOST = '127.0.0.1'
+
+
+def parse_port_speed(value) -> float:
+    """OpenConfig port-speed identity (e.g. 'SPEED_10GB') to Mbps."""
+    text = str(value).upper().split(':')[-1].replace('SPEED_', '')
+    try:
+        if text.endswith('GB'):
+            return float(text[:-2]) * 1000.0
+        if text.endswith('MB'):
+            return float(text[:-2])
+    except ValueError:
+        pass
+    return 1000.0
+
+
+def _source_host(source: str) -> str:
+    # gnmic tags the target as 'host:port'
+    return source.rsplit(':', 1)[0] if source.count(':') == 1 else source
+
+
+class TelemetryAggregator:
+    """
+    Folds gnmic event-format messages into per-device interface state and
+    produces the same {"interfaces": ..., "counters": ...} payload as the CLI
+    path, with rates computed from streamed counters by the RateEngine.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, dict]] = {}
+        self._rates = RateEngine()
+
+    def ingest(self, message):
+        events = message if isinstance(message, list) else [message]
+        with self._lock:
+            for event in events:
+                self._ingest_event(event)
+
+    def _ingest_event(self, event: dict):
+        tags = event.get('tags', {})
+        interface = tags.get('interface_name') or tags.get('name')
+        source = tags.get('source')
+        if not interface or not source:
+            return
+        device = _source_host(source)
+        timestamp = event.get('timestamp')
+        timestamp = timestamp / 1e9 if timestamp else time.time()
+
+        state = self._state.setdefault(device, {}).setdefault(interface, {
+            'counters': {}, 'rates': {}, 'oper_status': '', 'admin_status': '',
+            'description': '', 'speed': 1000.0,
+        })
+        counters = {}
+        for path, value in event.get('values', {}).items():
+            leaf = path.rstrip('/').rsplit('/', 1)[-1].split(':')[-1]
+            if leaf in COUNTER_LEAVES:
+                try:
+                    counters[COUNTER_LEAVES[leaf]] = int(value)
+                except (TypeError, ValueError):
+                    pass
+            elif leaf == 'oper-status':
+                state['oper_status'] = str(value).upper()
+            elif leaf == 'admin-status':
+                state['admin_status'] = str(value).upper()
+            elif leaf == 'description':
+                state['description'] = str(value)
+            elif leaf == 'port-speed':
+                state['speed'] = parse_port_speed(value)
+
+        if counters:
+            state['counters'].update(counters)
+            state['rates'].update(self._rates.update(device, interface, counters, timestamp))
+
+    def devices(self):
+        with self._lock:
+            return list(self._state)
+
+    def snapshot(self, device: str) -> dict:
+        """Current interface payload for one device, shaped like CustomDriver output."""
+        with self._lock:
+            state = self._state.get(_source_host(device), {})
+            interfaces = {}
+            counters = {}
+            for name, intf in state.items():
+                c = intf['counters']
+                r = intf['rates']
+                interfaces[name] = {
+                    'is_up': intf['oper_status'] == 'UP',
+                    'is_enabled': intf['admin_status'] in ('UP', ''),
+                    'description': intf['description'],
+                    'mac_address': '',
+                    'mtu': 0,
+                    'speed': intf['speed'],
+                    'input_rate': r.get('rx_bps', 0.0),
+                    'output_rate': r.get('tx_bps', 0.0),
+                    'input_packets': c.get('rx_unicast_packets', 0),
+                    'output_packets': c.get('tx_unicast_packets', 0),
+                }
+                counters[name] = {
+                    'tx_unicast_packets': c.get('tx_unicast_packets', 0),
+                    'rx_unicast_packets': c.get('rx_unicast_packets', 0),
+                    'tx_errors': c.get('tx_errors', 0),
+                    'rx_errors': c.get('rx_errors', 0),
+                    'tx_discards': c.get('tx_discards', 0),
+                    'rx_discards': c.get('rx_discards', 0),
+                    'tx_rate': r.get('tx_bps', 0.0),
+                    'rx_rate': r.get('rx_bps', 0.0),
+                }
+            return {"interfaces": interfaces, "counters": counters}
+
+
+class _EventStreamHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                self.server.aggregator.ingest(json.loads(line))
+            except ValueError as e:
+                print("Bad telemetry message:", str(e))
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class TelemetryListener:
+    """
+    TCP listener for newline-delimited event-format JSON, as sent by a gnmic
+    'tcp' output.  gnmic holds the gNMI subscriptions to the devices; this
+    process only ingests the pushed samples.
+    """
+
+    def __init__(self, host: str = DEFAULT_TELEMETRY_HOST, port: int = DEFAULT_TELEMETRY_PORT,
+                 aggregator: Optional[TelemetryAggregator] = None):
+        self.aggregator = aggregator or TelemetryAggregator()
+        self._server = _ThreadingTCPServer((host, port), _EventStreamHandler)
+        self._server.aggregator = self.aggregator
+        self.host = host
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name=f"telemetry-{self.port}", daemon=True)
+        self._thread.start()
+        print(f"Telemetry listener on {self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+_listeners: Dict[tuple, TelemetryListener] = {}
+_listeners_lock = threading.Lock()
+
+
+def get_listener(port: int = DEFAULT_TELEMETRY_PORT, host: str = DEFAULT_TELEMETRY_HOST) -> TelemetryListener:
+    """Shared listener per (host, port), started on first use."""
+    with _listeners_lock:
+        listener = _listeners.get((host, port))
+        if listener is None:
+            listener = TelemetryListener(host, port).start()
+            _listeners[(host, port)] = listener
+        return listener
+
+
+class TelemetryStandInPublisher:
+    """
+    Local stand-in for gnmic + device: pushes synthetic interface counter
+    events for one source to a TelemetryListener once per interval.
+    """
+
+    def __init__(self, host: str, port: int, source: str, interfaces: int = 8,
+                 interval: float = 1.0, mean_bps: float = 50_000_000.0):
+        self.address = (host, port)
+        self.source = source
+        self.interface_names = [f"Ethernet{i + 1}" for i in range(interfaces)]
+        self.interval = interval
+        self.mean_bps = mean_bps
+        self._counters = {name: dict.fromkeys(COUNTER_LEAVES, 0) for name in self.interface_names}
+        self._stop = threading.Event()
+
+    def _events(self):
+        now = time.time()
+        events = []
+        for name in self.interface_names:
+            counters = self._counters[name]
+            for direction in ('in', 'out'):
+                octets = int(random.uniform(0.5, 1.5) * self.mean_bps * self.interval / 8)
+                counters[direction + '-octets'] += octets
+                counters[direction + '-unicast-pkts'] += octets // 800
+                if random.random() < 0.05:
+                    counters[direction + '-errors'] += 1
+            values = {'/interfaces/interface/state/counters/' + leaf: value
+                      for leaf, value in counters.items()}
+            values['/interfaces/interface/state/oper-status'] = 'UP'
+            values['/interfaces/interface/state/admin-status'] = 'UP'
+            values['/interfaces/interface/ethernet/state/port-speed'] = 'SPEED_10GB'
+            events.append({
+                'name': 'interfaces',
+                'timestamp': int(now * 1e9),
+                'tags': {'source': self.source, 'interface_name': name},
+                'values': values,
+            })
+        return events
+
+    def run(self):
+        with socket.create_connection(self.address) as sock:
+            while not self._stop.is_set():
+                sock.sendall((json.dumps(self._events()) + '\n').encode())
+                self._stop.wait(self.interval)
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Streaming telemetry listener / stand-in publisher")
+    parser.add_argument('--port', type=int, default=DEFAULT_TELEMETRY_PORT)
+    parser.add_argument('--standin', metavar='SOURCE', help="publish synthetic counters as SOURCE")
+    parser.add_argument('--host', default=DEFAULT_TELEMETRY_HOST,
+                        help="listener address to publish to (--standin) or to bind")
+    parser.add_argument('--interfaces', type=int, default=8)
+    args = parser.parse_args()
+
+    if args.standin:
+        print(f"Publishing synthetic telemetry for {args.standin} to {args.host}:{args.port}")
+        TelemetryStandInPublisher(args.host, args.port, args.standin, args.interfaces).run()
+    else:
+        listener = get_listener(args.port, args.host)
+        while True:
+            time.sleep(5)
+            for device in listener.aggregator.devices():
+                snapshot = listener.aggregator.snapshot(device)
+                for name, intf in sorted(snapshot['interfaces'].items()):
+                    print(f"{device} {name}: rx {intf['input_rate'] / 1e6:.1f} Mbps "
+                          f"tx {intf['output_rate'] / 1e6:.1f} Mbps")
@@ -0,0 +1,40 @@
+import sqlite3
+
+from history_db import HistoryDB
+
+
+def test_new_database_uses_incremental_auto_vacuum(tmp_path):
+    path = str(tmp_path / 'history.sqlite')
+    db = HistoryDB(path)
+    db.close()
+    connection = sqlite3.connect(path)
+    try:
+        assert connection.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    finally:
+        connection.close()
+
+
+def test_partial_bucket_is_resumed_after_restart(tmp_path):
+    path = str(tmp_path / 'history.sqlite')
+    start = 1_700_000_040.0  # a minute boundary
+    db = HistoryDB(path, flush_interval=0.01)
+    for i in range(6):
+        db.record('r1', 'Gi1', start + i, {'rx_bps': 1.0})
+    db.close()
+
+    db = HistoryDB(path, flush_interval=0.01)
+    db.record('r1', 'Gi1', start + 10, {'rx_bps': 9.0})
+    db.close()
+
+    db = HistoryDB(path)
+    try:
+        timestamps, values = db.query('r1', 'Gi1', tier='1m')
+        assert list(timestamps) == [start]
+        assert values['rx_bps_min'][0] == 1.0
+        assert values['rx_bps_max'][0] == 9.0
+        assert abs(values['rx_bps_avg'][0] - 15.0 / 7) < 1e-9
+        assert values['rx_bps_last'][0] == 9.0
+        assert db.quantiles([('r1', 'Gi1')], start, tier='1m', qs=(1.0,))[1.0] > 8.0
+    finally:
+        db.close()
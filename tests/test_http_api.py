@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from http_api import ApiStandInServer, HttpApiDevice, HttpApiPool
+
+CAPTURE = {'cli': {
+    'show interfaces | json': json.dumps({'interfaces': {'Ethernet1': {'mtu': 9214}}}),
+    'show version | json': json.dumps({'version': '4.30.1F'}),
+    'show ip route': 'Gateway of last resort is not set\n',
+    'show lldp neighbors': 'Port  Neighbor\nEt1   sw2\n',
+}}
+
+
+class CountingPool(HttpApiPool):
+    def __init__(self):
+        super().__init__(verify=True)
+        self.requests = []
+
+    def post(self, url, auth, payload, content_type):
+        self.requests.append((url, payload))
+        return super().post(url, auth, payload, content_type)
+
+
+@pytest.fixture
+def server(tmp_path):
+    path = tmp_path / 'capture.json'
+    path.write_text(json.dumps(CAPTURE))
+    server = ApiStandInServer(str(path)).start()
+    yield server
+    server.stop()
+
+
+@pytest.mark.parametrize('platform, path', [('eos', '/command-api'), ('nxos', '/ins')])
+def test_cli_batches_commands_into_two_requests(server, platform, path):
+    pool = CountingPool()
+    device = HttpApiDevice('127.0.0.1', 'admin', 'admin', platform, port=server.port, scheme='http', pool=pool)
+    commands = ['show interfaces | json', 'show ip route', 'show version | json', 'show lldp neighbors']
+    try:
+        output = device.cli(commands)
+    finally:
+        pool.close()
+
+    assert set(output) == set(commands)
+    assert json.loads(output['show interfaces | json']) == {'interfaces': {'Ethernet1': {'mtu': 9214}}}
+    assert json.loads(output['show version | json']) == {'version': '4.30.1F'}
+    assert output['show ip route'] == CAPTURE['cli']['show ip route']
+    assert output['show lldp neighbors'] == CAPTURE['cli']['show lldp neighbors']
+    # One structured and one text request, whatever the number of commands
+    assert len(pool.requests) == 2
+    assert all(url.endswith(path) for url, _ in pool.requests)
+
+
+def test_single_nxos_command_reply_is_unwrapped(server):
+    pool = CountingPool()
+    device = HttpApiDevice('127.0.0.1', 'admin', 'admin', 'nxos', port=server.port, scheme='http', pool=pool)
+    try:
+        assert device.cli(['show ip route']) == {'show ip route': CAPTURE['cli']['show ip route']}
+    finally:
+        pool.close()
@@ -0,0 +1,77 @@
+import pytest
+
+from snmp_counters import (COUNTER64, IF_HC_IN_OCTETS, IF_NAME, OCTET_STRING, SnmpCounterBackend,
+                           SnmpStandInResponder)
+
+
+class ControlledResponder(SnmpStandInResponder):
+    """Stand-in whose ifHCInOctets and interface names are set by the test."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.in_octets = {}
+        self.names = {}
+        # Tests fake time.monotonic; keep the synthetic counters' clock positive under it
+        self._started = 0.0
+
+    def _table(self):
+        table = super()._table()
+        for row, value in self.in_octets.items():
+            table[IF_HC_IN_OCTETS + (row,)] = (COUNTER64, value)
+        for row, name in self.names.items():
+            table[IF_NAME + (row,)] = (OCTET_STRING, name.encode())
+        return table
+
+
+@pytest.fixture
+def responder():
+    responder = ControlledResponder(port=0, interfaces=4).start()
+    yield responder
+    responder.stop()
+
+
+def test_poll_returns_interfaces_and_counters(responder):
+    backend = SnmpCounterBackend('127.0.0.1', port=responder.port)
+    data = backend.poll()
+    assert sorted(data['interfaces']) == ['Gi1/0/1', 'Gi1/0/2', 'Gi1/0/3', 'Gi1/0/4']
+    details = data['interfaces']['Gi1/0/1']
+    assert details['is_up'] and details['is_enabled']
+    assert details['mtu'] == 1500
+    assert details['speed'] == 1000.0
+    assert details['description'] == 'port 1'
+    assert set(data['counters']['Gi1/0/1']) >= {'rx_errors', 'tx_discards', 'rx_rate', 'tx_rate'}
+
+
+def test_counter64_wrap_yields_no_rate_spike(responder, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('snmp_counters.time.monotonic', lambda: clock[0])
+    backend = SnmpCounterBackend('127.0.0.1', port=responder.port)
+
+    responder.in_octets[1] = 2 ** 64 - 1000
+    backend.poll()
+    clock[0] += 1.0
+    responder.in_octets[1] = 2 ** 64 - 1
+    rate = backend.poll()['counters']['Gi1/0/1']['rx_rate']
+    assert rate == pytest.approx(999 * 8)
+
+    # Wrapped past 2**64: no rate for the wrapping interval, then normal rates again
+    clock[0] += 1.0
+    responder.in_octets[1] = 500
+    assert backend.poll()['counters']['Gi1/0/1']['rx_rate'] == 0.0
+    clock[0] += 1.0
+    responder.in_octets[1] = 1500
+    assert backend.poll()['counters']['Gi1/0/1']['rx_rate'] == pytest.approx(1000 * 8)
+
+
+def test_index_refreshes_when_names_change(responder, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('snmp_counters.time.monotonic', lambda: clock[0])
+    backend = SnmpCounterBackend('127.0.0.1', port=responder.port, index_refresh=60.0)
+    assert 'Gi1/0/2' in backend.poll()['interfaces']
+
+    responder.names[2] = 'Te1/1/1'
+    clock[0] += 30.0
+    assert 'Gi1/0/2' in backend.poll()['interfaces']  # cached mapping still fresh
+    clock[0] += 60.0
+    interfaces = backend.poll()['interfaces']
+    assert 'Te1/1/1' in interfaces and 'Gi1/0/2' not in interfaces
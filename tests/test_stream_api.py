@@ -0,0 +1,86 @@
+import json
+
+from stream_api import DeviceState, StreamHub, rows_delta
+
+
+def _neighbors(macs):
+    return {'lldp': {'Et1': [{'hostname': 'sw2', 'port': 'Et7'}]},
+            'arp': [{'ip': f'10.0.0.{i}', 'mac': mac, 'interface': 'Vlan10'} for i, mac in enumerate(macs)]}
+
+
+def _published(hub):
+    messages = []
+    hub._publish = lambda hostname, text: messages.append(json.loads(text))
+    return messages
+
+
+def test_table_datasets_are_published_as_keyed_rows():
+    hub = StreamHub()
+    messages = _published(hub)
+    macs = [f'aa:00:00:00:00:{i:02x}' for i in range(200)]
+    hub.handle('r1', 'neighbors_ready', _neighbors(macs))
+
+    state = DeviceState()
+    state.apply(json.loads(hub.snapshot_text('r1')))
+    assert len(state.tables['neighbors']['arp']) == 200
+
+    macs[5] = 'bb:00:00:00:00:05'
+    hub.handle('r1', 'neighbors_ready', _neighbors(macs))
+    message = messages[-1]
+    assert message['type'] == 'rows'
+    assert list(message['tables']) == ['arp']
+    assert message['tables']['arp'] == {'set': [[['10.0.0.5'], ['10.0.0.5', 'bb:00:00:00:00:05', 'Vlan10']]],
+                                        'del': []}
+
+    assert state.apply(message) == ['neighbors']
+    assert state.tables['neighbors']['arp'][('10.0.0.5',)][1] == 'bb:00:00:00:00:05'
+    delta = rows_delta(message)
+    assert delta['tables']['arp']['changed'] == {('10.0.0.5',): ('10.0.0.5', 'bb:00:00:00:00:05', 'Vlan10')}
+
+    # Replayed or older messages are ignored
+    assert state.apply(message) == []
+
+
+def test_unchanged_table_publishes_nothing():
+    hub = StreamHub()
+    messages = _published(hub)
+    routes = {'routes': [['10.0.0.0', '8', '1.1.1.1', 'S', 'Et1', '1']], 'raw_output': 'S 10.0.0.0/8'}
+    hub.handle('r1', 'routes_ready', routes)
+    hub.handle('r1', 'routes_ready', dict(routes))
+    assert len(messages) == 1 and messages[0]['reset']
+    assert hub.snapshot('r1')['data']['routes'] == routes
+
+
+def test_state_table_delta_is_a_full_reset():
+    hub = StreamHub()
+    _published(hub)
+    hub.handle('r1', 'routes_ready', {'routes': [['10.0.0.0', '8', '1.1.1.1', 'S', 'Et1', '1']], 'raw_output': 'x'})
+    state = DeviceState()
+    assert state.apply(json.loads(hub.snapshot_text('r1'))) == ['routes']
+    delta = state.table_delta('routes')
+    assert delta['reset'] and delta['fields'] == {}
+    assert list(delta['tables']['routes']['added'].values()) == [('10.0.0.0', '8', '1.1.1.1', 'S', 'Et1', '1')]
+
+
+def test_failed_route_collection_keeps_the_table():
+    hub = StreamHub()
+    messages = _published(hub)
+    routes = {'routes': [['10.0.0.0', '8', '1.1.1.1', 'S', 'Et1', '1']], 'raw_output': 'S 10.0.0.0/8'}
+    hub.handle('r1', 'routes_ready', routes)
+    hub.handle('r1', 'routes_ready', {})
+    hub.handle('r1', 'routes_ready', dict(routes))
+    assert len(messages) == 1
+    assert hub.snapshot('r1')['data']['routes'] == routes
+
+
+def test_raw_route_output_is_not_streamed():
+    hub = StreamHub()
+    messages = _published(hub)
+    row = ['10.0.0.0', '8', '1.1.1.1', 'S', 'Et1', '1']
+    hub.handle('r1', 'routes_ready', {'routes': [row], 'raw_output': 'S 10.0.0.0/8'})
+    hub.handle('r1', 'routes_ready', {'routes': [row, ['10.1.0.0', '16', '1.1.1.1', 'S', 'Et1', '1']],
+                                      'raw_output': 'S 10.0.0.0/8\nS 10.1.0.0/16'})
+    assert all(not message['fields'] for message in messages)
+    assert 'raw_output' not in json.loads(hub.snapshot_text('r1'))['data']['routes']
+    # Still available on request
+    assert hub.snapshot('r1')['data']['routes']['raw_output'].endswith('10.1.0.0/16')
@@ -0,0 +1,37 @@
+import sqlite3
+
+from table_archive import TableArchive
+
+
+def _routes(next_hop):
+    return {'routes': [['10.0.%d.0' % i, '24', next_hop if i == 0 else '1.1.1.1', 'O', 'Gi1', '110']
+                       for i in range(10)], 'raw_output': ''}
+
+
+def test_new_archive_uses_incremental_auto_vacuum(tmp_path):
+    path = str(tmp_path / 'tables.sqlite')
+    TableArchive(path).close()
+    connection = sqlite3.connect(path)
+    try:
+        assert connection.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    finally:
+        connection.close()
+
+
+def test_reconstruct_replays_deltas_onto_snapshot(tmp_path):
+    archive = TableArchive(str(tmp_path / 'tables.sqlite'), flush_interval=0.01)
+    archive.record('r1', 'routes', 100.0, _routes('2.2.2.2'))
+    archive.record('r1', 'routes', 130.0, _routes('3.3.3.3'))
+    archive.close()
+    archive = TableArchive(str(tmp_path / 'tables.sqlite'))
+    try:
+        assert archive.reconstruct('r1', 'routes', 99.0) is None
+        before = archive.reconstruct('r1', 'routes', 120.0)
+        after = archive.reconstruct('r1', 'routes', 200.0)
+        assert len(before) == len(after) == 10
+        assert before[('cli', '10.0.0.0', '24', '2.2.2.2')][2] == '2.2.2.2'
+        assert ('cli', '10.0.0.0', '24', '3.3.3.3') in after
+        assert ('cli', '10.0.0.0', '24', '2.2.2.2') not in after
+        assert archive.versions('r1', 'routes') == [100.0, 130.0]
+    finally:
+        archive.close()
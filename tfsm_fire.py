@@ -24,6 +24,9 @@ class TextFSMAutoEngine:
         self.db_path = db_path
         self.verbose = verbose
         self.connection = None
+        # filter string -> template rows, cli_command -> compiled TextFSM
+        self._template_cache = {}
+        self._compiled = {}
         self._connect_db()
 
     def _connect_db(self) -> None:
@@ -148,7 +151,7 @@ class TextFSMAutoEngine:
 
             try:
                 # Direct parsing without timeout
-                textfsm_template = textfsm.TextFSM(io.StringIO(template['textfsm_content']))
+                textfsm_template = self._compile(template)
                 parsed = textfsm_template.ParseText(device_output)
                 parsed_dicts = [dict(zip(textfsm_template.header, row)) for row in parsed]
                 score = self._calculate_template_score(parsed_dicts, template, device_output)
@@ -178,8 +181,38 @@ class TextFSMAutoEngine:
         print(best_template)
         return best_template, best_parsed_output, best_score
 
+    def _compile(self, template: sqlite3.Row):
+        """Compiled TextFSM for a template row, reset for a fresh parse."""
+        compiled = self._compiled.get(template['cli_command'])
+        if compiled is None:
+            compiled = textfsm.TextFSM(io.StringIO(template['textfsm_content']))
+            self._compiled[template['cli_command']] = compiled
+        else:
+            compiled.Reset()
+        return compiled
+
+    def warm_templates(self, filter_strings) -> int:
+        """Load and compile the templates for each filter ahead of the first parse."""
+        count = 0
+        for filter_string in filter_strings:
+            for template in self.get_filtered_templates(filter_string):
+                try:
+                    self._compile(template)
+                    count += 1
+                except Exception:
+                    continue
+        return count
+
     def get_filtered_templates(self, filter_string: Optional[str] = None):
-        """Get filtered templates from database."""
+        """Get filtered templates from database (cached per filter)."""
+        cached = self._template_cache.get(filter_string)
+        if cached is not None:
+            return cached
+        templates = self._query_templates(filter_string)
+        self._template_cache[filter_string] = templates
+        return templates
+
+    def _query_templates(self, filter_string: Optional[str] = None):
         cursor = self.connection.cursor()
         if filter_string:
             filter_terms = filter_string.replace('-', '_').split('_')
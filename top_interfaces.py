@@ -0,0 +1,127 @@
+# top_interfaces.py
+import heapq
+import threading
+from collections import deque
+from typing import Dict, Hashable, List, Optional, Tuple
+
+DEFAULT_WINDOW = 300.0
+
+# Ranking metric -> label
+METRICS = {
+    'utilization': 'Utilization %',
+    'utilization_avg': 'Avg utilization %',
+    'errors': 'Errors/s',
+    'discards': 'Discards/s',
+}
+
+
+class _RollingMean:
+    """Mean of the samples in the last `window` seconds, O(1) amortized per add."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._samples = deque()
+        self._sum = 0.0
+
+    def add(self, timestamp: float, value: float) -> float:
+        self._samples.append((timestamp, value))
+        self._sum += value
+        while self._samples[0][0] < timestamp - self.window:
+            self._sum -= self._samples.popleft()[1]
+        return self._sum / len(self._samples)
+
+
+class TopInterfaces:
+    """
+    Incrementally maintained top-N rankings of interfaces.
+
+    Each metric keeps the current score per key and a max-heap of
+    (score, key) entries.  A new score is pushed in O(log n) and the old
+    entry is left behind; top() skips entries that no longer match the
+    current score, and the heap is rebuilt only once stale entries
+    outnumber live ones.  Nothing is sorted in full per poll.
+
+    Keys are any comparable hashable: interface names for one device,
+    (device, interface) tuples for a fleet.
+    """
+
+    def __init__(self, window: float = DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._scores: Dict[str, Dict[Hashable, float]] = {metric: {} for metric in METRICS}
+        self._heaps: Dict[str, List[tuple]] = {metric: [] for metric in METRICS}
+        self._means: Dict[Hashable, _RollingMean] = {}
+
+    def update(self, key: Hashable, timestamp: float, sample: Dict[str, float],
+               speed_bps: Optional[float] = None):
+        """
+        Feed one interface sample (rx_bps, tx_bps, *_errors_ps, *_discards_ps);
+        metrics whose inputs are missing keep their previous score.
+        """
+        scores = {}
+        if speed_bps and 'rx_bps' in sample and 'tx_bps' in sample:
+            utilization = (sample['rx_bps'] + sample['tx_bps']) * 100.0 / speed_bps
+            mean = self._means.get(key)
+            if mean is None:
+                mean = self._means[key] = _RollingMean(self.window)
+            scores['utilization'] = utilization
+            scores['utilization_avg'] = mean.add(timestamp, utilization)
+        for metric, fields in (('errors', ('rx_errors_ps', 'tx_errors_ps')),
+                               ('discards', ('rx_discards_ps', 'tx_discards_ps'))):
+            values = [sample[field] for field in fields if sample.get(field) is not None]
+            if values:
+                scores[metric] = sum(values)
+        with self._lock:
+            for metric, score in scores.items():
+                self._set(metric, key, score)
+
+    def _set(self, metric: str, key: Hashable, score: float):
+        current = self._scores[metric]
+        if current.get(key) == score:
+            return
+        current[key] = score
+        heap = self._heaps[metric]
+        heapq.heappush(heap, (-score, key))
+        if len(heap) > 2 * len(current) + 64:
+            self._rebuild(metric)
+
+    def _rebuild(self, metric: str):
+        heap = [(-score, key) for key, score in self._scores[metric].items()]
+        heapq.heapify(heap)
+        self._heaps[metric] = heap
+
+    def top(self, metric: str = 'utilization', n: int = 10) -> List[Tuple[Hashable, float]]:
+        """The n highest (key, score) pairs for a metric, highest first."""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown ranking metric {metric!r}")
+        with self._lock:
+            heap, current = self._heaps[metric], self._scores[metric]
+            popped, result, seen = [], [], set()
+            while heap and len(result) < n:
+                entry = heapq.heappop(heap)
+                score, key = -entry[0], entry[1]
+                if key in seen or current.get(key) != score:
+                    continue  # stale or duplicate entry; drop it
+                seen.add(key)
+                popped.append(entry)
+                result.append((key, score))
+            for entry in popped:
+                heapq.heappush(heap, entry)
+            return result
+
+    def score(self, metric: str, key: Hashable) -> Optional[float]:
+        return self._scores[metric].get(key)
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            self._means.pop(key, None)
+            for metric, current in self._scores.items():
+                if current.pop(key, None) is not None and len(self._heaps[metric]) > 2 * len(current) + 64:
+                    self._rebuild(metric)
+
+    def clear(self):
+        with self._lock:
+            self._means.clear()
+            for metric in METRICS:
+                self._scores[metric].clear()
+                self._heaps[metric] = []